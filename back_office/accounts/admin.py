@@ -39,6 +39,7 @@ class UserAdmin(BaseUserAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'user', 'city', 'state', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('gender', 'state', 'created_at')
     search_fields = ('full_name', 'user__email', 'city')
     ordering = ('-created_at',)
@@ -8,6 +8,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from healthcare_plans_bo.admission import priority
+from healthcare_plans_bo.audit import audit
+from healthcare_plans_bo.instrumentation import query_budget
 from ..services import AccountsService
 from .serializers import (
     RegisterSerializer,
@@ -17,6 +20,8 @@ from .serializers import (
 )
 
 
+@query_budget(3)
+@priority('expensive')
 class RegisterView(APIView):
     """API endpoint for user registration."""
     
@@ -52,6 +57,8 @@ class RegisterView(APIView):
             )
 
 
+@query_budget(1)
+@priority('expensive')
 class LoginView(APIView):
     """API endpoint for user login."""
     
@@ -82,12 +89,14 @@ class LoginView(APIView):
         return Response(tokens, status=status.HTTP_200_OK)
 
 
+@query_budget(2)
 class LogoutView(APIView):
     """API endpoint for user logout."""
     
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        audit('auth.logout', request.user.id)
         try:
             refresh_token = request.data.get('refresh_token')
             
@@ -106,6 +115,7 @@ class LogoutView(APIView):
             )
 
 
+@query_budget(4)
 class ProfileView(APIView):
     """API endpoint for user profile."""
     
@@ -19,6 +19,14 @@ class UserDAO:
         except User.DoesNotExist:
             return None
     
+    @staticmethod
+    def get_with_profile(user_id: int) -> Optional[User]:
+        """Get user by ID with the profile joined in the same query."""
+        try:
+            return User.objects.select_related('profile').get(id=user_id)
+        except User.DoesNotExist:
+            return None
+    
     @staticmethod
     def get_by_email(email: str) -> Optional[User]:
         """Get user by email."""
@@ -33,8 +41,15 @@ class UserDAO:
         return User.objects.filter(email=email).exists()
     
     @staticmethod
-    def create(email: str, mobile: str, password: str) -> User:
-        """Create a new user."""
+    def create(email: str, mobile: str, password: Optional[str] = None,
+               password_hash: Optional[str] = None) -> User:
+        """Create a new user from a raw password or an already hashed one."""
+        if password_hash is not None:
+            return User.objects.create_user_with_hash(
+                email=email,
+                mobile=mobile,
+                password_hash=password_hash
+            )
         return User.objects.create_user(
             email=email,
             mobile=mobile,
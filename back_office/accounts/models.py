@@ -9,18 +9,28 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 class UserManager(BaseUserManager):
     """Custom user manager for email-based authentication."""
     
-    def create_user(self, email, mobile, password=None, **extra_fields):
+    def _build_user(self, email, mobile, **extra_fields):
         if not email:
             raise ValueError('Email is required')
         if not mobile:
             raise ValueError('Mobile number is required')
         
         email = self.normalize_email(email)
-        user = self.model(email=email, mobile=mobile, **extra_fields)
+        return self.model(email=email, mobile=mobile, **extra_fields)
+    
+    def create_user(self, email, mobile, password=None, **extra_fields):
+        user = self._build_user(email, mobile, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
     
+    def create_user_with_hash(self, email, mobile, password_hash, **extra_fields):
+        """Create a user whose password was already hashed with make_password()."""
+        user = self._build_user(email, mobile, **extra_fields)
+        user.password = password_hash
+        user.save(using=self._db)
+        return user
+    
     def create_superuser(self, email, mobile, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -51,6 +61,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Admin changelist ordering and date filter
+            models.Index(fields=['created_at'], name='ix_users_created_at'),
+        ]
     
     def __str__(self):
         return self.email
@@ -79,6 +93,12 @@ class UserProfile(models.Model):
     
     class Meta:
         db_table = 'user_profiles'
+        indexes = [
+            # Admin list filters, each served already sorted newest first
+            models.Index(fields=['state', '-created_at'], name='ix_profiles_state_created'),
+            models.Index(fields=['gender', '-created_at'], name='ix_profiles_gender_created'),
+            models.Index(fields=['created_at'], name='ix_profiles_created_at'),
+        ]
     
     def __str__(self):
         return f"{self.full_name} ({self.user.email})"
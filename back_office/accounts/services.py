@@ -4,8 +4,10 @@ Handles business logic for user registration, authentication, and profile manage
 """
 
 from typing import Tuple, Optional
-from django.db import transaction
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
 from rest_framework_simplejwt.tokens import RefreshToken
+from healthcare_plans_bo.audit import audit
 from .models import User, UserProfile
 from .dao import UserDAO, UserProfileDAO
 
@@ -14,7 +16,6 @@ class AccountsService:
     """Service class for accounts operations."""
     
     @staticmethod
-    @transaction.atomic
     def register_user(email: str, mobile: str, password: str, full_name: str) -> Tuple[User, UserProfile]:
         """
         Register a new user with profile.
@@ -31,15 +32,27 @@ class AccountsService:
         Raises:
             ValueError: If email already exists
         """
-        # Check if email exists
+        # Check if email exists before paying for the hash
         if UserDAO.email_exists(email):
             raise ValueError('Email already exists')
         
-        # Create user
-        user = UserDAO.create(email=email, mobile=mobile, password=password)
+        # Hash before opening the transaction: hashing takes hundreds of
+        # milliseconds and must not hold database locks meanwhile.
+        password_hash = make_password(password)
         
-        # Create profile
-        profile = UserProfileDAO.create(user=user, full_name=full_name)
+        try:
+            with transaction.atomic():
+                # Create user
+                user = UserDAO.create(email=email, mobile=mobile, password_hash=password_hash)
+                
+                # Create profile
+                profile = UserProfileDAO.create(user=user, full_name=full_name)
+                audit('auth.register', user.id)
+        except IntegrityError:
+            # The same email registered while we were hashing
+            if UserDAO.email_exists(email):
+                raise ValueError('Email already exists')
+            raise
         
         return user, profile
     
@@ -58,8 +71,11 @@ class AccountsService:
         user = UserDAO.get_by_email(email)
         
         if user and user.check_password(password) and user.is_active:
+            audit('auth.login', user.id)
             return user
         
+        reason = 'unknown_email' if not user else 'inactive' if not user.is_active else 'bad_password'
+        audit('auth.login', user.id if user else None, 'failure', reason=reason)
         return None
     
     @staticmethod
@@ -92,11 +108,7 @@ class AccountsService:
         Returns:
             User object with profile
         """
-        user = UserDAO.get_by_id(user_id)
-        if user:
-            # Access profile to ensure it's loaded
-            _ = UserProfileDAO.get_by_user(user)
-        return user
+        return UserDAO.get_with_profile(user_id)
     
     @staticmethod
     @transaction.atomic
@@ -116,4 +128,7 @@ class AccountsService:
         if not profile:
             raise ValueError('Profile not found')
         
-        return UserProfileDAO.update(profile, **kwargs)
+        profile = UserProfileDAO.update(profile, **kwargs)
+        # Which fields changed, not their values
+        audit('profile.update', user.id, fields=sorted(kwargs))
+        return profile
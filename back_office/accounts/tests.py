@@ -1,3 +1,350 @@
-from django.test import TestCase
+"""
+Accounts Tests
+"""
 
-# Create your tests here.
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from healthcare_plans_bo.admission import AdmissionControlMiddleware
+from healthcare_plans_bo.audit import AuditLog, audit_log
+from healthcare_plans_bo.db_routing import ReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from healthcare_plans_bo.idempotency import IdempotencyMiddleware
+from healthcare_plans_bo.instrumentation import assert_max_queries
+from .dao import UserDAO, UserProfileDAO
+from .models import User, UserProfile
+from .services import AccountsService
+
+
+@override_settings(
+    SQL_QUERY_BUDGET_STRICT=True,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class QueryBudgetTests(TestCase):
+    """Every endpoint must stay within its declared ``@query_budget``."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='budget@example.com', mobile='9876543210', password='password123')
+        UserProfile.objects.create(user=self.user, full_name='Budget User')
+
+    def authenticate(self):
+        response = self.client.post(
+            '/api/v1/accounts/login/',
+            {'email': 'budget@example.com', 'password': 'password123'},
+            format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}")
+
+    def test_register(self):
+        response = self.client.post('/api/v1/accounts/register/', {
+            'email': 'new@example.com',
+            'mobile': '9876543211',
+            'password': 'password123',
+            'full_name': 'New User',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_login(self):
+        response = self.client.post(
+            '/api/v1/accounts/login/',
+            {'email': 'budget@example.com', 'password': 'password123'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_get_and_update(self):
+        self.authenticate()
+        self.assertEqual(self.client.get('/api/v1/accounts/profile/').status_code, 200)
+
+        response = self.client.patch('/api/v1/accounts/profile/', {'city': 'Vijayawada'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['profile']['city'], 'Vijayawada')
+
+    def test_admin_profile_changelist_has_no_n_plus_one(self):
+        for i in range(20):
+            user = User.objects.create_user(email=f'user{i}@example.com', mobile='9876543210', password='x')
+            UserProfile.objects.create(user=user, full_name=f'User {i}')
+        admin = User.objects.create_superuser(email='admin@example.com', mobile='1234567890', password='admin')
+        self.client.force_login(admin)
+
+        with assert_max_queries(10):
+            response = self.client.get('/admin/accounts/userprofile/')
+        self.assertEqual(response.status_code, 200)
+
+
+class RegistrationTests(TestCase):
+    """Registration hashes once per new email and keeps the manager's validation."""
+
+    def test_duplicate_email_is_rejected_before_hashing(self):
+        AccountsService.register_user('taken@example.com', '9876543210', 'password123', 'First User')
+
+        with mock.patch('accounts.services.make_password') as make_password:
+            with self.assertRaisesMessage(ValueError, 'Email already exists'):
+                AccountsService.register_user('taken@example.com', '9876543211', 'password123', 'Second User')
+        make_password.assert_not_called()
+
+    def test_email_registered_while_hashing_is_rejected(self):
+        def register_first(password):
+            User.objects.create_user(email='raced@example.com', mobile='9876543210', password=password)
+            return make_password(password)
+
+        with mock.patch('accounts.services.make_password', register_first):
+            with self.assertRaisesMessage(ValueError, 'Email already exists'):
+                AccountsService.register_user('raced@example.com', '9876543211', 'password123', 'Second User')
+        self.assertEqual(User.objects.filter(email='raced@example.com').count(), 1)
+
+    def test_create_with_a_hash_validates_and_normalizes(self):
+        with self.assertRaisesMessage(ValueError, 'Mobile number is required'):
+            UserDAO.create(email='hashed@example.com', mobile='', password_hash=make_password('password123'))
+
+        user = UserDAO.create(email='hashed@EXAMPLE.COM', mobile='9876543210', password_hash=make_password('password123'))
+        self.assertEqual(user.email, 'hashed@example.com')
+        self.assertTrue(user.check_password('password123'))
+
+
+class QueryPlanTests(TestCase):
+    """Every keyed DAO lookup and admin list filter must be answered from an index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='plan@example.com', mobile='9876543210', password='password123')
+        UserProfile.objects.create(user=self.user, full_name='Plan User', gender='Female', state='Kerala')
+
+    def explain(self, sql):
+        """Return (plan lines, full-scan lines) of one executed statement."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                return plan, [line for line in plan if line.startswith('SCAN ')]
+            if connection.vendor == 'postgresql':
+                # Tiny test tables would otherwise be seq-scanned even with a usable index
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = [row[0] for row in cursor.fetchall()]
+                return plan, [line for line in plan if 'Seq Scan' in line]
+        self.skipTest(f'No query plan check for {connection.vendor}')
+
+    def assertUsesIndex(self, lookup):
+        with CaptureQueriesContext(connection) as queries:
+            result = lookup()
+            if hasattr(result, '_fetch_all'):
+                result._fetch_all()
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            plan, scans = self.explain(query['sql'])
+            self.assertFalse(scans, f"{query['sql']}\n" + '\n'.join(plan))
+
+    def test_dao_lookups(self):
+        lookups = {
+            'UserDAO.get_by_id': lambda: UserDAO.get_by_id(self.user.id),
+            'UserDAO.get_with_profile': lambda: UserDAO.get_with_profile(self.user.id),
+            'UserDAO.get_by_email': lambda: UserDAO.get_by_email('plan@example.com'),
+            'UserDAO.email_exists': lambda: UserDAO.email_exists('plan@example.com'),
+            'UserProfileDAO.get_by_user_id': lambda: UserProfileDAO.get_by_user_id(self.user.id),
+        }
+        for name, lookup in lookups.items():
+            with self.subTest(name):
+                self.assertUsesIndex(lookup)
+
+    def test_admin_list_filters(self):
+        since = timezone.now() - timedelta(days=7)
+        lookups = {
+            'UserAdmin created_at': lambda: User.objects.filter(created_at__gte=since).order_by('-created_at'),
+            'UserProfileAdmin state': lambda: UserProfile.objects.filter(state='Kerala').order_by('-created_at'),
+            'UserProfileAdmin gender': lambda: UserProfile.objects.filter(gender='Female').order_by('-created_at'),
+            'UserProfileAdmin created_at': lambda: UserProfile.objects.filter(
+                created_at__gte=since).order_by('-created_at'),
+        }
+        for name, lookup in lookups.items():
+            with self.subTest(name):
+                self.assertUsesIndex(lookup)
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """Reads go to the request's replica until it writes; clients that wrote are pinned to the primary."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_outside_a_request(self):
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_read_your_writes(self):
+        with replica_reads('replica_0'):
+            self.assertEqual(self.router.db_for_read(User), 'replica_0')
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_middleware_routes_and_pins(self):
+        factory = RequestFactory()
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(User))
+            if request.method == 'POST':
+                self.router.db_for_write(User)
+            return HttpResponse()
+
+        with mock.patch('healthcare_plans_bo.db_routing.replica_aliases', return_value=['replica_0']):
+            middleware = ReplicaRoutingMiddleware(view)
+
+        self.assertNotIn('db_pin_primary', middleware(factory.get('/')).cookies)
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.cookies['db_pin_primary']['max-age'], 15)
+
+        pinned = factory.get('/')
+        pinned.COOKIES['db_pin_primary'] = '1'
+        middleware(pinned)
+        self.assertEqual(seen, ['replica_0', 'default', 'default'])
+
+
+class IdempotencyTests(TestCase):
+    """A retried mutating request with the same Idempotency-Key runs once and gets the first response."""
+
+    registration = {'email': 'retry@example.com', 'mobile': '9876543210', 'password': 'password123',
+                    'full_name': 'Retry User'}
+
+    def setUp(self):
+        caches['idempotency'].clear()
+        self.client = APIClient()
+
+    def register(self, data, key='key-1'):
+        return self.client.post('/api/v1/accounts/register/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_response(self):
+        first = self.register(self.registration)
+        retry = self.register(self.registration)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(User.objects.filter(email='retry@example.com').count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.register(self.registration)
+        response = self.register({**self.registration, 'email': 'other@example.com'})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+
+    def test_concurrent_duplicates_are_coalesced(self):
+        calls = []
+
+        def view(request):
+            calls.append(request)
+            time.sleep(0.2)
+            return HttpResponse('created', status=201)
+
+        # Threads cannot share the test transaction, so not the database cache either
+        with override_settings(IDEMPOTENCY_CACHE='default'):
+            middleware = IdempotencyMiddleware(view)
+        middleware.cache.clear()
+        factory = RequestFactory()
+        responses = []
+
+        def post():
+            responses.append(middleware(factory.post('/cart/', HTTP_IDEMPOTENCY_KEY='key-2')))
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 3)
+
+
+class AdmissionControlTests(SimpleTestCase):
+    """Requests beyond their priority class's limit and queue are shed with 503 + Retry-After."""
+
+    def request(self, path):
+        request = RequestFactory().post(path)
+        request.resolver_match = resolve(path)
+        return request
+
+    @override_settings(ADMISSION_CONTROL=True, ADMISSION_CLASSES='expensive=1:0:0')
+    def test_sheds_beyond_the_limit(self):
+        middleware = AdmissionControlMiddleware(lambda request: HttpResponse())
+        first, second = self.request('/api/v1/accounts/login/'), self.request('/api/v1/accounts/register/')
+
+        self.assertIsNone(middleware.process_view(first, first.resolver_match.func, (), {}))
+        response = middleware.process_view(second, second.resolver_match.func, (), {})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # Classes without a limit are never shed
+        profile = self.request('/api/v1/accounts/profile/')
+        self.assertIsNone(middleware.process_view(profile, profile.resolver_match.func, (), {}))
+
+        middleware(first)
+        self.assertIsNone(middleware.process_view(second, second.resolver_match.func, (), {}))
+
+
+class AuditLogTests(TestCase):
+    """Audit events are written off the request thread, after commit, without customer data."""
+
+    def test_account_actions_are_audited(self):
+        client = APIClient()
+        with self.assertLogs('healthcare_plans_bo.audit', 'INFO') as logs:
+            # Audit events wait for the commit, which the test transaction never makes
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post('/api/v1/accounts/register/', {
+                    'email': 'audit@example.com', 'mobile': '9876543210', 'password': 'password123',
+                    'full_name': 'Audit User'}, format='json')
+                client.post('/api/v1/accounts/login/', {'email': 'audit@example.com', 'password': 'wrong-password'},
+                            format='json')
+                response = client.post('/api/v1/accounts/login/', {'email': 'audit@example.com',
+                                                                   'password': 'password123'}, format='json')
+                client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}")
+                client.patch('/api/v1/accounts/profile/', {'city': 'Pune'}, format='json')
+            audit_log.flush()
+
+        events = [json.loads(line) for record in logs.records for line in record.getMessage().split('\n')]
+        user_id = User.objects.get(email='audit@example.com').id
+        self.assertEqual(
+            [(event['action'], event['outcome'], event['user_id']) for event in events if event['kind'] == 'audit'],
+            [('auth.register', 'success', user_id), ('auth.login', 'failure', user_id),
+             ('auth.login', 'success', user_id), ('profile.update', 'success', user_id)])
+        update = next(event for event in events if event['action'] == 'profile.update')
+        self.assertEqual(update['details'], {'fields': ['city']})
+        self.assertEqual(update['route'], '/api/v1/accounts/profile/')
+        self.assertNotIn('Pune', ''.join(record.getMessage() for record in logs.records))
+
+        access = [event for event in events if event['kind'] == 'access']
+        self.assertEqual([event['status'] for event in access], [201, 401, 200, 200])
+        self.assertEqual(access[-1]['user_id'], user_id)
+
+    @override_settings(AUDIT_QUEUE_SIZE=1, AUDIT_BATCH_SIZE=1, AUDIT_ENQUEUE_TIMEOUT_MS=0)
+    def test_full_queue_drops_and_close_drains(self):
+        log = AuditLog()
+        writing, release, written = threading.Event(), threading.Event(), []
+
+        def write(batch):
+            writing.set()
+            release.wait(5)
+            written.append([event['action'] for event in batch])
+
+        with mock.patch.object(log, '_write', write):
+            log.record({'kind': 'audit', 'action': 'first'})
+            writing.wait(5)
+            log.record({'kind': 'audit', 'action': 'queued'})
+            log.record({'kind': 'audit', 'action': 'dropped'})
+            release.set()
+            log.close()
+
+        self.assertEqual(written, [['first'], ['queued']])
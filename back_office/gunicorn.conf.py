@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for the Django backend.
+
+    gunicorn healthcare_plans_bo.wsgi:application
+
+With GUNICORN_PRELOAD enabled (default) the project is loaded once in the
+master and the GC is frozen right before forking, so the workers keep
+sharing those pages copy-on-write instead of each dirtying its own copy.
+Check the effect with ``python -m healthcare_plans_bo.memory_report``.
+"""
+
+import gc
+import os
+
+bind = f":{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Workers share request metrics through files in this directory
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/healthcare_plans_bo_metrics')
+
+if preload_app:
+    # No collections in the master while it loads: a collection would touch
+    # (and later un-share) every page holding preloaded objects. Enabled again
+    # once they are frozen (when_ready), where it only walks newer objects.
+    gc.disable()
+
+
+def on_starting(server):
+    from healthcare_plans_bo.metrics import clear_multiproc_dir
+    clear_multiproc_dir(os.environ['METRICS_MULTIPROC_DIR'])
+
+
+def when_ready(server):
+    if preload_app:
+        from healthcare_plans_bo.preload import freeze, warm
+        warm()
+        # Before the first fork; pre_fork freezes what is new before later ones (restarts)
+        freeze()
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from healthcare_plans_bo.preload import freeze
+        freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def worker_exit(server, worker):
+    # Queued audit events are written before the worker goes away
+    from healthcare_plans_bo.audit import audit_log
+    audit_log.close()
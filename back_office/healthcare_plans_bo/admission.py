@@ -0,0 +1,155 @@
+"""
+Admission control and load shedding.
+
+Every view belongs to a priority class (``@priority('expensive')`` on the
+view or APIView class; the rest are ``default``). ADMISSION_CLASSES gives
+each limited class, per worker process:
+
+    <class>=<concurrent requests>:<max queued>:<queue timeout seconds>
+
+The default, ``expensive=2:1:0.25,default=3:1:0.5``, fits the 4 threads per
+worker of gunicorn.conf.py: password hashing never holds more than half of
+them, and one thread is left for classes without a limit (``critical``:
+the welcome page and the like). A request that finds its class full waits
+in the class queue, holding its thread, so queues are short; when the queue
+is full or the wait times out it is shed with 503 and Retry-After instead
+of adding to everyone's latency. /metrics is never shed.
+
+ADMISSION_CONTROL turns this on; it defaults to on only when DEBUG is off,
+as the limits would shed a development server's bursts.
+
+Limits, in-flight and queued requests and rejections are exported as
+admission_* metrics.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from .metrics import ADMISSION_REJECTED, registry
+
+DEFAULT_PRIORITY = 'default'
+EXEMPT_URL_NAMES = ('metrics',)
+
+# Classes of the running process, read by the scrape-time gauges
+_classes: Dict[str, 'PriorityClass'] = {}
+
+
+def priority(name: str):
+    """Assign a view (function or APIView class) to a priority class."""
+    def decorator(view):
+        view.priority_class = name
+        return view
+    return decorator
+
+
+# PriorityClass and parse_classes match flask_back_office/admission.py. The Docker
+# build context is back_office/ alone, so the Flask copy cannot be imported here;
+# a fix to one belongs in the other.
+class PriorityClass:
+    """Concurrency limit with a bounded, timed wait queue."""
+
+    def __init__(self, name: str, limit: int, max_queued: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> Optional[str]:
+        """Take a slot; return why the request is rejected, or None once admitted."""
+        with self._cond:
+            if self.active < self.limit and not self.queued:
+                self.active += 1
+                return None
+            if self.queued >= self.max_queued:
+                return 'queue_full'
+
+            self.queued += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                return None
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+def parse_classes(spec: str) -> Dict[str, PriorityClass]:
+    """``expensive=2:1:0.25,default=3:1:0.5`` -> {name: PriorityClass}."""
+    classes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, values = entry.partition('=')
+        try:
+            limit, max_queued, timeout = values.split(':')
+            classes[name.strip()] = PriorityClass(name.strip(), int(limit), int(max_queued), float(timeout))
+        except ValueError:
+            raise ValueError(f'Invalid ADMISSION_CLASSES entry {entry!r}, expected <class>=<limit>:<queue>:<timeout>')
+    return classes
+
+
+def _gauge(attribute: str):
+    return lambda: {(name,): getattr(priority_class, attribute) for name, priority_class in _classes.items()}
+
+
+registry.gauge_callback('admission_limit', 'Concurrent requests allowed per priority class',
+                        ['priority'], _gauge('limit'))
+registry.gauge_callback('admission_in_flight', 'Admitted requests being served per priority class',
+                        ['priority'], _gauge('active'))
+registry.gauge_callback('admission_queued', 'Requests waiting for admission per priority class',
+                        ['priority'], _gauge('queued'))
+
+
+class AdmissionControlMiddleware:
+    """Limit concurrent requests per priority class and shed the excess with 503."""
+
+    def __init__(self, get_response):
+        if not settings.ADMISSION_CONTROL:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.classes = parse_classes(settings.ADMISSION_CLASSES)
+        self.retry_after = settings.ADMISSION_RETRY_AFTER
+        _classes.clear()
+        _classes.update(self.classes)
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            priority_class = getattr(request, 'admission_class', None)
+            if priority_class is not None:
+                priority_class.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.url_name in EXEMPT_URL_NAMES:
+            return None
+        view_class = getattr(view_func, 'view_class', None)
+        name = getattr(view_func, 'priority_class', getattr(view_class, 'priority_class', DEFAULT_PRIORITY))
+        priority_class = self.classes.get(name)
+        if priority_class is None:
+            return None
+
+        rejected = priority_class.acquire()
+        if rejected is None:
+            request.admission_class = priority_class
+            return None
+
+        ADMISSION_REJECTED.inc(name, rejected)
+        response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+        response['Retry-After'] = str(self.retry_after)
+        return response
@@ -0,0 +1,220 @@
+"""
+Audit and access log.
+
+Services record what a user did (registrations, logins, logouts and
+profile changes) with ``audit(action, user_id, ...)``, once the transaction
+that did it has committed; with AUDIT_ACCESS_LOG, AuditMiddleware also
+records every request as an ``access`` event. The request thread only puts
+the event on a bounded queue (AUDIT_QUEUE_SIZE). A background writer takes
+up to AUDIT_BATCH_SIZE events at a time, waiting at most
+AUDIT_FLUSH_INTERVAL seconds for a batch to fill, and writes each batch as
+JSON lines through the ``healthcare_plans_bo.audit`` logger, which
+settings.LOGGING sends to a rotating file.
+
+A full queue pushes back: the caller waits up to AUDIT_ENQUEUE_TIMEOUT_MS
+for room before the event is dropped. Waits, drops, writes and failures
+are counted in ``audit_events_total``, with the queue depth and the batch
+write time alongside. When a worker exits (gunicorn's ``worker_exit`` hook,
+or the interpreter's exit) the writer drains the queue before it stops.
+
+Events name the fields a change touched, never their values, so no
+customer data reaches the log.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+
+from .metrics import AUDIT_EVENTS, AUDIT_WRITE_SECONDS, registry
+
+audit_logger = logging.getLogger('healthcare_plans_bo.audit')
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_current_request = contextvars.ContextVar('audit_request', default=None)
+
+
+# Queue, batching and drain as in flask_back_office/audit.py, which adds a table
+# sink and takes its limits from the app config. back_office/ is built as its own
+# Docker context and cannot import the Flask package, so fix both.
+class AuditLog:
+    """Queues events on the request thread and writes them in batches off it."""
+
+    def __init__(self):
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def record(self, event: Dict[str, Any]):
+        """Queue ``event`` for the writer, waiting briefly for room when the queue is full."""
+        if self._closed and self._pid == os.getpid():
+            # Shutting down: nothing will drain the queue any more
+            self._write([event])
+            return
+
+        events = self._ensure_writer()
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            AUDIT_EVENTS.inc(event['kind'], 'waited')
+            try:
+                events.put(event, timeout=settings.AUDIT_ENQUEUE_TIMEOUT_MS / 1000)
+            except queue.Full:
+                AUDIT_EVENTS.inc(event['kind'], 'dropped')
+                return
+        AUDIT_EVENTS.inc(event['kind'], 'queued')
+
+    def _ensure_writer(self) -> queue.Queue:
+        # Threads do not survive fork, so (re)start lazily in each worker, with its own queue
+        if self._thread is not None and self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid, self._closed = os.getpid(), False
+                self._queue = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='audit-log', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self, events: queue.Queue):
+        stopping = False
+        while not stopping:
+            batch = [events.get()]
+            deadline = time.monotonic() + settings.AUDIT_FLUSH_INTERVAL
+            while len(batch) < settings.AUDIT_BATCH_SIZE and batch[-1] is not _STOP:
+                try:
+                    batch.append(events.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                # Whatever is still queued goes out before the writer stops
+                batch.pop()
+                stopping = True
+                while True:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stopping):
+                events.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            audit_logger.info('\n'.join(json.dumps(event, default=str) for event in batch))
+        except Exception:
+            logger.exception('Writing %d audit events failed', len(batch))
+            outcome = 'failed'
+        else:
+            outcome = 'written'
+        AUDIT_WRITE_SECONDS.observe(time.perf_counter() - start, 'file')
+        for event in batch:
+            AUDIT_EVENTS.inc(event['kind'], outcome)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued events have been written (tests)."""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout: float = 10.0):
+        """Write every queued event and stop the writer (worker exit)."""
+        with self._lock:
+            thread, events = self._thread, self._queue
+            if thread is None or self._pid != os.getpid() or self._closed:
+                return
+            self._closed = True
+        try:
+            events.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error('Audit writer did not drain its queue in %.1fs', timeout)
+            return
+        thread.join(timeout)
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.close)
+
+registry.gauge_callback('audit_queue_depth', 'Audit events waiting for the writer', [],
+                        lambda: {(): audit_log.depth()})
+
+
+def _route(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return f'/{match.route}' if match is not None else request.path
+
+
+def _event(kind: str, action: str, outcome: str, user_id: Optional[int], **fields) -> Dict[str, Any]:
+    event = {
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'kind': kind,
+        'action': action,
+        'outcome': outcome,
+        'user_id': user_id,
+        'method': None,
+        'route': None,
+        'status': None,
+        'duration_ms': None,
+        'remote_addr': None,
+        'details': None,
+    }
+    request = _current_request.get()
+    if request is not None:
+        event['method'] = request.method
+        event['route'] = _route(request)
+        event['remote_addr'] = request.META.get('REMOTE_ADDR')
+    event.update(fields)
+    return event
+
+
+def audit(action: str, user_id: Optional[int], outcome: str = 'success', **details):
+    """Record ``action`` by ``user_id`` once the current transaction commits."""
+    if not settings.AUDIT_LOG:
+        return
+    event = _event('audit', action, outcome, user_id, details=details or None)
+    transaction.on_commit(lambda: audit_log.record(event))
+
+
+class AuditMiddleware:
+    """Make the request known to ``audit`` and record an access event for it."""
+
+    def __init__(self, get_response):
+        if not settings.AUDIT_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            if settings.AUDIT_ACCESS_LOG:
+                # DRF sets the authenticated (JWT) user on the underlying request
+                user = getattr(request, 'user', None)
+                audit_log.record(_event(
+                    'access', 'request', 'success' if response.status_code < 400 else 'failure',
+                    user.id if user is not None and user.is_authenticated else None,
+                    status=response.status_code,
+                    duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                ))
+            return response
+        finally:
+            _current_request.reset(token)
@@ -0,0 +1,100 @@
+"""
+Read-replica routing.
+
+Every ``replica_<n>`` alias in DATABASES (built from DB_REPLICAS in
+settings) is a read replica of ``default``. ``ReplicaRouter`` sends reads
+made while serving GET/HEAD/OPTIONS requests to one replica chosen per
+request. Everything else goes to the primary:
+
+- writes, and every read of a request after its first write
+  (read-your-writes)
+- every read of POST/PUT/PATCH/DELETE requests, so a read-then-write never
+  acts on a stale row
+- management commands and other work outside a request
+
+A request that wrote sets a short-lived cookie that keeps the same client
+on the primary for DATABASE_REPLICA_PIN_SECONDS, long enough for the
+replicas to catch up, whichever worker serves the next request.
+
+Try it locally with two SQLite files (the copy plays a lagging replica):
+
+    cp db.sqlite3 replica.sqlite3
+    DB_REPLICAS=replica.sqlite3 python manage.py runserver
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing: ContextVar[Optional[dict]] = ContextVar('db_routing', default=None)
+
+
+def replica_aliases() -> List[str]:
+    return sorted(alias for alias in settings.DATABASES if alias.startswith(REPLICA_ALIAS_PREFIX))
+
+
+@contextmanager
+def replica_reads(alias: Optional[str]):
+    """Route reads inside the block to ``alias`` (``None``: primary) until the first write."""
+    state = {'replica': alias, 'wrote': False}
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    """Reads go to the request's replica, if it has one; writes always go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state['wrote'] or state['replica'] is None:
+            # Explicit, or Django would follow an instance hint back to the replica
+            return DEFAULT_DB_ALIAS
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Pick the replica for each request and pin clients that wrote to the primary."""
+
+    def __init__(self, get_response):
+        self.replicas = replica_aliases()
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = settings.DATABASE_REPLICA_PIN_COOKIE
+        self.pin_seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        replica = None
+        if request.method in SAFE_METHODS and not request.COOKIES.get(self.cookie):
+            replica = random.choice(self.replicas)
+
+        with replica_reads(replica) as state:
+            response = self.get_response(request)
+
+        if state['wrote']:
+            response.set_cookie(self.cookie, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
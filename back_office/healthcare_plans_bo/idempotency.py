@@ -0,0 +1,125 @@
+"""
+Idempotency keys for mutating requests.
+
+A POST/PUT/PATCH/DELETE carrying an ``Idempotency-Key`` header runs once;
+retries with the same key get the stored response back, marked
+``Idempotent-Replayed: true``. Keys are scoped to the caller (Authorization
+header), method and path. Reusing a key for a different request body is
+rejected with 422.
+
+A retry arriving while the first request is still running waits for it
+(up to IDEMPOTENCY_WAIT_SECONDS, then 409 with Retry-After) instead of
+running the work a second time. 5xx and auth/rate-limit responses are not
+stored, so those retries run again.
+
+Responses live for IDEMPOTENCY_TTL seconds in the ``idempotency`` cache
+(settings.CACHES). It is a per-process LocMemCache bounded by
+IDEMPOTENCY_MAX_ENTRIES; with IDEMPOTENCY_STORE=sql it is a DatabaseCache
+shared by every worker:
+
+    IDEMPOTENCY_STORE=sql python manage.py createcachetable
+"""
+
+import hashlib
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse
+
+from .metrics import IDEMPOTENCY_REQUESTS
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+MAX_KEY_LENGTH = 255
+# Responses a retry should not get back: the client can fix these and retry
+RETRYABLE_STATUSES = (401, 403, 408, 429)
+UNSTORED_HEADERS = ('Content-Length',)
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for repeated Idempotency-Keys and coalesce concurrent duplicates."""
+
+    def __init__(self, get_response):
+        if not settings.IDEMPOTENCY_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cache = caches[settings.IDEMPOTENCY_CACHE]
+        self.ttl = settings.IDEMPOTENCY_TTL
+        self.lock_seconds = settings.IDEMPOTENCY_LOCK_SECONDS
+        self.wait_seconds = settings.IDEMPOTENCY_WAIT_SECONDS
+
+    def __call__(self, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or request.method not in MUTATING_METHODS:
+            return self.get_response(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                                status=400)
+
+        cache_key = self._cache_key(request, key)
+        fingerprint = hashlib.sha256(request.META.get('QUERY_STRING', '').encode() + b'\n' + request.body).hexdigest()
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            # add() is atomic: exactly one concurrent request claims the key
+            if self.cache.add(cache_key, {'fingerprint': fingerprint}, self.lock_seconds):
+                IDEMPOTENCY_REQUESTS.inc('executed')
+                return self._run(request, cache_key, fingerprint)
+
+            entry = self.cache.get(cache_key)
+            if entry is None:
+                # Expired or released between add() and get()
+                continue
+            if entry['fingerprint'] != fingerprint:
+                IDEMPOTENCY_REQUESTS.inc('mismatch')
+                return JsonResponse({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                                    status=422)
+            if 'status' in entry:
+                IDEMPOTENCY_REQUESTS.inc('coalesced' if waited else 'replayed')
+                return self._replay(entry)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENCY_REQUESTS.inc('conflict')
+                response = JsonResponse(
+                    {'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'}, status=409)
+                response['Retry-After'] = str(max(1, int(self.wait_seconds)))
+                return response
+            waited = True
+            time.sleep(min(POLL_INTERVAL, remaining))
+
+    def _run(self, request, cache_key: str, fingerprint: str) -> HttpResponse:
+        response: Optional[HttpResponse] = None
+        try:
+            response = self.get_response(request)
+        finally:
+            status = response.status_code if response is not None else 500
+            if status >= 500 or status in RETRYABLE_STATUSES or response.streaming:
+                self.cache.delete(cache_key)
+            else:
+                self.cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': status,
+                    'headers': [(name, value) for name, value in response.items() if name not in UNSTORED_HEADERS],
+                    'content': response.content,
+                }, self.ttl)
+        return response
+
+    @staticmethod
+    def _cache_key(request, key: str) -> str:
+        caller = request.headers.get('Authorization', '')
+        scoped = f'{caller}\n{request.method}\n{request.path}\n{key}'
+        return f'idempotency:{hashlib.sha256(scoped.encode()).hexdigest()}'
+
+    @staticmethod
+    def _replay(entry: dict) -> HttpResponse:
+        response = HttpResponse(entry['content'], status=entry['status'])
+        for name, value in entry['headers']:
+            response[name] = value
+        response[REPLAYED_HEADER] = 'true'
+        return response
@@ -0,0 +1,159 @@
+"""
+SQL query instrumentation.
+
+Counts and times every statement executed while handling a request (through
+``connection.execute_wrapper``), flags statement shapes that repeat within
+one request (N+1 patterns) and enforces the query budget a view declares
+with ``@query_budget``.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:%s|\?|%\(\w+\)s)"
+_IN_LIST = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")*\s*\)")
+_WHITESPACE = re.compile(r'\s+')
+# Transaction control depends on atomic() nesting (SQLite issues BEGIN, a
+# TestCase turns it into SAVEPOINTs), so it is not counted; budgets then mean
+# the same in tests and production.
+_TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE)
+
+_current: ContextVar[Optional['QueryStats']] = ContextVar('query_stats', default=None)
+
+
+def statement_shape(sql: str) -> str:
+    """Normalize a statement so executions differing only in values compare equal."""
+    shape = _LITERALS.sub('?', sql)
+    shape = _IN_LIST.sub('(...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view or block runs more queries than it declared."""
+
+
+class QueryStats:
+    """Queries executed within one request or tracked block."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, sql: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(sql)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Return statement shapes executed at least ``threshold`` times (likely N+1)."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f} ms']
+        for shape, n in self.shapes.most_common(limit):
+            lines.append(f'  {n:>4}x {shape}')
+        return '\n'.join(lines)
+
+
+class _QueryRecorder:
+    """``execute_wrapper`` callable feeding one QueryStats."""
+
+    def __init__(self, stats: QueryStats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not _TRANSACTION_CONTROL.match(sql):
+                self.stats.record(sql, time.perf_counter() - start)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Return the innermost QueryStats collecting in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def track_queries():
+    """Collect every query executed inside the block, on every database alias."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_QueryRecorder(stats)))
+            yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """
+    Test helper: fail when the block executes more than ``max_queries``.
+
+        with assert_max_queries(3):
+            self.client.get('/api/v1/accounts/profile/')
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(f'Query budget of {max_queries} exceeded: {stats.report()}')
+
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of queries a view (function or class) may execute."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class QueryInstrumentationMiddleware:
+    """Per-request query accounting, N+1 warnings and query budget enforcement."""
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as stats:
+            request.query_stats = stats
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        route = f"{request.method} /{match.route if match else request.path.lstrip('/')}"
+
+        for shape, n in stats.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD):
+            logger.warning('Possible N+1 on %s: %d executions of %s', route, n, shape)
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and stats.count > budget:
+            message = f'{route} exceeded its query budget of {budget}: {stats.report()}'
+            if settings.SQL_QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        if settings.SQL_TIMING_HEADER:
+            response['Server-Timing'] = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        request.query_budget = getattr(view_func, 'query_budget', getattr(view_class, 'query_budget', None))
@@ -0,0 +1,135 @@
+"""
+Memory footprint report.
+
+Prints RSS / PSS / USS for a gunicorn master and each of its workers (Linux
+/proc only). USS is the memory a worker does not share with anybody, i.e.
+what each additional worker really costs.
+
+    python -m healthcare_plans_bo.memory_report [master_pid] [--json]
+
+The Flask backend keeps a copy in flask_back_office/memory_report.py. Each
+backend is built and deployed from its own directory (the Docker context is
+back_office/ alone), so nothing outside it can be imported: fix both.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps(pid: int) -> Dict[str, int]:
+    """Return the smaps_rollup counters of a process in KiB."""
+    values = dict.fromkeys(SMAPS_FIELDS, 0)
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        path = f'/proc/{pid}/smaps'
+
+    with open(path) as fh:
+        for line in fh:
+            key, _, rest = line.partition(':')
+            if key in values:
+                values[key] += int(rest.split()[0])
+    return values
+
+
+def read_argv(pid: int) -> List[str]:
+    with open(f'/proc/{pid}/cmdline', 'rb') as fh:
+        return [arg.decode(errors='replace') for arg in fh.read().split(b'\0') if arg]
+
+
+def read_ppid(pid: int) -> int:
+    with open(f'/proc/{pid}/stat') as fh:
+        # comm may contain spaces, so split after the closing parenthesis
+        return int(fh.read().rsplit(')', 1)[1].split()[1])
+
+
+def list_pids() -> List[int]:
+    return [int(name) for name in os.listdir('/proc') if name.isdigit()]
+
+
+def find_children(ppid: int) -> List[int]:
+    children = []
+    for pid in list_pids():
+        try:
+            if read_ppid(pid) == ppid:
+                children.append(pid)
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(children)
+
+
+def find_gunicorn_master() -> Optional[int]:
+    """Return the gunicorn process whose parent is not gunicorn itself."""
+    gunicorn_pids = set()
+    for pid in list_pids():
+        try:
+            # argv[0] is the interpreter when gunicorn runs as a script
+            if any(os.path.basename(arg).startswith('gunicorn') for arg in read_argv(pid)[:2]):
+                gunicorn_pids.add(pid)
+        except OSError:
+            continue
+
+    for pid in sorted(gunicorn_pids):
+        try:
+            if read_ppid(pid) not in gunicorn_pids:
+                return pid
+        except (OSError, IndexError, ValueError):
+            continue
+    return None
+
+
+def collect(master_pid: int) -> List[Dict]:
+    rows = []
+    for role, pid in [('master', master_pid)] + [('worker', p) for p in find_children(master_pid)]:
+        try:
+            smaps = read_smaps(pid)
+        except OSError:
+            continue
+        rows.append({
+            'pid': pid,
+            'role': role,
+            'rss_kb': smaps['Rss'],
+            'pss_kb': smaps['Pss'],
+            'uss_kb': smaps['Private_Clean'] + smaps['Private_Dirty'],
+            'shared_kb': smaps['Shared_Clean'] + smaps['Shared_Dirty'],
+        })
+    return rows
+
+
+def format_table(rows: List[Dict]) -> str:
+    lines = [f"{'PID':>8} {'ROLE':<7} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9} {'SHARED MiB':>11}"]
+    for row in rows:
+        lines.append(
+            f"{row['pid']:>8} {row['role']:<7} {row['rss_kb'] / 1024:>9.1f} {row['pss_kb'] / 1024:>9.1f} "
+            f"{row['uss_kb'] / 1024:>9.1f} {row['shared_kb'] / 1024:>11.1f}"
+        )
+
+    workers = [r for r in rows if r['role'] == 'worker']
+    if workers:
+        total_pss = sum(r['pss_kb'] for r in rows) / 1024
+        avg_uss = sum(r['uss_kb'] for r in workers) / len(workers) / 1024
+        lines.append(f"total PSS: {total_pss:.1f} MiB, cost per extra worker (avg USS): {avg_uss:.1f} MiB")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-worker RSS/PSS/USS of a gunicorn master')
+    parser.add_argument('pid', nargs='?', type=int, help='gunicorn master pid (auto-detected if omitted)')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    master_pid = args.pid or find_gunicorn_master()
+    if not master_pid:
+        print('No gunicorn master found; pass its pid explicitly', file=sys.stderr)
+        return 1
+
+    rows = collect(master_pid)
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Preload (copy-on-write friendly worker startup).
+
+Used by gunicorn.conf.py when ``preload_app`` is enabled: the project is set
+up once in the gunicorn master so forked workers share its memory pages.
+"""
+
+import gc
+
+
+def warm():
+    """Load shared, read-mostly data in the master before workers are forked."""
+    from django.apps import apps
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # Import every view module and compile the URL patterns
+    get_resolver().url_patterns
+
+    # Build the model _meta caches (fields, relations, reverse relations)
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+    # DRF serializers build their field maps lazily on first use
+    from accounts.api.serializers import UserSerializer, UserProfileSerializer
+    UserSerializer().fields
+    UserProfileSerializer().fields
+
+    # Never hand open database connections over to the children
+    connections.close_all()
+
+    gc.collect()
+
+
+def freeze():
+    """
+    Move every object tracked so far into the permanent GC generation.
+
+    Called right before fork so the collector in the workers never touches
+    (and therefore never copies) the pages holding preloaded objects.
+    """
+    gc.freeze()
@@ -0,0 +1,213 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries a valid signed ``X-Profile`` header or
+is picked by PROFILING_SAMPLE_RATE. PROFILING_MODE selects the profiler:
+
+- ``cprofile`` writes ``<name>.pstats`` (``python -m pstats``, snakeviz)
+- ``sampling`` samples the request thread's stack every
+  PROFILING_SAMPLE_INTERVAL_MS and writes ``<name>.folded`` collapsed stacks
+  (flamegraph.pl, speedscope)
+
+Either way ``<name>.json`` holds route, status and timing. With neither a
+secret nor a sample rate configured the middleware raises MiddlewareNotUsed,
+so unprofiled requests pay nothing.
+
+The header value is ``<expires>.<hmac-sha256(PROFILING_SECRET, expires)>``:
+
+    python -m healthcare_plans_bo.profiling --ttl 300
+"""
+
+import argparse
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9]+')
+
+
+def sign_token(secret: str, ttl: int = 300) -> str:
+    """Return an ``X-Profile`` value valid for ``ttl`` seconds."""
+    expires = str(int(time.time()) + ttl)
+    signature = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+
+def verify_token(secret: str, token: str) -> bool:
+    """Check the signature and expiry of an ``X-Profile`` value."""
+    expires, _, signature = token.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class CProfileSession:
+    """Deterministic profile of the calling thread."""
+
+    extension = 'pstats'
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def dump(self, path: str):
+        self._profiler.dump_stats(path)
+
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread (collapsed-stack output)."""
+
+    extension = 'folded'
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w') as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """Profile selected requests through the rest of the middleware stack."""
+
+    def __init__(self, get_response):
+        self.secret = settings.PROFILING_SECRET
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if not self.secret and not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.mode = settings.PROFILING_MODE
+        if self.mode not in ('cprofile', 'sampling'):
+            raise ImproperlyConfigured(f'Unknown PROFILING_MODE {self.mode!r}')
+        self.sample_interval = settings.PROFILING_SAMPLE_INTERVAL_MS / 1000
+        self.output_dir = settings.PROFILING_OUTPUT_DIR
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profiler = CProfileSession() if self.mode == 'cprofile' else StackSampler(self.sample_interval)
+        start = time.perf_counter()
+        profiler.start()
+        response = None
+        try:
+            response = self.get_response(request)
+            if getattr(response, 'streaming', False) and not getattr(response, 'is_async', False):
+                self._materialize(response)
+            return response
+        finally:
+            profiler.stop()
+            duration = time.perf_counter() - start
+            self._write(profiler, request, trigger, duration, getattr(response, 'status_code', None))
+
+    @staticmethod
+    def _materialize(response):
+        """Render a streaming response's content inside the profile, as the Flask middleware does.
+
+        The original iterable stays registered with the response, so the
+        server's ``response.close()`` still closes it; when rendering fails
+        the response is closed here, since it will never reach the server.
+        """
+        try:
+            content = b''.join(response.streaming_content)
+        except BaseException:
+            if hasattr(response, 'close'):
+                response.close()
+            raise
+        response.streaming_content = [content]
+
+    def _trigger(self, request) -> Optional[str]:
+        token = request.META.get('HTTP_X_PROFILE')
+        if token and self.secret and verify_token(self.secret, token):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _write(self, profiler, request, trigger, duration, status):
+        match = getattr(request, 'resolver_match', None)
+        route = f'/{match.route}' if match is not None else '<unmatched>'
+        now = datetime.now(timezone.utc)
+        name = '{}_{}_{}_{}ms_{}'.format(
+            now.strftime('%Y%m%dT%H%M%S%f'), request.method, _UNSAFE.sub('-', route).strip('-') or 'root',
+            int(duration * 1000), os.getpid()
+        )
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, name)
+        profiler.dump(f'{base}.{profiler.extension}')
+        with open(f'{base}.json', 'w') as fh:
+            json.dump({
+                'ts': now.isoformat(),
+                'method': request.method,
+                'route': route,
+                'path': request.path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 3),
+                'trigger': trigger,
+                'mode': self.mode,
+                'pid': os.getpid(),
+            }, fh, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print a signed X-Profile header value.')
+    parser.add_argument('--ttl', type=int, default=300, help='seconds the token stays valid')
+    args = parser.parse_args(argv)
+
+    secret = os.getenv('PROFILING_SECRET')
+    if not secret:
+        print('PROFILING_SECRET is not set', file=sys.stderr)
+        return 1
+    print(sign_token(secret, args.ttl))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
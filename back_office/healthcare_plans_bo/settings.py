@@ -41,6 +41,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'healthcare_plans_bo.metrics.MetricsMiddleware',  # Outermost, so it times the whole stack
+    'healthcare_plans_bo.audit.AuditMiddleware',  # Access log; lets services' audit events name the request
+    'healthcare_plans_bo.profiling.ProfilingMiddleware',  # No-op unless PROFILING_* is configured
+    'healthcare_plans_bo.admission.AdmissionControlMiddleware',  # Sheds excess load before any work is done
+    'healthcare_plans_bo.db_routing.ReplicaRoutingMiddleware',  # No-op unless DB_REPLICAS is set
     'corsheaders.middleware.CorsMiddleware',  # Must be at top
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -50,6 +55,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'healthcare_plans_bo.idempotency.IdempotencyMiddleware',  # Inside CORS, so replays get fresh headers
+    'healthcare_plans_bo.instrumentation.QueryInstrumentationMiddleware',
+    'healthcare_plans_bo.slow_query.SlowQueryMiddleware',
 ]
 
 ROOT_URLCONF = 'healthcare_plans_bo.urls'
@@ -77,10 +85,17 @@ WSGI_APPLICATION = 'healthcare_plans_bo.wsgi.application'
 
 DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
 
+# SQLite high-concurrency mode for single-node installs - WAL, one queued
+# writer per database file (healthcare_plans_bo/sqlite_backend)
+SQLITE_HIGH_CONCURRENCY = os.getenv('SQLITE_HIGH_CONCURRENCY', 'False').lower() == 'true'
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
 if DB_ENGINE == 'django.db.backends.sqlite3':
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'healthcare_plans_bo.sqlite_backend' if SQLITE_HIGH_CONCURRENCY else DB_ENGINE,
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
@@ -96,6 +111,137 @@ else:
         }
     }
 
+# Read replicas - comma-separated SQLite files or PostgreSQL host[:port]s of
+# copies of the default database; safe-method reads go to them
+DB_REPLICAS = [replica.strip() for replica in os.getenv('DB_REPLICAS', '').split(',') if replica.strip()]
+for index, replica in enumerate(DB_REPLICAS):
+    if DB_ENGINE == 'django.db.backends.sqlite3':
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['healthcare_plans_bo.db_routing.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', 15))
+DATABASE_REPLICA_PIN_COOKIE = os.getenv('DATABASE_REPLICA_PIN_COOKIE', 'db_pin_primary')
+
+# SQL instrumentation - per-request query counts, N+1 detection, budgets
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'True').lower() == 'true'
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5))
+SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+SQL_TIMING_HEADER = DEBUG
+
+# Slow query log - JSON lines with EXPLAIN output, written off the request path
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'True').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 60))
+SLOW_QUERY_QUEUE_SIZE = int(os.getenv('SLOW_QUERY_QUEUE_SIZE', 1000))
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', str(BASE_DIR / 'logs' / 'slow_queries.log'))
+
+if SLOW_QUERY_LOG_FILE:
+    os.makedirs(os.path.dirname(SLOW_QUERY_LOG_FILE), exist_ok=True)
+
+# Audit/access log - events queued by requests, written in batches as JSON lines off the request path
+AUDIT_LOG = os.getenv('AUDIT_LOG', 'True').lower() == 'true'
+AUDIT_ACCESS_LOG = os.getenv('AUDIT_ACCESS_LOG', 'True').lower() == 'true'
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_ENQUEUE_TIMEOUT_MS = float(os.getenv('AUDIT_ENQUEUE_TIMEOUT_MS', 50))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 0.5))
+AUDIT_LOG_FILE = os.getenv('AUDIT_LOG_FILE', str(BASE_DIR / 'logs' / 'audit.log'))
+
+if AUDIT_LOG_FILE:
+    os.makedirs(os.path.dirname(AUDIT_LOG_FILE), exist_ok=True)
+
+# Prometheus metrics on /metrics (multiprocess mode when a directory is set)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN')
+
+# Per-request profiling - signed X-Profile header and/or random sampling
+PROFILING_SECRET = os.getenv('PROFILING_SECRET')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile')
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 5))
+PROFILING_OUTPUT_DIR = os.getenv('PROFILING_OUTPUT_DIR', str(BASE_DIR / 'logs' / 'profiles'))
+
+# Admission control - per worker <class>=<concurrency>:<max queued>:<queue
+# timeout s>, see healthcare_plans_bo/admission.py; on by default only when
+# DEBUG is off, the limits are sized for gunicorn workers
+ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', str(not DEBUG)).lower() == 'true'
+ADMISSION_CLASSES = os.getenv('ADMISSION_CLASSES', 'expensive=2:1:0.25,default=3:1:0.5')
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+
+# Idempotency-Key on mutating requests - memory (per worker) or sql (shared,
+# needs `manage.py createcachetable`) store
+IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+IDEMPOTENCY_STORE = os.getenv('IDEMPOTENCY_STORE', 'memory')
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    IDEMPOTENCY_CACHE: {
+        'BACKEND': {
+            'memory': 'django.core.cache.backends.locmem.LocMemCache',
+            'sql': 'django.core.cache.backends.db.DatabaseCache',
+        }[IDEMPOTENCY_STORE],
+        'LOCATION': 'idempotency_keys',
+        'TIMEOUT': IDEMPOTENCY_TTL,
+        'OPTIONS': {'MAX_ENTRIES': IDEMPOTENCY_MAX_ENTRIES},
+    },
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            'backupCount': int(os.getenv('SLOW_QUERY_LOG_BACKUP_COUNT', 5)),
+            'formatter': 'json_lines',
+        } if SLOW_QUERY_LOG_FILE else {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_lines',
+        },
+        'audit': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': AUDIT_LOG_FILE,
+            'maxBytes': int(os.getenv('AUDIT_LOG_MAX_BYTES', 50 * 1024 * 1024)),
+            'backupCount': int(os.getenv('AUDIT_LOG_BACKUP_COUNT', 10)),
+            'formatter': 'json_lines',
+        } if AUDIT_LOG_FILE else {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'healthcare_plans_bo.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'healthcare_plans_bo.audit': {
+            'handlers': ['audit'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -0,0 +1,179 @@
+"""
+Slow query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are recorded with their
+parameter shape (types only, never values), the DAO method that issued them
+and the request route. The request thread only enqueues the record; a
+background thread runs ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on SQLite) and
+writes one JSON line per query through the ``healthcare_plans_bo.slow_queries``
+logger, which settings.LOGGING sends to a rotating file.
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+slow_query_logger = logging.getLogger('healthcare_plans_bo.slow_queries')
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN (FORMAT JSON) ',
+    'mysql': 'EXPLAIN FORMAT=JSON ',
+}
+
+
+def parameter_shape(params: Any) -> Any:
+    """Describe bound parameters by type so no customer data reaches the log."""
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (dict, list, tuple)):
+            return {'rows': len(params), 'row': parameter_shape(params[0])}
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+def calling_dao_method() -> Optional[str]:
+    """Return the qualified name of the innermost ``*.dao`` function on the stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get('__name__', '').endswith('.dao'):
+            code = frame.f_code
+            return f"{frame.f_globals['__name__']}.{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """Collects slow statements and explains/writes them off the request path."""
+
+    def __init__(self):
+        self.dropped = 0
+        self._queue = None
+        self._explained_at: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def record(self, alias: str, sql: str, params: Any, duration: float, many: bool, route: Optional[str]):
+        """Capture context on the calling thread and hand the rest to the writer."""
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'statement': sql,
+            'params_shape': parameter_shape(params),
+            'dao': calling_dao_method(),
+            'route': route,
+            'database': alias,
+            'pid': os.getpid(),
+        }
+        explainable = not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH')
+        job = {'entry': entry, 'params': params if explainable else None, 'explain': explainable}
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so (re)start lazily in each worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=settings.SLOW_QUERY_QUEUE_SIZE)
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            entry = job['entry']
+            try:
+                if settings.SLOW_QUERY_EXPLAIN and job['explain'] and self._should_explain(entry['statement']):
+                    entry['plan'] = self._explain(entry['database'], entry['statement'], job['params'])
+            except Exception as e:
+                entry['explain_error'] = str(e)
+            slow_query_logger.info(json.dumps(entry, default=str))
+            self._queue.task_done()
+
+    def _should_explain(self, sql: str) -> bool:
+        """Explain a given statement at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds."""
+        now = time.monotonic()
+        last = self._explained_at.get(sql)
+        if last is not None and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        if len(self._explained_at) > 10000:
+            self._explained_at.clear()
+        self._explained_at[sql] = now
+        return True
+
+    def _explain(self, alias: str, sql: str, params: Any):
+        connection = connections[alias]
+        prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+        if prefix is None:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [list(row) for row in cursor.fetchall()]
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued entries have been written (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+slow_query_log = SlowQueryLog()
+
+
+class _SlowQueryRecorder:
+    """``execute_wrapper`` callable timing statements on one database alias."""
+
+    def __init__(self, alias: str, request):
+        self.alias = alias
+        self.request = request
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                slow_query_log.record(self.alias, sql, params, duration, many, self.route())
+
+    def route(self) -> str:
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None:
+            return f'{self.request.method} {self.request.path}'
+        return f'{self.request.method} /{match.route}'
+
+
+class SlowQueryMiddleware:
+    """Time every statement of a request and log the slow ones."""
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_SlowQueryRecorder(connection.alias, request)))
+            return self.get_response(request)
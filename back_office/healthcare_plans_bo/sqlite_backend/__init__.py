@@ -0,0 +1,19 @@
+"""
+SQLite high-concurrency backend for single-node installs.
+
+Enabled with SQLITE_HIGH_CONCURRENCY=True (see settings). On top of the
+stock ``django.db.backends.sqlite3`` backend every connection:
+
+- runs in WAL mode, so readers and the writer never block each other;
+- uses SQLITE_SYNCHRONOUS (NORMAL: an application crash loses nothing, a
+  power cut may lose the last commits but never the database),
+  SQLITE_BUSY_TIMEOUT_MS and SQLITE_MMAP_SIZE;
+- starts ``atomic`` blocks with BEGIN IMMEDIATE, so a transaction that read
+  first can no longer fail to upgrade to a write lock (the "database is
+  locked" error busy_timeout cannot retry);
+- admits one ``atomic`` block per database file at a time: a worker's
+  threads wait in FIFO order instead of busy-polling the file lock, which
+  only arbitrates between worker processes.
+
+Statements outside ``atomic`` run in autocommit and are not queued.
+"""
@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+from typing import Dict
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+_queues: Dict[str, 'WriterQueue'] = {}
+_queues_lock = threading.Lock()
+
+
+# Same queue as flask_back_office/sqlite_mode.py. The Docker build context is
+# back_office/ alone, so the Flask copy cannot be imported; change both.
+class WriterQueue:
+    """Lock that admits writers in arrival order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._busy = False
+
+    def acquire(self):
+        with self._lock:
+            if not self._busy:
+                self._busy = True
+                return
+            turn = threading.Lock()
+            turn.acquire()
+            self._waiters.append(turn)
+        # Released by the writer handing over to us
+        turn.acquire()
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().release()
+            else:
+                self._busy = False
+
+
+def writer_queue(name) -> WriterQueue:
+    """The queue shared by every connection to database file ``name``."""
+    with _queues_lock:
+        return _queues.setdefault(str(name), WriterQueue())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    holds_writer_queue = False
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}')
+        conn.execute(f'PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        writer_queue(self.settings_dict['NAME']).acquire()
+        self.holds_writer_queue = True
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except BaseException:
+            self._release_writer_queue()
+            raise
+
+    def _release_writer_queue(self):
+        if self.holds_writer_queue:
+            self.holds_writer_queue = False
+            writer_queue(self.settings_dict['NAME']).release()
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            self._release_writer_queue()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self._release_writer_queue()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_writer_queue()
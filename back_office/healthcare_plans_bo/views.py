@@ -4,7 +4,10 @@ Welcome page view.
 
 from django.shortcuts import render
 
+from .admission import priority
 
+
+@priority('critical')
 def welcome_view(request):
     """Render the welcome page with API documentation."""
     return render(request, 'welcome.html')
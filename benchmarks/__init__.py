@@ -0,0 +1,17 @@
+"""
+Micro-benchmarks for serialization and DAO hot paths
+
+Each case is timed in calibrated loops (warm-up, then repeated samples of
+per-call time) against seeded SQLite databases of 1k, 100k or 1M users.
+Runs are compared with a stored baseline using the median ratio and a
+Mann-Whitney U test, so noise alone does not fail a run.
+
+    python -m benchmarks flask --sizes 1k,100k
+    python -m benchmarks django --save-baseline
+
+Datasets come from the backends' own generators (``flask seed`` /
+``manage.py seed``) and are cached in --data-dir between runs.
+
+``python -m benchmarks.sqlite_writes`` measures sustained multi-thread write
+throughput with and without the SQLite high-concurrency mode.
+"""
@@ -0,0 +1,86 @@
+"""
+python -m benchmarks {flask,django} [options]
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+
+from benchmarks import core
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the hot-path micro-benchmarks')
+    parser.add_argument('backend', choices=['flask', 'django'])
+    parser.add_argument('--sizes', default='1k', help=f"comma-separated dataset sizes ({', '.join(SIZES)})")
+    parser.add_argument('--cases', help='comma-separated substrings; only run matching cases')
+    parser.add_argument('--warmup', type=int, default=3, help='unrecorded samples per case')
+    parser.add_argument('--repeat', type=int, default=20, help='recorded samples per case')
+    parser.add_argument('--min-time', type=float, default=0.02, help='seconds per sample (calibrates the loop)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'healthcare-benchmarks'))
+    parser.add_argument('--baseline', help='baseline JSON (default: benchmarks/baselines/<backend>.json)')
+    parser.add_argument('--threshold', type=float, default=0.05, help='median change that counts as a regression')
+    parser.add_argument('--alpha', type=float, default=0.01, help='significance level of the comparison')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip().lower() for size in args.sizes.split(',')]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    filters = [f.strip() for f in args.cases.split(',')] if args.cases else None
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    target = importlib.import_module(f'benchmarks.{args.backend}_cases')
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.backend}.json')
+    baseline = None if args.save_baseline else core.load_baseline(baseline_path)
+
+    results = {}
+    slower = []
+    print(f"{'case':<44} {'median':>10} {'iqr':>10} {'calls':>7}  vs baseline")
+    for size in sizes:
+        with target.benchmark_cases(args.data_dir, SIZES[size], args.seed) as cases:
+            for name, fn in cases:
+                if filters and not any(f in name for f in filters):
+                    continue
+                key = f'{size}/{name}'
+                result = core.measure(fn, args.warmup, args.repeat, args.min_time)
+                results[key] = result
+
+                verdict = ''
+                base = (baseline or {}).get('results', {}).get(key)
+                if base is not None:
+                    cmp = core.compare(result, base, args.threshold, args.alpha)
+                    verdict = f"{cmp['ratio']:.3f}x  p={cmp['p_value']:.3g}  {cmp['verdict']}"
+                    if cmp['verdict'] == 'slower':
+                        slower.append(key)
+                print(f"{key:<44} {core.format_time(result['median']):>10} "
+                      f"{core.format_time(result['iqr']):>10} {result['number']:>7}  {verdict}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        core.save_baseline(baseline_path, {
+            'backend': args.backend,
+            'params': {'warmup': args.warmup, 'repeat': args.repeat, 'min_time': args.min_time, 'seed': args.seed},
+            'environment': core.environment(),
+            'results': results,
+        })
+        print(f'Baseline saved to {baseline_path}')
+        return 0
+
+    if baseline is None:
+        print(f'No baseline at {baseline_path}; run with --save-baseline to create one')
+        return 0
+    if slower:
+        print(f"\nSignificantly slower than baseline (>{args.threshold:.0%}, p<{args.alpha}): {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
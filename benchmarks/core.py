@@ -0,0 +1,112 @@
+"""
+Timing loop, statistics and baseline comparison
+"""
+import gc
+import json
+import math
+import platform
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _loop(fn: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def calibrate(fn: Callable[[], Any], min_time: float) -> int:
+    """Smallest power of two of calls that takes at least ``min_time`` seconds"""
+    number = 1
+    while _loop(fn, number) < min_time:
+        number *= 2
+    return number
+
+
+def measure(fn: Callable[[], Any], warmup: int, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Per-call seconds for ``repeat`` samples, after ``warmup`` unrecorded ones"""
+    number = calibrate(fn, min_time)
+    for _ in range(warmup):
+        _loop(fn, number)
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        samples.append(_loop(fn, number) / number)
+    return {'number': number, 'samples': samples, **describe(samples)}
+
+
+def describe(samples: List[float]) -> Dict[str, float]:
+    q1, _, q3 = statistics.quantiles(samples, n=4) if len(samples) > 1 else (samples[0],) * 3
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'iqr': q3 - q1,
+    }
+
+
+def mann_whitney_p(a: List[float], b: List[float]) -> float:
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected)"""
+    n1, n2 = len(a), len(b)
+    ranked = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(ranked)
+    tie_term = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    rank_sum_a = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, alpha: float) -> Dict[str, Any]:
+    """Classify one case as slower/faster/same than its baseline"""
+    ratio = current['median'] / baseline['median']
+    p_value = mann_whitney_p(current['samples'], baseline['samples'])
+    verdict = 'same'
+    if p_value < alpha and ratio > 1 + threshold:
+        verdict = 'slower'
+    elif p_value < alpha and ratio < 1 - threshold:
+        verdict = 'faster'
+    return {'ratio': ratio, 'p_value': p_value, 'verdict': verdict}
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def environment() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'system': platform.system()}
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, run: Dict[str, Any]):
+    with open(path, 'w') as fh:
+        json.dump(run, fh, indent=2, sort_keys=True)
+        fh.write('\n')
@@ -0,0 +1,81 @@
+"""
+Django backend: seeded database and benchmark cases
+
+The Django app only has the accounts feature, so its cases cover users,
+profiles and the DRF UserSerializer.
+"""
+import os
+import random
+import sys
+from contextlib import contextmanager
+from itertools import cycle
+from typing import Callable, Iterator, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'back_office'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthcare_plans_bo.settings')
+os.environ.setdefault('DEBUG', 'False')
+os.environ.setdefault('SLOW_QUERY_LOG', 'False')
+os.environ.setdefault('AUDIT_LOG', 'False')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+
+from accounts.management.commands.seed import seed_users  # noqa: E402
+
+DATASET_VERSION = 2
+SAMPLE_OBJECTS = 100
+
+
+def _use_database(path: str):
+    connections['default'].close()
+    settings.DATABASES['default']['NAME'] = path
+    connections['default'].settings_dict['NAME'] = path
+
+
+def dataset(data_dir: str, users: int, seed_value: int):
+    """Point the default connection at the cached database for this size, seeding it on first use"""
+    path = os.path.join(data_dir, f'django_{users}_s{seed_value}_v{DATASET_VERSION}.sqlite3')
+    if not os.path.exists(path):
+        partial = f'{path}.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        _use_database(partial)
+        call_command('migrate', verbosity=0)
+        seed_users(users, seed_value, batch_size=10000, password='Password#123')
+        connections['default'].close()
+        os.replace(partial, path)
+    _use_database(path)
+
+
+def cases(users: int, seed_value: int) -> List[Tuple[str, Callable[[], object]]]:
+    from accounts.api.serializers import UserSerializer
+    from accounts.dao import UserDAO
+    from accounts.models import User
+
+    rng = random.Random(seed_value)
+    user_ids = rng.sample(range(1, users + 1), min(users, SAMPLE_OBJECTS))
+    loaded_users = cycle(list(User.objects.select_related('profile').filter(id__in=user_ids)))
+    lookup_ids = rng.sample(range(1, users + 1), min(users, 1000))
+    emails = cycle(list(User.objects.filter(id__in=lookup_ids).values_list('email', flat=True)))
+    ids = cycle(lookup_ids)
+
+    return [
+        ('UserSerializer.data', lambda: UserSerializer(next(loaded_users)).data),
+        ('UserDAO.get_by_email', lambda: UserDAO.get_by_email(next(emails))),
+        ('UserDAO.get_with_profile', lambda: UserDAO.get_with_profile(next(ids))),
+    ]
+
+
+@contextmanager
+def benchmark_cases(data_dir: str, users: int, seed_value: int) -> Iterator[List[Tuple[str, Callable[[], object]]]]:
+    dataset(data_dir, users, seed_value)
+    try:
+        yield cases(users, seed_value)
+    finally:
+        connections['default'].close()
@@ -0,0 +1,93 @@
+"""
+Flask backend: seeded database and benchmark cases
+"""
+import os
+import random
+import sys
+from contextlib import contextmanager
+from itertools import cycle
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'flask-backend'))
+
+from flask_back_office import create_app  # noqa: E402
+from flask_back_office.config import ProductionConfig, config  # noqa: E402
+from flask_back_office.extensions import db  # noqa: E402
+from flask_back_office.seed import seed_database  # noqa: E402
+
+DATASET_VERSION = 3
+SAMPLE_OBJECTS = 100
+
+
+def _app(db_path: str):
+    config['benchmark'] = type('BenchmarkConfig', (ProductionConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SLOW_QUERY_LOG': False,
+        'AUDIT_LOG': False,
+        'METRICS_ENABLED': False,
+    })
+    return create_app('benchmark')
+
+
+def dataset(data_dir: str, users: int, seed_value: int):
+    """Return an app bound to the cached database for this size, seeding it on first use"""
+    path = os.path.join(data_dir, f'flask_{users}_s{seed_value}_v{DATASET_VERSION}.db')
+    if not os.path.exists(path):
+        partial = f'{path}.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        app = _app(partial)
+        with app.app_context():
+            seed_database(users, seed=seed_value)
+            db.engine.dispose()
+        os.replace(partial, path)
+    return _app(path)
+
+
+def cases(users: int, seed_value: int) -> List[Tuple[str, Callable[[], object]]]:
+    """Benchmark callables (requires an app context)"""
+    from sqlalchemy.orm import joinedload
+    from flask_back_office.accounts.dao import UserDAO
+    from flask_back_office.accounts.models import User
+    from flask_back_office.catalog.models import HealthPlan
+    from flask_back_office.cart.dao import CartItemDAO
+    from flask_back_office.cart.models import Cart, CartItem
+    from flask_back_office.catalog.simulation import Scenarios, simulate, simulations
+
+    rng = random.Random(seed_value)
+    user_ids = rng.sample(range(1, users + 1), min(users, SAMPLE_OBJECTS))
+    lookup_ids = rng.sample(range(1, users + 1), min(users, 1000))
+    cart_count = db.session.query(db.func.max(Cart.id)).scalar()
+    cart_ids = rng.sample(range(1, cart_count + 1), min(cart_count, SAMPLE_OBJECTS))
+
+    plans = cycle(HealthPlan.query.options(joinedload(HealthPlan.category)).limit(SAMPLE_OBJECTS).all())
+    loaded_users = cycle(User.query.options(joinedload(User.profile)).filter(User.id.in_(user_ids)).all())
+    carts = cycle(Cart.query.filter(Cart.id.in_(cart_ids)).all())
+    emails = cycle([email for email, in db.session.query(User.email).filter(User.id.in_(lookup_ids))])
+    pairs = cycle(db.session.query(CartItem.cart_id, CartItem.plan_id).filter(CartItem.cart_id.in_(cart_ids)).all())
+    plan_ids = [plan_id for plan_id, in db.session.query(HealthPlan.id).limit(SAMPLE_OBJECTS)]
+    # A 51-55 year old with a pre-existing condition: one profile bucket
+    scenarios = simulations.scenarios(5, True)
+
+    return [
+        ('HealthPlan.to_dict', lambda: next(plans).to_dict()),
+        ('User.to_dict', lambda: next(loaded_users).to_dict()),
+        ('Cart.to_dict', lambda: next(carts).to_dict()),
+        ('UserDAO.get_by_email', lambda: UserDAO.get_by_email(next(emails))),
+        ('CartItemDAO.get_by_cart_and_plan', lambda: CartItemDAO.get_by_cart_and_plan(*next(pairs))),
+        ('simulation.Scenarios', lambda: Scenarios(simulations.model.years(
+            np.random.default_rng(seed_value), 5, True, simulations.scenario_count))),
+        ('simulation.simulate', lambda: simulate(simulations.terms(), scenarios, plan_ids, 5, True)),
+    ]
+
+
+@contextmanager
+def benchmark_cases(data_dir: str, users: int, seed_value: int) -> Iterator[List[Tuple[str, Callable[[], object]]]]:
+    app = dataset(data_dir, users, seed_value)
+    with app.app_context():
+        yield cases(users, seed_value)
+        db.session.remove()
+        db.engine.dispose()
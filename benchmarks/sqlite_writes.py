@@ -0,0 +1,212 @@
+"""
+Sustained write throughput on SQLite, default vs high-concurrency mode
+
+    python -m benchmarks.sqlite_writes flask --threads 8 --readers 4 --seconds 10
+
+Writer threads run a read-then-write transaction in a loop (Flask: add a
+plan to a random user's cart through CartService; Django: update a random
+profile inside ``atomic``) while reader threads load carts / users. Each
+mode runs in its own process on a fresh copy of the cached --users dataset,
+since both backends read SQLITE_HIGH_CONCURRENCY at import time.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import core
+
+MODES = {'default': 'False', 'high-concurrency': 'True'}
+PERCENTILES = (50, 99)
+
+
+def _copy_database(source: str, target: str):
+    """Copy through the backup API (safe with WAL) and leave the copy in rollback-journal mode"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute('PRAGMA journal_mode=DELETE')
+    src.close()
+    dst.close()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _flask_workload(data_dir: str, work_dir: str, users: int, seed_value: int):
+    from benchmarks import flask_cases
+    from flask_back_office.extensions import db
+
+    app = flask_cases.dataset(data_dir, users, seed_value)
+    source = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    with app.app_context():
+        db.engine.dispose()
+    path = os.path.join(work_dir, 'flask.db')
+    _copy_database(source, path)
+    app = flask_cases._app(path)
+
+    from flask_back_office.cart.dao import CartDAO
+    from flask_back_office.cart.services import CartService
+    from flask_back_office.catalog.models import HealthPlan
+
+    with app.app_context():
+        plan_ids = [plan_id for plan_id, in db.session.query(HealthPlan.id).filter_by(is_active=True)]
+
+    def write(rng: random.Random):
+        with app.app_context():
+            ok, result = CartService.add_item(rng.randint(1, users), rng.choice(plan_ids))
+            if not ok:
+                raise RuntimeError(result['error'])
+
+    def read(rng: random.Random):
+        with app.app_context():
+            cart = CartDAO.get_active_cart(rng.randint(1, users))
+            if cart is not None:
+                cart.to_dict()
+
+    def close():
+        with app.app_context():
+            db.engine.dispose()
+
+    return write, read, close
+
+
+def _django_workload(data_dir: str, work_dir: str, users: int, seed_value: int):
+    from benchmarks import django_cases
+    from django.conf import settings
+    from django.db import connection, connections, transaction
+
+    django_cases.dataset(data_dir, users, seed_value)
+    source = str(settings.DATABASES['default']['NAME'])
+    connections['default'].close()
+    path = os.path.join(work_dir, 'django.sqlite3')
+    _copy_database(source, path)
+    django_cases._use_database(path)
+
+    from accounts.dao import UserDAO, UserProfileDAO
+
+    def write(rng: random.Random):
+        try:
+            with transaction.atomic():
+                profile = UserProfileDAO.get_by_user_id(rng.randint(1, users))
+                UserProfileDAO.update(profile, city=f'City {rng.randint(1, 500)}')
+        finally:
+            connection.close()
+
+    def read(rng: random.Random):
+        try:
+            UserDAO.get_with_profile(rng.randint(1, users))
+        finally:
+            connection.close()
+
+    return write, read, connections.close_all
+
+
+def _loop(fn: Callable, seconds: float, seed_value: int, out: Dict):
+    rng = random.Random(seed_value)
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            fn(rng)
+        except Exception as exc:
+            error = str(exc).splitlines()[0][:80]
+            out['errors'][error] = out['errors'].get(error, 0) + 1
+        else:
+            out['latencies'].append(time.perf_counter() - start)
+
+
+def worker(args) -> Dict:
+    """Run one mode in this process and return its counts"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        workload = _flask_workload if args.backend == 'flask' else _django_workload
+        write, read, close = workload(args.data_dir, work_dir, args.users, args.seed)
+
+        writers = [{'latencies': [], 'errors': {}} for _ in range(args.threads)]
+        readers = [{'latencies': [], 'errors': {}} for _ in range(args.readers)]
+        threads = [threading.Thread(target=_loop, args=(write, args.seconds, args.seed + i, out))
+                   for i, out in enumerate(writers)]
+        threads += [threading.Thread(target=_loop, args=(read, args.seconds, args.seed + 1000 + i, out))
+                    for i, out in enumerate(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        close()
+
+    def summary(outs: List[Dict]) -> Dict:
+        latencies = [latency for out in outs for latency in out['latencies']]
+        errors: Dict[str, int] = {}
+        for out in outs:
+            for error, count in out['errors'].items():
+                errors[error] = errors.get(error, 0) + count
+        return {
+            'per_second': len(latencies) / elapsed,
+            'percentiles': {pct: _percentile(latencies, pct) for pct in PERCENTILES},
+            'errors': errors,
+        }
+
+    return {'writes': summary(writers), 'reads': summary(readers)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.sqlite_writes',
+                                     description='Compare sustained multi-thread SQLite write throughput per mode')
+    parser.add_argument('backend', choices=['flask', 'django'])
+    parser.add_argument('--threads', type=int, default=8, help='writer threads')
+    parser.add_argument('--readers', type=int, default=4, help='reader threads running alongside')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each mode')
+    parser.add_argument('--users', type=int, default=1000, help='dataset size')
+    parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated ({', '.join(MODES)})")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'healthcare-benchmarks'))
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args)))
+        return 0
+
+    modes = [mode.strip() for mode in args.modes.split(',')]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    print(f'{args.backend}: {args.threads} writer / {args.readers} reader threads, {args.seconds:g}s per mode')
+    print(f"{'mode':<18} {'writes/s':>9} {'p50':>10} {'p99':>10} {'errors':>7} {'reads/s':>9} {'p99':>10}")
+    failed = False
+    for mode in modes:
+        env = {**os.environ, 'SQLITE_HIGH_CONCURRENCY': MODES[mode], 'SLOW_QUERY_LOG': 'False'}
+        command = [sys.executable, '-m', 'benchmarks.sqlite_writes', *(argv or sys.argv[1:]), '--worker']
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f'{mode:<18} failed:\n{proc.stderr}')
+            failed = True
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        writes, reads = result['writes'], result['reads']
+        print(f"{mode:<18} {writes['per_second']:>9.1f} "
+              f"{core.format_time(writes['percentiles']['50']):>10} "
+              f"{core.format_time(writes['percentiles']['99']):>10} "
+              f"{sum(writes['errors'].values()):>7} {reads['per_second']:>9.1f} "
+              f"{core.format_time(reads['percentiles']['99']):>10}")
+        for error, count in sorted(writes['errors'].items(), key=lambda item: -item[1]):
+            print(f"{'':<18} {count:>6} x {error}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,6 +21,77 @@ def create_app(config_name=None):
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
     
+    # SQLite WAL / single-writer mode (no-op unless SQLITE_HIGH_CONCURRENCY)
+    from flask_back_office import sqlite_mode
+    sqlite_mode.init_app(app)
+    
+    # Read-replica routing (no-op without DATABASE_REPLICA_URLS)
+    from flask_back_office import db_routing
+    db_routing.init_app(app)
+    
+    # Cart shards and flask cart-shards (just the primary without CART_SHARD_URLS)
+    from flask_back_office.cart import sharding
+    sharding.init_app(app)
+    
+    # Configure in-process caches
+    from flask_back_office.catalog.cache import catalog_cache
+    catalog_cache.configure(
+        ttl=app.config['CATALOG_CACHE_TTL'],
+        storage=app.config['CATALOG_STORAGE'],
+        shared_dir=app.config['CATALOG_SHARED_DIR'],
+        database_uri=app.config['SQLALCHEMY_DATABASE_URI']
+    )
+    from flask_back_office.catalog.suggest import suggestions
+    suggestions.configure(popularity_ttl=app.config['CATALOG_SUGGEST_POPULARITY_TTL'])
+    from flask_back_office.catalog.simulation import ClaimModel, simulations
+    simulations.configure(
+        scenarios=app.config['SIMULATION_SCENARIOS'],
+        seed=app.config['SIMULATION_SEED'],
+        model=ClaimModel(
+            severity=app.config['SIMULATION_SEVERITY'],
+            severity_mean=app.config['SIMULATION_SEVERITY_MEAN'],
+            severity_cv=app.config['SIMULATION_SEVERITY_CV']
+        ),
+        cache_size=app.config['SIMULATION_CACHE_SIZE']
+    )
+    
+    # Cache invalidation bus (other workers and instances)
+    from flask_back_office import invalidation
+    invalidation.init_app(app)
+    
+    # SQL query instrumentation (query counts, N+1 detection, budgets)
+    from flask_back_office import instrumentation
+    instrumentation.init_app(app)
+    
+    # Slow query log with EXPLAIN capture
+    from flask_back_office.slow_query import slow_query_log
+    slow_query_log.init_app(app)
+    
+    # Audit and access log, written in batches off the request path
+    from flask_back_office.audit import audit_log
+    audit_log.init_app(app)
+    
+    # Prometheus metrics (/metrics)
+    from flask_back_office import metrics
+    metrics.init_app(app)
+    
+    # On-demand request profiling (X-Profile header / sampling)
+    from flask_back_office import profiling
+    profiling.init_app(app)
+    
+    # Admission control per priority class (503 + Retry-After when shedding)
+    from flask_back_office import admission
+    admission.init_app(app)
+    
+    # Idempotency-Key replay and coalescing (after metrics, so replays are counted)
+    from flask_back_office import idempotency
+    idempotency.init_app(app)
+    
+    # CLI commands (flask seed, flask explain-dao)
+    from flask_back_office import seed, query_plans
+    seed.init_app(app)
+    query_plans.init_app(app)
+    
     # Register blueprints
     from flask_back_office.accounts.api.views import accounts_bp
     from flask_back_office.catalog.api.views import catalog_bp
@@ -32,6 +103,7 @@ def create_app(config_name=None):
     
     # Root endpoint
     @app.route('/')
+    @admission.priority('critical')
     def index():
         return jsonify({
             'message': 'Welcome to HealthCare Plans API (Flask)',
@@ -45,11 +117,14 @@ def create_app(config_name=None):
     
     # Health check
     @app.route('/api/v1/health/')
+    @admission.priority('critical')
     def health():
         return jsonify({'status': 'healthy'})
     
     # Create tables
     with app.app_context():
-        db.create_all()
+        # Models live on the primary: replicas get theirs from it, shards from create_all below
+        db.create_all(bind_key=None)
+        sharding.cart_shards.create_all()
     
     return app
\ No newline at end of file
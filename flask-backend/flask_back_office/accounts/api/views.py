@@ -4,11 +4,15 @@ Accounts API Views (REST Endpoints)
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_back_office.accounts.services import AuthService, ProfileService
+from flask_back_office.admission import priority
+from flask_back_office.instrumentation import query_budget
 
 accounts_bp = Blueprint('accounts', __name__)
 
 
 @accounts_bp.route('/register/', methods=['POST'])
+@query_budget(6)
+@priority('expensive')
 def register():
     """POST /api/v1/accounts/register/"""
     data = request.get_json()
@@ -29,6 +33,8 @@ def register():
 
 
 @accounts_bp.route('/login/', methods=['POST'])
+@query_budget(2)
+@priority('expensive')
 def login():
     """POST /api/v1/accounts/login/"""
     data = request.get_json()
@@ -47,10 +53,11 @@ def login():
 
 
 @accounts_bp.route('/token/refresh/', methods=['POST'])
+@query_budget(1)
 @jwt_required(refresh=True)
 def refresh():
     """POST /api/v1/accounts/token/refresh/"""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     success, result = AuthService.refresh(user_id)
     
     if success:
@@ -59,10 +66,11 @@ def refresh():
 
 
 @accounts_bp.route('/profile/', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_profile():
     """GET /api/v1/accounts/profile/"""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     success, result = ProfileService.get_profile(user_id)
     
     if success:
@@ -71,10 +79,11 @@ def get_profile():
 
 
 @accounts_bp.route('/profile/', methods=['PUT'])
+@query_budget(3)
 @jwt_required()
 def update_profile():
     """PUT /api/v1/accounts/profile/"""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     data = request.get_json()
     
     if not data:
@@ -1,5 +1,7 @@
 """
 Accounts DAO (Data Access Object)
+
+Methods only stage changes; the calling service commits, see unit_of_work.py
 """
 from typing import Optional
 from flask_back_office.extensions import db
@@ -14,7 +16,7 @@ class UserDAO:
         user = User(email=email.lower().strip())
         user.set_password(password)
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         return user
     
     @staticmethod
@@ -34,13 +36,11 @@ class UserDAO:
         for key, value in kwargs.items():
             if hasattr(user, key) and key not in ['id', 'password_hash']:
                 setattr(user, key, value)
-        db.session.commit()
         return user
     
     @staticmethod
     def delete(user: User) -> bool:
         user.is_active = False
-        db.session.commit()
         return True
 
 
@@ -55,7 +55,7 @@ class UserProfileDAO:
             mobile_number=mobile_number
         )
         db.session.add(profile)
-        db.session.commit()
+        db.session.flush()
         return profile
     
     @staticmethod
@@ -67,5 +67,4 @@ class UserProfileDAO:
         for key, value in kwargs.items():
             if hasattr(profile, key) and key not in ['id', 'user_id']:
                 setattr(profile, key, value)
-        db.session.commit()
         return profile
\ No newline at end of file
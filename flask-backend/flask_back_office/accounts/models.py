@@ -44,6 +44,7 @@ class UserProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
     full_name = db.Column(db.String(255), nullable=False)
     mobile_number = db.Column(db.String(20), nullable=True)
+    date_of_birth = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -51,5 +52,6 @@ class UserProfile(db.Model):
         return {
             'id': self.id,
             'full_name': self.full_name,
-            'mobile_number': self.mobile_number
+            'mobile_number': self.mobile_number,
+            'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None
         }
\ No newline at end of file
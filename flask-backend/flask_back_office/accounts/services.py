@@ -1,9 +1,12 @@
 """
 Accounts Services (Business Logic)
 """
+from datetime import date
 from typing import Tuple, Dict, Any
 from flask_jwt_extended import create_access_token, create_refresh_token
 from flask_back_office.accounts.dao import UserDAO, UserProfileDAO
+from flask_back_office.audit import audit
+from flask_back_office.unit_of_work import unit_of_work
 
 
 class AuthService:
@@ -30,15 +33,15 @@ class AuthService:
             return False, {'error': 'Email already registered'}
         
         try:
-            # Create user
-            user = UserDAO.create(email=email, password=password)
-            
-            # Create profile
-            UserProfileDAO.create(
-                user_id=user.id,
-                full_name=full_name.strip(),
-                mobile_number=mobile_number
-            )
+            # User and profile are committed together, or neither is
+            with unit_of_work():
+                user = UserDAO.create(email=email, password=password)
+                UserProfileDAO.create(
+                    user_id=user.id,
+                    full_name=full_name.strip(),
+                    mobile_number=mobile_number
+                )
+                audit('auth.register', user.id)
             
             return True, {
                 'message': 'Registration successful',
@@ -56,17 +59,21 @@ class AuthService:
         user = UserDAO.get_by_email(email)
         
         if not user:
+            audit('auth.login', None, 'failure', reason='unknown_email')
             return False, {'error': 'Invalid email or password'}
         
         if not user.is_active:
+            audit('auth.login', user.id, 'failure', reason='inactive')
             return False, {'error': 'Account is deactivated'}
         
         if not user.check_password(password):
+            audit('auth.login', user.id, 'failure', reason='bad_password')
             return False, {'error': 'Invalid email or password'}
         
+        audit('auth.login', user.id)
         # Generate tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
+        refresh_token = create_refresh_token(identity=str(user.id))
         
         return True, {
             'message': 'Login successful',
@@ -83,7 +90,7 @@ class AuthService:
         if not user or not user.is_active:
             return False, {'error': 'Invalid user'}
         
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         return True, {'access': access_token}
 
 
@@ -108,8 +115,19 @@ class ProfileService:
         if not profile:
             return False, {'error': 'Profile not found'}
         
+        if 'date_of_birth' in kwargs:
+            try:
+                kwargs['date_of_birth'] = date.fromisoformat(kwargs['date_of_birth']) if kwargs['date_of_birth'] else None
+            except (TypeError, ValueError):
+                return False, {'error': 'date_of_birth must be a date (YYYY-MM-DD)'}
+            if kwargs['date_of_birth'] and kwargs['date_of_birth'] > date.today():
+                return False, {'error': 'date_of_birth cannot be in the future'}
+        
         try:
-            updated_profile = UserProfileDAO.update(profile, **kwargs)
+            with unit_of_work():
+                updated_profile = UserProfileDAO.update(profile, **kwargs)
+                # Which fields changed, not their values
+                audit('profile.update', user_id, fields=sorted(kwargs))
             return True, {
                 'message': 'Profile updated',
                 'profile': updated_profile.to_dict()
@@ -0,0 +1,153 @@
+"""
+Admission Control and Load Shedding
+
+Every route belongs to a priority class (``@priority('expensive')``; the
+rest are ``default``). ADMISSION_CLASSES gives each limited class, per
+worker process:
+
+    <class>=<concurrent requests>:<max queued>:<queue timeout seconds>
+
+The default, ``expensive=2:1:0.25,default=3:1:0.5``, fits the 4 threads
+per worker of gunicorn.conf.py: password hashing and full catalog dumps
+never hold more than half of them, and one thread is left for classes
+without a limit (``critical``: health checks and the like). A request that
+finds its class full waits in the class queue, holding its thread, so
+queues are short; when the queue is full or the wait times out it is shed
+with 503 and Retry-After instead of adding to everyone's latency. /metrics
+is never shed.
+
+ADMISSION_CONTROL turns this on; it defaults to on in the production
+configuration only, as the limits would shed a development server's or a
+test client's bursts.
+
+Limits, in-flight and queued requests and rejections are exported as
+admission_* metrics.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app, g, jsonify, request
+
+from flask_back_office.metrics import ADMISSION_REJECTED, registry
+
+DEFAULT_PRIORITY = 'default'
+EXEMPT_ENDPOINTS = ('metrics', 'static')
+
+# Classes of the running app, read by the scrape-time gauges
+_classes: Dict[str, 'PriorityClass'] = {}
+
+
+def priority(name: str):
+    """Assign an endpoint to a priority class"""
+    def decorator(view):
+        view.priority_class = name
+        return view
+    return decorator
+
+
+# PriorityClass and parse_classes are framework-neutral and also live in the Django
+# back office (healthcare_plans_bo/admission.py), which is built and deployed on its
+# own and cannot import this package: change both
+class PriorityClass:
+    """Concurrency limit with a bounded, timed wait queue"""
+
+    def __init__(self, name: str, limit: int, max_queued: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> Optional[str]:
+        """Take a slot; return why the request is rejected, or None once admitted"""
+        with self._cond:
+            if self.active < self.limit and not self.queued:
+                self.active += 1
+                return None
+            if self.queued >= self.max_queued:
+                return 'queue_full'
+
+            self.queued += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                return None
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+def parse_classes(spec: str) -> Dict[str, PriorityClass]:
+    """``expensive=2:1:0.25,default=3:1:0.5`` -> {name: PriorityClass}"""
+    classes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, values = entry.partition('=')
+        try:
+            limit, max_queued, timeout = values.split(':')
+            classes[name.strip()] = PriorityClass(name.strip(), int(limit), int(max_queued), float(timeout))
+        except ValueError:
+            raise ValueError(f'Invalid ADMISSION_CLASSES entry {entry!r}, expected <class>=<limit>:<queue>:<timeout>')
+    return classes
+
+
+def _admit():
+    if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    name = getattr(view, 'priority_class', DEFAULT_PRIORITY)
+    priority_class = current_app.extensions['admission'].get(name)
+    if priority_class is None:
+        return None
+
+    rejected = priority_class.acquire()
+    if rejected is None:
+        g.admission_class = priority_class
+        return None
+
+    ADMISSION_REJECTED.inc(name, rejected)
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER'])
+    return response, 503
+
+
+def _release(exc=None):
+    priority_class = g.pop('admission_class', None)
+    if priority_class is not None:
+        priority_class.release()
+
+
+def _gauge(attribute: str):
+    return lambda: {(name,): getattr(priority_class, attribute) for name, priority_class in _classes.items()}
+
+
+registry.gauge_callback('admission_limit', 'Concurrent requests allowed per priority class',
+                        ['priority'], _gauge('limit'))
+registry.gauge_callback('admission_in_flight', 'Admitted requests being served per priority class',
+                        ['priority'], _gauge('active'))
+registry.gauge_callback('admission_queued', 'Requests waiting for admission per priority class',
+                        ['priority'], _gauge('queued'))
+
+
+def init_app(app):
+    """Limit concurrent requests per priority class and shed the excess"""
+    if not app.config['ADMISSION_CONTROL']:
+        return
+
+    classes = parse_classes(app.config['ADMISSION_CLASSES'])
+    app.extensions['admission'] = classes
+    _classes.clear()
+    _classes.update(classes)
+    app.before_request(_admit)
+    app.teardown_request(_release)
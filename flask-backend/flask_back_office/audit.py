@@ -0,0 +1,312 @@
+"""
+Audit and Access Log
+
+Services record what a user did (logins, registrations, profile and cart
+changes) with ``audit(action, user_id, ...)``, once the unit of work that
+did it has committed; with AUDIT_ACCESS_LOG every request is also recorded
+as an ``access`` event. The request thread only puts the event on a
+bounded queue (AUDIT_QUEUE_SIZE). A background writer takes up to
+AUDIT_BATCH_SIZE events at a time, waiting at most AUDIT_FLUSH_INTERVAL
+seconds for a batch to fill, and writes each batch in one go to
+
+- ``file``: a rotating JSON-lines file (AUDIT_LOG_FILE), one line per event
+- ``table``: the ``audit_events`` table, one INSERT per batch; on SQLite and
+  PostgreSQL triggers reject UPDATE and DELETE, whether the table was made
+  by ``db.create_all()`` or by the migration
+
+A full queue pushes back: the caller waits up to AUDIT_ENQUEUE_TIMEOUT_MS
+for room before the event is dropped. Waits, drops, writes and failures
+are counted in ``audit_events_total``, with the queue depth and the batch
+write time alongside. When a worker exits (gunicorn's ``worker_exit`` hook,
+or the interpreter's exit) the writer drains the queue before it stops.
+
+Events name the fields a change touched, never their values, so no
+customer data reaches the log.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import DDL, event
+
+from flask_back_office.extensions import db
+from flask_back_office.metrics import AUDIT_EVENTS, AUDIT_WRITE_SECONDS, registry
+from flask_back_office.unit_of_work import on_commit
+
+audit_logger = logging.getLogger('flask_back_office.audit')
+logger = logging.getLogger(__name__)
+
+SINKS = ('file', 'table')
+TABLE_FIELDS = ('kind', 'action', 'outcome', 'user_id', 'method', 'route', 'status', 'duration_ms', 'remote_addr')
+_STOP = object()
+
+
+class AuditEvent(db.Model):
+    """One audit or access event (table sink); rows are only ever inserted"""
+    __tablename__ = 'audit_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    kind = db.Column(db.String(16), nullable=False)
+    action = db.Column(db.String(64), nullable=False, index=True)
+    outcome = db.Column(db.String(16), nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    method = db.Column(db.String(8))
+    route = db.Column(db.String(255))
+    status = db.Column(db.Integer)
+    duration_ms = db.Column(db.Float)
+    remote_addr = db.Column(db.String(45))
+    details = db.Column(db.Text)
+
+
+APPEND_ONLY_DDL = {
+    'sqlite': [
+        f"CREATE TRIGGER IF NOT EXISTS audit_events_no_{statement.lower()} BEFORE {statement} ON audit_events "
+        f"BEGIN SELECT RAISE(ABORT, 'audit_events is append-only'); END"
+        for statement in ('UPDATE', 'DELETE')
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION audit_events_append_only() RETURNS trigger AS $$ "
+        "BEGIN RAISE EXCEPTION 'audit_events is append-only'; END $$ LANGUAGE plpgsql",
+        "CREATE TRIGGER audit_events_append_only BEFORE UPDATE OR DELETE ON audit_events "
+        "FOR EACH ROW EXECUTE FUNCTION audit_events_append_only()",
+    ],
+}
+
+
+@event.listens_for(AuditEvent.__table__, 'after_create')
+def _append_only(table, connection, **kw):
+    # For db.create_all(); the migration creates the same triggers
+    for statement in APPEND_ONLY_DDL.get(connection.dialect.name, ()):
+        connection.execute(DDL(statement))
+
+
+# The queue, batching and drain below are repeated in the Django back office's
+# AuditLog (healthcare_plans_bo/audit.py), which reads settings instead of app
+# config and has only the file sink; the backends deploy separately, so a fix to
+# the queue or the writer thread belongs in both
+class AuditLog:
+    """Queues events on the request thread and writes them in batches off it"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sink = 'file'
+        self.engine = None
+        self.queue_size = 10000
+        self.batch_size = 500
+        self.flush_interval = 0.5
+        self.enqueue_timeout = 0.05
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = False
+        if not app.config['AUDIT_LOG']:
+            return
+
+        sink = app.config['AUDIT_LOG_SINK']
+        if sink not in SINKS:
+            raise ValueError(f'Unknown AUDIT_LOG_SINK {sink!r}')
+        self.sink = sink
+        self.queue_size = app.config['AUDIT_QUEUE_SIZE']
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.flush_interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.enqueue_timeout = app.config['AUDIT_ENQUEUE_TIMEOUT_MS'] / 1000
+        if sink == 'file':
+            self._configure_logger(app)
+        else:
+            with app.app_context():
+                self.engine = db.engine
+        self.enabled = True
+        if app.config['AUDIT_ACCESS_LOG']:
+            app.before_request(_start_request)
+            app.after_request(_finish_request)
+
+    def _configure_logger(self, app):
+        if audit_logger.handlers:
+            return
+
+        path = app.config['AUDIT_LOG_FILE']
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=app.config['AUDIT_LOG_MAX_BYTES'],
+                backupCount=app.config['AUDIT_LOG_BACKUP_COUNT']
+            )
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        audit_logger.addHandler(handler)
+        audit_logger.setLevel(logging.INFO)
+        audit_logger.propagate = False
+
+    def record(self, event: Dict[str, Any]):
+        """Queue ``event`` for the writer, waiting briefly for room when the queue is full"""
+        if self._closed and self._pid == os.getpid():
+            # Shutting down: nothing will drain the queue any more
+            self._write([event])
+            return
+
+        events = self._ensure_writer()
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            AUDIT_EVENTS.inc(event['kind'], 'waited')
+            try:
+                events.put(event, timeout=self.enqueue_timeout)
+            except queue.Full:
+                AUDIT_EVENTS.inc(event['kind'], 'dropped')
+                return
+        AUDIT_EVENTS.inc(event['kind'], 'queued')
+
+    def _ensure_writer(self) -> queue.Queue:
+        # Threads do not survive fork, so (re)start lazily in each worker, with its own queue
+        if self._thread is not None and self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid, self._closed = os.getpid(), False
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='audit-log', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self, events: queue.Queue):
+        stopping = False
+        while not stopping:
+            batch = [events.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(events.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                # Whatever is still queued goes out before the writer stops
+                batch.pop()
+                stopping = True
+                while True:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stopping):
+                events.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            if self.sink == 'table':
+                rows = [{**{column: event[column] for column in TABLE_FIELDS},
+                         'created_at': datetime.fromisoformat(event['ts']).replace(tzinfo=None),
+                         'details': json.dumps(event['details']) if event['details'] else None}
+                        for event in batch]
+                with self.engine.begin() as conn:
+                    conn.execute(AuditEvent.__table__.insert(), rows)
+            else:
+                audit_logger.info('\n'.join(json.dumps(event, default=str) for event in batch))
+        except Exception:
+            logger.exception('Writing %d audit events failed', len(batch))
+            outcome = 'failed'
+        else:
+            outcome = 'written'
+        AUDIT_WRITE_SECONDS.observe(time.perf_counter() - start, self.sink)
+        for event in batch:
+            AUDIT_EVENTS.inc(event['kind'], outcome)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued events have been written (tests)"""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout: float = 10.0):
+        """Write every queued event and stop the writer (worker exit)"""
+        with self._lock:
+            thread, events = self._thread, self._queue
+            if thread is None or self._pid != os.getpid() or self._closed:
+                return
+            self._closed = True
+        try:
+            events.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error('Audit writer did not drain its queue in %.1fs', timeout)
+            return
+        thread.join(timeout)
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.close)
+
+registry.gauge_callback('audit_queue_depth', 'Audit events waiting for the writer', [],
+                        lambda: {(): audit_log.depth()})
+
+
+def _event(kind: str, action: str, outcome: str, user_id: Optional[int], **fields) -> Dict[str, Any]:
+    event = {
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'kind': kind,
+        'action': action,
+        'outcome': outcome,
+        'user_id': user_id,
+        'method': None,
+        'route': None,
+        'status': None,
+        'duration_ms': None,
+        'remote_addr': None,
+        'details': None,
+    }
+    if has_request_context():
+        event['method'] = request.method
+        event['route'] = request.url_rule.rule if request.url_rule else request.path
+        event['remote_addr'] = request.remote_addr
+    event.update(fields)
+    return event
+
+
+def audit(action: str, user_id: Optional[int], outcome: str = 'success', **details):
+    """Record ``action`` by ``user_id`` once the current unit of work commits"""
+    if not audit_log.enabled:
+        return
+    event = _event('audit', action, outcome, user_id, details=details or None)
+    on_commit(lambda: audit_log.record(event))
+
+
+def _start_request():
+    g._audit_start = time.perf_counter()
+
+
+def _finish_request(response):
+    start = g.pop('_audit_start', None)
+    if start is None:
+        return response
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No @jwt_required on this endpoint
+        identity = None
+    audit_log.record(_event(
+        'access', 'request', 'success' if response.status_code < 400 else 'failure',
+        int(identity) if identity else None,
+        status=response.status_code,
+        duration_ms=round((time.perf_counter() - start) * 1000, 3),
+    ))
+    return response
@@ -0,0 +1,91 @@
+"""
+Cart API Views (REST Endpoints)
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_back_office.cart.services import CartService
+from flask_back_office.instrumentation import query_budget
+
+cart_bp = Blueprint('cart', __name__)
+
+
+@cart_bp.route('/', methods=['GET'])
+@query_budget(3)
+@jwt_required()
+def get_cart():
+    """GET /api/v1/cart/"""
+    user_id = int(get_jwt_identity())
+    success, result = CartService.get_cart(user_id)
+    return jsonify(result), 200
+
+
+@cart_bp.route('/items/', methods=['POST'])
+@query_budget(8)
+@jwt_required()
+def add_item():
+    """POST /api/v1/cart/items/"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    success, result = CartService.add_item(
+        user_id=user_id,
+        plan_id=data.get('plan_id'),
+        quantity=data.get('quantity', 1),
+        billing_cycle=data.get('billing_cycle', 'monthly')
+    )
+
+    if success:
+        return jsonify(result), 201
+    return jsonify(result), 400
+
+
+@cart_bp.route('/items/<int:item_id>/', methods=['PUT'])
+@query_budget(5)
+@jwt_required()
+def update_item(item_id):
+    """PUT /api/v1/cart/items/<id>/"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    success, result = CartService.update_item(
+        user_id=user_id,
+        item_id=item_id,
+        quantity=data.get('quantity'),
+        billing_cycle=data.get('billing_cycle')
+    )
+
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
+
+@cart_bp.route('/items/<int:item_id>/', methods=['DELETE'])
+@query_budget(5)
+@jwt_required()
+def remove_item(item_id):
+    """DELETE /api/v1/cart/items/<id>/"""
+    user_id = int(get_jwt_identity())
+    success, result = CartService.remove_item(user_id, item_id)
+
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 404
+
+
+@cart_bp.route('/', methods=['DELETE'])
+@query_budget(4)
+@jwt_required()
+def clear_cart():
+    """DELETE /api/v1/cart/"""
+    user_id = int(get_jwt_identity())
+    success, result = CartService.clear_cart(user_id)
+
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 404
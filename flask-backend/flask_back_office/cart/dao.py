@@ -1,9 +1,15 @@
 """
 Cart DAO (Data Access Object)
+
+Carts live on the shard that owns their user and ids encode that shard, see
+cart/sharding.py. Without shards every session is ``db.session``. Writes are
+committed by the calling service's unit of work
 """
-from typing import Optional
-from flask_back_office.extensions import db
+from typing import Dict, Optional
+from sqlalchemy import func
+from flask_back_office.db_routing import use_primary
 from flask_back_office.cart.models import Cart, CartItem
+from flask_back_office.cart.sharding import cart_shards
 
 
 class CartDAO:
@@ -11,21 +17,35 @@ class CartDAO:
     
     @staticmethod
     def create(user_id: int) -> Cart:
+        session = cart_shards.session(cart_shards.owner(user_id))
         cart = Cart(user_id=user_id)
-        db.session.add(cart)
-        db.session.commit()
+        session.add(cart)
+        session.flush()
         return cart
     
     @staticmethod
     def get_by_id(cart_id: int) -> Optional[Cart]:
-        return Cart.query.get(cart_id)
+        session = cart_shards.session_for_id(cart_id)
+        return session.get(Cart, cart_id) if session else None
     
     @staticmethod
     def get_active_cart(user_id: int) -> Optional[Cart]:
-        return Cart.query.filter_by(user_id=user_id, is_active=True).first()
+        cart = CartDAO._get_active_cart_on(cart_shards.owner(user_id), user_id)
+        if cart is None:
+            # Not moved yet to the shard added last (None unless a rebalance is pending)
+            previous = cart_shards.previous_owner(user_id)
+            if previous is not None:
+                cart = CartDAO._get_active_cart_on(previous, user_id)
+        return cart
+    
+    @staticmethod
+    def _get_active_cart_on(shard: int, user_id: int) -> Optional[Cart]:
+        return cart_shards.session(shard).query(Cart).filter_by(user_id=user_id, is_active=True).first()
     
     @staticmethod
     def get_or_create(user_id: int) -> Cart:
+        # A lagging replica would miss a just-created cart and we would add a second one
+        use_primary()
         cart = CartDAO.get_active_cart(user_id)
         if not cart:
             cart = CartDAO.create(user_id)
@@ -34,13 +54,11 @@ class CartDAO:
     @staticmethod
     def deactivate(cart: Cart) -> bool:
         cart.is_active = False
-        db.session.commit()
         return True
     
     @staticmethod
     def clear(cart: Cart) -> bool:
-        CartItem.query.filter_by(cart_id=cart.id).delete()
-        db.session.commit()
+        cart_shards.session_for_id(cart.id).query(CartItem).filter_by(cart_id=cart.id).delete()
         return True
 
 
@@ -48,36 +66,49 @@ class CartItemDAO:
     """Data Access Object for CartItem"""
     
     @staticmethod
-    def create(cart_id: int, plan_id: int, quantity: int = 1, 
+    def create(cart_id: int, plan_id: int, quantity: int = 1,
                billing_cycle: str = 'monthly') -> CartItem:
+        session = cart_shards.session_for_id(cart_id)
         item = CartItem(
             cart_id=cart_id,
             plan_id=plan_id,
             quantity=quantity,
             billing_cycle=billing_cycle
         )
-        db.session.add(item)
-        db.session.commit()
+        session.add(item)
+        session.flush()
         return item
     
     @staticmethod
     def get_by_id(item_id: int) -> Optional[CartItem]:
-        return CartItem.query.get(item_id)
+        session = cart_shards.session_for_id(item_id)
+        return session.get(CartItem, item_id) if session else None
     
     @staticmethod
     def get_by_cart_and_plan(cart_id: int, plan_id: int) -> Optional[CartItem]:
-        return CartItem.query.filter_by(cart_id=cart_id, plan_id=plan_id).first()
+        session = cart_shards.session_for_id(cart_id)
+        if session is None:
+            return None
+        return session.query(CartItem).filter_by(cart_id=cart_id, plan_id=plan_id).first()
     
     @staticmethod
     def update(item: CartItem, **kwargs) -> CartItem:
         for key, value in kwargs.items():
             if hasattr(item, key) and key not in ['id', 'cart_id']:
                 setattr(item, key, value)
-        db.session.commit()
         return item
     
     @staticmethod
     def delete(item: CartItem) -> bool:
-        db.session.delete(item)
-        db.session.commit()
-        return True
\ No newline at end of file
+        cart_shards.session_for_id(item.id).delete(item)
+        return True
+    
+    @staticmethod
+    def count_by_plan() -> Dict[int, int]:
+        """Number of cart items per plan, over every shard"""
+        counts: Dict[int, int] = {}
+        for shard in cart_shards.shards:
+            rows = cart_shards.session(shard).query(CartItem.plan_id, func.count()).group_by(CartItem.plan_id)
+            for plan_id, count in rows:
+                counts[plan_id] = counts.get(plan_id, 0) + count
+        return counts
\ No newline at end of file
@@ -2,12 +2,18 @@
 Cart Models
 """
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 from flask_back_office.extensions import db
 
 
 class Cart(db.Model):
     """Shopping cart"""
     __tablename__ = 'carts'
+    __table_args__ = (
+        # Only the active cart is ever looked up by user; inactive ones pile up
+        db.Index('ix_carts_user_id_active', 'user_id',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -19,7 +25,12 @@ class Cart(db.Model):
     items = db.relationship('CartItem', backref='cart', lazy='dynamic', cascade='all, delete-orphan')
     
     def to_dict(self):
-        items_list = [item.to_dict() for item in self.items]
+        # Load every item's plan in the same query instead of one per item; a
+        # cart on another shard has no health_plans to join, so one more query
+        from flask_back_office.cart.sharding import shard_of_id
+        load_plans = joinedload if shard_of_id(self.id) == 0 else selectinload
+        items = self.items.options(load_plans(CartItem.plan)).all()
+        items_list = [item.to_dict() for item in items]
         total = sum(item['subtotal'] for item in items_list)
         return {
             'id': self.id,
@@ -33,6 +44,9 @@ class Cart(db.Model):
 class CartItem(db.Model):
     """Cart item"""
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        db.Index('ix_cart_items_cart_id_plan_id', 'cart_id', 'plan_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False)
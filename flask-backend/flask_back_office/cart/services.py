@@ -2,8 +2,10 @@
 Cart Services (Business Logic)
 """
 from typing import Tuple, Dict, Any
+from flask_back_office.audit import audit
 from flask_back_office.cart.dao import CartDAO, CartItemDAO
 from flask_back_office.catalog.dao import HealthPlanDAO
+from flask_back_office.unit_of_work import unit_of_work
 
 
 class CartService:
@@ -12,8 +14,9 @@ class CartService:
     @staticmethod
     def get_cart(user_id: int) -> Tuple[bool, Dict[str, Any]]:
         """Get user's active cart"""
-        cart = CartDAO.get_or_create(user_id)
-        return True, {'cart': cart.to_dict()}
+        with unit_of_work():
+            cart = CartDAO.get_or_create(user_id)
+            return True, {'cart': cart.to_dict()}
     
     @staticmethod
     def add_item(user_id: int, plan_id: int, quantity: int = 1,
@@ -36,28 +39,31 @@ class CartService:
             return False, {'error': 'Invalid billing cycle'}
         
         try:
-            cart = CartDAO.get_or_create(user_id)
-            
-            # Check if item already in cart
-            existing_item = CartItemDAO.get_by_cart_and_plan(cart.id, plan_id)
-            
-            if existing_item:
-                # Update quantity
-                new_quantity = existing_item.quantity + quantity
-                CartItemDAO.update(existing_item, quantity=new_quantity, billing_cycle=billing_cycle)
-            else:
-                # Create new item
-                CartItemDAO.create(
-                    cart_id=cart.id,
-                    plan_id=plan_id,
-                    quantity=quantity,
-                    billing_cycle=billing_cycle
-                )
-            
-            return True, {
-                'message': 'Item added to cart',
-                'cart': cart.to_dict()
-            }
+            # Serializing inside the unit of work reads the cart before the commit expires it
+            with unit_of_work():
+                cart = CartDAO.get_or_create(user_id)
+                
+                # Check if item already in cart
+                existing_item = CartItemDAO.get_by_cart_and_plan(cart.id, plan_id)
+                
+                if existing_item:
+                    # Update quantity
+                    new_quantity = existing_item.quantity + quantity
+                    CartItemDAO.update(existing_item, quantity=new_quantity, billing_cycle=billing_cycle)
+                else:
+                    # Create new item
+                    CartItemDAO.create(
+                        cart_id=cart.id,
+                        plan_id=plan_id,
+                        quantity=quantity,
+                        billing_cycle=billing_cycle
+                    )
+                audit('cart.add_item', user_id, plan_id=plan_id, quantity=quantity, billing_cycle=billing_cycle)
+                
+                return True, {
+                    'message': 'Item added to cart',
+                    'cart': cart.to_dict()
+                }
         except Exception as e:
             return False, {'error': str(e)}
     
@@ -85,13 +91,15 @@ class CartService:
                     return False, {'error': 'Invalid billing cycle'}
                 update_data['billing_cycle'] = billing_cycle
             
-            if update_data:
-                CartItemDAO.update(item, **update_data)
-            
-            return True, {
-                'message': 'Item updated',
-                'cart': cart.to_dict()
-            }
+            with unit_of_work():
+                if update_data:
+                    CartItemDAO.update(item, **update_data)
+                    audit('cart.update_item', user_id, plan_id=item.plan_id, **update_data)
+                
+                return True, {
+                    'message': 'Item updated',
+                    'cart': cart.to_dict()
+                }
         except Exception as e:
             return False, {'error': str(e)}
     
@@ -107,11 +115,13 @@ class CartService:
             return False, {'error': 'Item not found in cart'}
         
         try:
-            CartItemDAO.delete(item)
-            return True, {
-                'message': 'Item removed',
-                'cart': cart.to_dict()
-            }
+            with unit_of_work():
+                audit('cart.remove_item', user_id, plan_id=item.plan_id)
+                CartItemDAO.delete(item)
+                return True, {
+                    'message': 'Item removed',
+                    'cart': cart.to_dict()
+                }
         except Exception as e:
             return False, {'error': str(e)}
     
@@ -123,10 +133,12 @@ class CartService:
             return False, {'error': 'Cart not found'}
         
         try:
-            CartDAO.clear(cart)
-            return True, {
-                'message': 'Cart cleared',
-                'cart': cart.to_dict()
-            }
+            with unit_of_work():
+                CartDAO.clear(cart)
+                audit('cart.clear', user_id, cart_id=cart.id)
+                return True, {
+                    'message': 'Cart cleared',
+                    'cart': cart.to_dict()
+                }
         except Exception as e:
             return False, {'error': str(e)}
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Cart Sharding (carts and cart_items split across databases by user_id)
+
+Shard 0 is the primary database; CART_SHARD_URLS adds shards 1..N as
+SQLAlchemy binds ``cart_shard_<n>``. A user's carts live on the shard a
+consistent-hash ring maps their user_id to, so adding a shard moves only
+about 1/(N+1) of the users.
+
+Cart and item ids carry their shard in the high bits (``id >> SHARD_ID_BITS``):
+each shard's id sequence starts at ``shard << SHARD_ID_BITS``, and the
+primary's existing ids decode to shard 0. Lookups by id go straight to the
+right shard. Ids stay below 2**53, so JavaScript clients read them exactly.
+
+Adding a shard, online (one at a time; indexes are positions in
+CART_SHARD_URLS, so only append):
+
+1. Append its URL, set CART_SHARD_REBALANCE_PENDING=True and restart. Its
+   tables are created at startup, and the ring sends the users it now owns
+   there.
+2. Until their carts are moved, an active cart missing on the new shard is
+   looked for where its user lived before: the ring without the new shard.
+   Only users the new shard took over pay that second query, and only while
+   a rebalance is pending.
+3. ``flask --app wsgi cart-shards rebalance`` moves every misplaced user's
+   carts to their owner. Moved carts and items get new, re-encoded ids.
+   Run it with cart writes paused (e.g. in a maintenance window): each move
+   locks the source shard, so nothing added during the copy is deleted
+   with it, but a request that loaded the old cart before the move can
+   still write to it afterwards. Then unset CART_SHARD_REBALANCE_PENDING
+   and restart.
+
+Try it locally with several SQLite files:
+
+    CART_SHARD_URLS=sqlite:///carts_1.db,sqlite:///carts_2.db flask --app wsgi run
+"""
+import bisect
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import click
+from flask import g
+from flask.cli import with_appcontext
+from sqlalchemy.orm import Session
+
+from flask_back_office.extensions import db
+from flask_back_office.cart.models import Cart, CartItem
+from flask_back_office.sqlite_mode import lock_for_write, read_only, writer
+
+SHARD_BIND_PREFIX = 'cart_shard_'
+SHARD_ID_BITS = 40
+SHARDED_TABLES = ('carts', 'cart_items')
+# Points per shard on the ring; more points, more even split
+VIRTUAL_NODES = 256
+
+
+def shard_of_id(object_id: int) -> int:
+    """Shard encoded in a cart or cart item id"""
+    return object_id >> SHARD_ID_BITS
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent-hash ring of shard indexes"""
+
+    def __init__(self, shards: Iterable[int], virtual_nodes: int = VIRTUAL_NODES):
+        points = sorted((_ring_hash(f'{shard}-{node}'), shard) for shard in shards for node in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key, exclude: Iterable[int] = ()) -> Optional[int]:
+        """First shard clockwise from ``key`` that is not excluded"""
+        exclude = set(exclude)
+        start = bisect.bisect(self._hashes, _ring_hash(str(key)))
+        for offset in range(len(self._shards)):
+            shard = self._shards[(start + offset) % len(self._shards)]
+            if shard not in exclude:
+                return shard
+        return None
+
+
+def shard_tables(metadata: db.MetaData) -> List[db.Table]:
+    """carts / cart_items as created on shards 1..N"""
+    tables = []
+    for table in (Cart.__table__, CartItem.__table__):
+        copy = table.to_metadata(metadata)
+        # users and health_plans stay on the primary, out of a foreign key's reach
+        for constraint in list(copy.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split('.')[0] not in SHARDED_TABLES:
+                copy.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+                    copy.foreign_keys.discard(element)
+        # Encoded ids outgrow INTEGER on PostgreSQL; SQLite's is 64-bit and must stay
+        # INTEGER to remain the AUTOINCREMENT rowid
+        for column in copy.columns:
+            if column.name in ('id', 'cart_id'):
+                column.type = db.BigInteger().with_variant(db.Integer(), 'sqlite')
+        copy.dialect_kwargs['sqlite_autoincrement'] = True
+        tables.append(copy)
+    return tables
+
+
+class CartShards:
+    """Process-wide ring and per-app-context sessions of the cart shards"""
+
+    def __init__(self):
+        self.engines: Dict[int, object] = {}
+        self.ring = HashRing([0])
+        # The ring before the newest shard was added, while its rebalance is pending
+        self.previous_ring: Optional[HashRing] = None
+
+    def init_app(self, app):
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        shards = sorted(int(key[len(SHARD_BIND_PREFIX):]) for key in binds if key.startswith(SHARD_BIND_PREFIX))
+        if shards != list(range(1, len(shards) + 1)):
+            raise RuntimeError(f'Cart shards must be numbered 1..N, got {shards}')
+
+        with app.app_context():
+            self.engines = {shard: db.engines[f'{SHARD_BIND_PREFIX}{shard}'] for shard in shards}
+        self.ring = HashRing([0, *shards])
+        self.previous_ring = HashRing([0, *shards[:-1]]) \
+            if shards and app.config.get('CART_SHARD_REBALANCE_PENDING') else None
+        app.teardown_appcontext(self._close_sessions)
+
+    @property
+    def shards(self) -> List[int]:
+        return [0, *self.engines]
+
+    def owner(self, user_id: int) -> int:
+        return self.ring.shard_for(user_id)
+
+    def previous_owner(self, user_id: int) -> Optional[int]:
+        """Where ``user_id`` lived before the newest shard took it over (None if it did not, or once rebalanced)"""
+        if self.previous_ring is None:
+            return None
+        previous = self.previous_ring.shard_for(user_id)
+        return previous if previous != self.owner(user_id) else None
+
+    def session(self, shard: int) -> Optional[Session]:
+        """Session for ``shard`` in this app context (None for unknown shards)"""
+        if shard == 0:
+            return db.session()
+        engine = self.engines.get(shard)
+        if engine is None:
+            return None
+
+        sessions = g.setdefault('cart_shard_sessions', {})
+        if shard not in sessions:
+            # Plans and users are read from the primary
+            sessions[shard] = Session(bind=read_only(db.engine), binds={Cart: engine, CartItem: engine})
+        return sessions[shard]
+
+    def open_sessions(self) -> List[Session]:
+        """Shard sessions used so far in this app context"""
+        return list(g.get('cart_shard_sessions', {}).values())
+
+    def session_for_id(self, object_id: int) -> Optional[Session]:
+        return self.session(shard_of_id(object_id))
+
+    def create_all(self):
+        """Create the shard tables and start each shard's ids in its own range"""
+        tables = shard_tables(db.MetaData())
+        for shard, engine in self.engines.items():
+            tables[0].metadata.create_all(engine)
+            floor = shard << SHARD_ID_BITS
+            with engine.begin() as conn:
+                for table in tables:
+                    if engine.dialect.name == 'postgresql':
+                        conn.execute(db.text(
+                            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                            f"(SELECT GREATEST(MAX(id), :floor) FROM {table.name}))"
+                        ), {'floor': floor})
+                    else:
+                        conn.execute(db.text(
+                            'INSERT INTO sqlite_sequence (name, seq) SELECT :name, :floor '
+                            'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)'
+                        ), {'name': table.name, 'floor': floor})
+
+    def misplaced_users(self) -> Iterator[Tuple[int, int, int]]:
+        """(user_id, shard it is on, shard that owns it) for every user to move"""
+        for shard in self.shards:
+            user_ids = self.session(shard).scalars(db.select(Cart.user_id).distinct()).all()
+            for user_id in user_ids:
+                owner = self.owner(user_id)
+                if owner != shard:
+                    yield user_id, shard, owner
+
+    def move_user(self, user_id: int, source: int, target: int) -> int:
+        """Move every cart of ``user_id`` to ``target``; return how many moved"""
+        source_session, target_session = self.session(source), self.session(target)
+        with writer(lambda: [source_session, target_session]):
+            # No item may be added to the source between the copy and the delete
+            lock_for_write(source_session, Cart)
+            return self._move_carts(user_id, source_session, target_session)
+
+    @staticmethod
+    def _move_carts(user_id: int, source_session: Session, target_session: Session) -> int:
+        carts = source_session.scalars(
+            db.select(Cart).where(Cart.user_id == user_id).with_for_update()
+        ).all()
+        for cart in carts:
+            copy = Cart(user_id=cart.user_id, is_active=cart.is_active,
+                        created_at=cart.created_at, updated_at=cart.updated_at)
+            target_session.add(copy)
+            for item in cart.items:
+                target_session.add(CartItem(cart=copy, plan_id=item.plan_id, quantity=item.quantity,
+                                            billing_cycle=item.billing_cycle, created_at=item.created_at))
+            source_session.delete(cart)
+        try:
+            # The owner is read first, so the new copy must be visible before the old one goes
+            target_session.commit()
+        except Exception:
+            source_session.rollback()
+            raise
+        source_session.commit()
+        return len(carts)
+
+    def _close_sessions(self, exc=None):
+        for session in g.pop('cart_shard_sessions', {}).values():
+            session.close()
+
+
+cart_shards = CartShards()
+
+
+@click.group('cart-shards')
+def cart_shards_cli():
+    """Inspect and rebalance the cart shards"""
+
+
+@cart_shards_cli.command('status')
+@with_appcontext
+def status_command():
+    """Carts per shard and users waiting to be moved"""
+    for shard in cart_shards.shards:
+        carts = cart_shards.session(shard).scalar(db.select(db.func.count()).select_from(Cart))
+        click.echo(f'shard {shard}: {carts} carts')
+    click.echo(f'{sum(1 for _ in cart_shards.misplaced_users())} users to move')
+
+
+@cart_shards_cli.command('rebalance')
+@with_appcontext
+def rebalance_command():
+    """Move every user's carts to the shard the ring assigns it"""
+    users = carts = 0
+    for user_id, source, target in list(cart_shards.misplaced_users()):
+        carts += cart_shards.move_user(user_id, source, target)
+        users += 1
+    click.echo(f'Moved {carts} carts of {users} users')
+
+
+def init_app(app):
+    cart_shards.init_app(app)
+    app.cli.add_command(cart_shards_cli)
@@ -1,9 +1,14 @@
 """
 Catalog API Views (REST Endpoints)
 """
+import json
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
-from flask_back_office.catalog.services import CategoryService, PlanService
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_back_office.catalog.services import (
+    CategoryService, PlanService, QuoteService, SimulationService, SuggestService
+)
+from flask_back_office.admission import priority
+from flask_back_office.instrumentation import query_budget
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -13,6 +18,7 @@ catalog_bp = Blueprint('catalog', __name__)
 # ============================================
 
 @catalog_bp.route('/categories/', methods=['GET'])
+@query_budget(2)
 def get_categories():
     """GET /api/v1/catalog/categories/"""
     success, result = CategoryService.get_all_categories()
@@ -20,6 +26,7 @@ def get_categories():
 
 
 @catalog_bp.route('/categories/<int:category_id>/', methods=['GET'])
+@query_budget(1)
 def get_category(category_id):
     """GET /api/v1/catalog/categories/<id>/"""
     success, result = CategoryService.get_category(category_id)
@@ -30,6 +37,7 @@ def get_category(category_id):
 
 
 @catalog_bp.route('/categories/', methods=['POST'])
+@query_budget(2)
 @jwt_required()
 def create_category():
     """POST /api/v1/catalog/categories/"""
@@ -48,18 +56,98 @@ def create_category():
     return jsonify(result), 400
 
 
+# ============================================
+# Suggest Endpoint
+# ============================================
+
+@catalog_bp.route('/suggest', methods=['GET'])
+@query_budget(2)
+def suggest():
+    """GET /api/v1/catalog/suggest?prefix=gol[&limit=8]"""
+    success, result = SuggestService.suggest(request.args.get('prefix'), request.args.get('limit'))
+    
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
+
+# ============================================
+# Quote Endpoint
+# ============================================
+
+@catalog_bp.route('/quotes/', methods=['POST'])
+@query_budget(3)
+@priority('expensive')
+@jwt_required(optional=True)
+def create_quote():
+    """POST /api/v1/catalog/quotes/ {"plan_ids": [...], "members": [{"age": 34, "billing_cycle": "yearly"}, ...]}"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    identity = get_jwt_identity()
+    success, result = QuoteService.quote(
+        plan_ids=data.get('plan_ids'),
+        members=data.get('members'),
+        user_id=int(identity) if identity else None
+    )
+    
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
+
+# ============================================
+# Simulation Endpoint
+# ============================================
+
+@catalog_bp.route('/simulations/', methods=['POST'])
+@query_budget(3)
+@priority('expensive')
+@jwt_required(optional=True)
+def create_simulation():
+    """POST /api/v1/catalog/simulations/ {"plan_ids": [...], "member": {"age": 52, "pre_existing": true}}"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    identity = get_jwt_identity()
+    success, result = SimulationService.simulate(
+        plan_ids=data.get('plan_ids'),
+        member=data.get('member'),
+        user_id=int(identity) if identity else None
+    )
+    
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
+
 # ============================================
 # Plan Endpoints
 # ============================================
 
 @catalog_bp.route('/plans/', methods=['GET'])
+@query_budget(2)
+@priority('expensive')
 def get_plans():
-    """GET /api/v1/catalog/plans/"""
-    success, result = PlanService.get_all_plans()
-    return jsonify(result), 200
+    """GET /api/v1/catalog/plans/[?min_premium_monthly=&max_coverage_amount=&sort=-premium_yearly&offset=&limit=
+    &age=&gender=&state=&pincode=|serviceable_in=&pre_existing=&max_waiting_years=]"""
+    if not request.args:
+        success, result = PlanService.get_all_plans()
+        return jsonify(result), 200
+    
+    success, result = PlanService.search_plans(request.args)
+    
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
 
 
 @catalog_bp.route('/plans/<int:plan_id>/', methods=['GET'])
+@query_budget(2)
 def get_plan(plan_id):
     """GET /api/v1/catalog/plans/<id>/"""
     success, result = PlanService.get_plan(plan_id)
@@ -69,7 +157,19 @@ def get_plan(plan_id):
     return jsonify(result), 404
 
 
+@catalog_bp.route('/serviceability/<prefix>/', methods=['GET'])
+@query_budget(2)
+def get_serviceable_plans(prefix):
+    """GET /api/v1/catalog/serviceability/<pincode or prefix>/"""
+    success, result = PlanService.get_serviceable_plans(prefix)
+    
+    if success:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
+
 @catalog_bp.route('/categories/<int:category_id>/plans/', methods=['GET'])
+@query_budget(2)
 def get_plans_by_category(category_id):
     """GET /api/v1/catalog/categories/<id>/plans/"""
     success, result = PlanService.get_plans_by_category(category_id)
@@ -80,6 +180,7 @@ def get_plans_by_category(category_id):
 
 
 @catalog_bp.route('/plans/', methods=['POST'])
+@query_budget(4)
 @jwt_required()
 def create_plan():
     """POST /api/v1/catalog/plans/"""
@@ -95,7 +196,8 @@ def create_plan():
         coverage_amount=data.get('coverage_amount', 0),
         premium_monthly=data.get('premium_monthly', 0),
         premium_yearly=data.get('premium_yearly', 0),
-        features=data.get('features')
+        features=data.get('features'),
+        eligibility=json.dumps(data['eligibility']) if isinstance(data.get('eligibility'), dict) else data.get('eligibility')
     )
     
     if success:
@@ -0,0 +1,270 @@
+"""
+Catalog Cache (in-process snapshot of the active catalog)
+
+Concurrent misses share one reload through single-flight, so an expired
+snapshot costs one catalog query per worker rather than one per thread.
+Catalog writes in any worker drop it through the invalidation bus (topic
+``catalog``); while the bus is unhealthy no snapshot older than its lag
+bound is served. When the bus names the changed plans, only those are
+read again and patched into a copy of the snapshot and its range indexes.
+
+A snapshot is otherwise kept until an invalidation arrives, so the one the
+gunicorn master preloads stays shared copy-on-write by every worker (see
+preload.py). CATALOG_CACHE_TTL only applies with the memory transport,
+where other workers' writes never arrive and the snapshot must expire.
+
+CATALOG_STORAGE picks where a worker keeps the snapshot: ``memory`` holds
+ready-made dicts in every worker; ``shared`` maps the compact catalog table
+one process per node builds (see table.py), trading building the dicts per
+request for a single copy of the catalog per node
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, FrozenSet, Iterable, Sequence, Tuple
+from flask_back_office.catalog import table as catalog_table
+from flask_back_office.catalog.dao import CATALOG_TOPIC, PlanCategoryDAO, HealthPlanDAO
+from flask_back_office.catalog.indexes import INDEXED_COLUMNS, SortedIndex
+from flask_back_office.invalidation import invalidation_bus
+from flask_back_office.metrics import CACHE_REQUESTS
+from flask_back_office.single_flight import SingleFlight
+
+
+class CatalogSnapshot:
+    """Immutable, already-serialized view of active categories and plans
+
+    Plans are referenced by id in its range indexes.
+    """
+
+    def __init__(self, categories: List[Dict[str, Any]], plans: List[Dict[str, Any]],
+                 indexes: Optional[Dict[str, SortedIndex]] = None):
+        self.categories = categories
+        self.plans = plans
+        self.loaded_at = time.time()
+        self._indexes = indexes
+        self._positions: Optional[Dict[int, int]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls) -> 'CatalogSnapshot':
+        """Build a snapshot from the database (requires an app context)"""
+        categories = PlanCategoryDAO.get_all(active_only=True)
+        plans = HealthPlanDAO.get_all(active_only=True)
+        return cls(
+            categories=[c.to_dict() for c in categories],
+            plans=[p.to_dict() for p in plans]
+        )
+
+    @property
+    def indexes(self) -> Dict[str, SortedIndex]:
+        """Range index per indexed column, built on first use"""
+        if self._indexes is None:
+            with self._lock:
+                if self._indexes is None:
+                    ids = [plan['id'] for plan in self.plans]
+                    self._indexes = {
+                        column: SortedIndex.build([plan[column] for plan in self.plans], ids)
+                        for column in INDEXED_COLUMNS
+                    }
+        return self._indexes
+
+    def refs(self) -> Sequence[int]:
+        return [plan['id'] for plan in self.plans]
+
+    def position(self, plan_id: int) -> int:
+        if self._positions is None:
+            self._positions = {plan['id']: position for position, plan in enumerate(self.plans)}
+        return self._positions[plan_id]
+
+    def plan_at(self, plan_id: int) -> Dict[str, Any]:
+        return self.plans[self.position(plan_id)]
+
+    def value(self, plan_id: int, column: str) -> float:
+        return self.plan_at(plan_id)[column]
+
+    def plan_names(self) -> List[Tuple[int, int, str]]:
+        """(id, category_id, name) of every plan"""
+        return [(plan['id'], plan['category_id'], plan['name']) for plan in self.plans]
+
+    def plan_column(self, column: str) -> Sequence[Any]:
+        """Values of the numeric ``column`` for every plan, in snapshot order"""
+        return [plan[column] for plan in self.plans]
+
+    def plan_text(self, column: str) -> List[Optional[str]]:
+        """Values of the text ``column`` for every plan, in snapshot order"""
+        return [plan[column] for plan in self.plans]
+
+    def patched(self, changes: Dict[int, Optional[Dict[str, Any]]]) -> 'CatalogSnapshot':
+        """Copy with plans replaced, added, or removed (None), keeping ``loaded_at``"""
+        current = {plan['id']: plan for plan in self.plans if plan['id'] in changes}
+        plans = [changes[plan['id']] if plan['id'] in changes else plan for plan in self.plans]
+        plans = [plan for plan in plans if plan is not None]
+        plans.extend(sorted((plan for plan_id, plan in changes.items() if plan is not None and plan_id not in current),
+                            key=lambda plan: plan['id']))
+
+        indexes = None
+        if self._indexes is not None:
+            indexes = {
+                column: index.changed(
+                    removed=[(plan[column], plan_id) for plan_id, plan in current.items()],
+                    added=[(plan[column], plan_id) for plan_id, plan in changes.items() if plan is not None]
+                )
+                for column, index in self._indexes.items()
+            }
+        snapshot = CatalogSnapshot(self.categories, plans, indexes)
+        # Unchanged plans are as old as before: the TTL still counts from the full load
+        snapshot.loaded_at = self.loaded_at
+        return snapshot
+
+
+class SharedCatalogSnapshot:
+    """CatalogSnapshot read from a mapped CatalogTable, plans referenced by table row"""
+
+    def __init__(self, table: catalog_table.CatalogTable):
+        self.table = table
+        self.loaded_at = table.built_at
+        self.indexes = table.indexes
+
+    @property
+    def categories(self) -> List[Dict[str, Any]]:
+        table = self.table
+        is_active = table.categories['is_active']
+        return [table.category_dict(row) for row in range(table.category_count) if is_active[row]]
+
+    @property
+    def plans(self) -> List[Dict[str, Any]]:
+        table = self.table
+        return [table.plan_dict(row) for row in range(table.plan_count)]
+
+    def refs(self) -> Sequence[int]:
+        return range(self.table.plan_count)
+
+    def position(self, row: int) -> int:
+        return row
+
+    def plan_at(self, row: int) -> Dict[str, Any]:
+        return self.table.plan_dict(row)
+
+    def value(self, row: int, column: str) -> float:
+        return self.table.plans[column][row]
+
+    def plan_names(self) -> List[Tuple[int, int, str]]:
+        table = self.table
+        ids, category_ids, names = table.plans['id'], table.plans['category_id'], table.plans['name']
+        return [(ids[row], category_ids[row], table.string(names[row])) for row in range(table.plan_count)]
+
+    def plan_column(self, column: str) -> Sequence[Any]:
+        return self.table.plans[column]
+
+    def plan_text(self, column: str) -> List[Optional[str]]:
+        return [self.table.string(ref) for ref in self.table.plans[column]]
+
+
+class CatalogCache:
+    """Process-wide holder for the current CatalogSnapshot"""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self.storage = 'memory'
+        self.table_path: Optional[str] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # Per process; a shared table is locked and rechecked across workers by catalog_table.load
+        self._reloads = SingleFlight('catalog')
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a reload that raced one is not kept
+        self._generation = 0
+        self._invalidated_at = 0.0
+        # Snapshot to patch with the plans changed since (memory storage)
+        self._stale: Optional[CatalogSnapshot] = None
+        self._changed_plans = set()
+
+    def configure(self, ttl: float, storage: str = 'memory', shared_dir: Optional[str] = None,
+                  database_uri: str = ''):
+        if storage not in ('memory', 'shared'):
+            raise ValueError(f'Unknown CATALOG_STORAGE {storage!r}')
+        self.ttl = ttl
+        self.storage = storage
+        if storage == 'shared':
+            # One table per database, so apps on other databases never share it
+            digest = hashlib.sha256(database_uri.encode()).hexdigest()[:16]
+            self.table_path = os.path.join(shared_dir, f'catalog-{digest}.bin')
+        self._snapshot, self._stale, self._changed_plans = None, None, set()
+
+    def get(self) -> CatalogSnapshot:
+        """Return the current snapshot, reloading it when missing or expired"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._expired(snapshot):
+            CACHE_REQUESTS.inc('catalog', 'hit')
+            return snapshot
+
+        CACHE_REQUESTS.inc('catalog', 'miss')
+        return self._reloads.do('snapshot', self._reload)
+
+    def load(self) -> CatalogSnapshot:
+        """Eagerly (re)build the snapshot, e.g. in the gunicorn master"""
+        self._snapshot = self._load()
+        return self._snapshot
+
+    def _load(self) -> CatalogSnapshot:
+        if self.storage == 'shared':
+            return SharedCatalogSnapshot(catalog_table.load(self.table_path, newer_than=self._fresh_after()))
+        return CatalogSnapshot.load()
+
+    def _reload(self) -> CatalogSnapshot:
+        with self._lock:
+            # A reload that finished just before this one started may have left a fresh snapshot
+            snapshot = self._snapshot
+            if snapshot is not None and not self._expired(snapshot):
+                return snapshot
+            generation, stale, changed = self._generation, self._stale, frozenset(self._changed_plans)
+
+        if stale is not None and not self._expired(stale):
+            snapshot = stale.patched(self._load_plans(changed))
+        else:
+            snapshot = self._load()
+        with self._lock:
+            if generation == self._generation:
+                self._snapshot, self._stale, self._changed_plans = snapshot, None, set()
+        return snapshot
+
+    @staticmethod
+    def _load_plans(plan_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+        changes = dict.fromkeys(plan_ids)
+        for plan in HealthPlanDAO.get_by_ids(changes):
+            if plan.is_active:
+                changes[plan.id] = plan.to_dict()
+        return changes
+
+    def invalidate(self, plan_ids: Optional[FrozenSet[int]] = None):
+        """Drop the snapshot; with ``plan_ids`` only those plans are read again"""
+        with self._lock:
+            self._generation += 1
+            base = self._snapshot or self._stale
+            if plan_ids is not None and isinstance(base, CatalogSnapshot):
+                self._stale = base
+                self._changed_plans |= plan_ids
+            else:
+                # Local time of arrival: a shared table built later is known to be newer
+                self._invalidated_at = time.time()
+                self._stale, self._changed_plans = None, set()
+            self._snapshot = None
+
+    def _fresh_after(self) -> float:
+        """Snapshots loaded at or before this time are stale"""
+        now = time.time()
+        limit = self._invalidated_at
+        if self.ttl > 0 and not invalidation_bus.cross_process:
+            # Nothing tells this worker about other workers' writes
+            limit = max(limit, now - self.ttl)
+        if not invalidation_bus.healthy():
+            # Invalidations from other workers may be missing
+            limit = max(limit, now - invalidation_bus.max_lag)
+        return limit
+
+    def _expired(self, snapshot: CatalogSnapshot) -> bool:
+        return snapshot.loaded_at <= self._fresh_after()
+
+
+catalog_cache = CatalogCache()
+invalidation_bus.subscribe(CATALOG_TOPIC, catalog_cache.invalidate)
@@ -1,10 +1,18 @@
 """
 Catalog DAO (Data Access Object)
+
+Writes are staged, never committed here (see unit_of_work.py); each one
+invalidates the catalog caches of every worker once it commits
 """
-from typing import Optional, List
+from typing import Optional, List, Iterable
+from sqlalchemy.orm import joinedload
+from flask_back_office import invalidation
 from flask_back_office.extensions import db
 from flask_back_office.catalog.models import PlanCategory, HealthPlan
 
+# Keys of the topic are plan ids; category changes invalidate everything
+CATALOG_TOPIC = 'catalog'
+
 
 class PlanCategoryDAO:
     """Data Access Object for PlanCategory"""
@@ -13,7 +21,8 @@ class PlanCategoryDAO:
     def create(name: str, description: str = None) -> PlanCategory:
         category = PlanCategory(name=name, description=description)
         db.session.add(category)
-        db.session.commit()
+        db.session.flush()
+        invalidation.publish(CATALOG_TOPIC)
         return category
     
     @staticmethod
@@ -32,13 +41,13 @@ class PlanCategoryDAO:
         for key, value in kwargs.items():
             if hasattr(category, key) and key != 'id':
                 setattr(category, key, value)
-        db.session.commit()
+        invalidation.publish(CATALOG_TOPIC)
         return category
     
     @staticmethod
     def delete(category: PlanCategory) -> bool:
         category.is_active = False
-        db.session.commit()
+        invalidation.publish(CATALOG_TOPIC)
         return True
 
 
@@ -48,7 +57,7 @@ class HealthPlanDAO:
     @staticmethod
     def create(category_id: int, name: str, coverage_amount: float,
                premium_monthly: float, premium_yearly: float,
-               description: str = None, features: str = None) -> HealthPlan:
+               description: str = None, features: str = None, eligibility: str = None) -> HealthPlan:
         plan = HealthPlan(
             category_id=category_id,
             name=name,
@@ -56,26 +65,34 @@ class HealthPlanDAO:
             coverage_amount=coverage_amount,
             premium_monthly=premium_monthly,
             premium_yearly=premium_yearly,
-            features=features
+            features=features,
+            eligibility=eligibility
         )
         db.session.add(plan)
-        db.session.commit()
+        db.session.flush()
+        invalidation.publish(CATALOG_TOPIC, key=plan.id)
         return plan
     
     @staticmethod
     def get_by_id(plan_id: int) -> Optional[HealthPlan]:
         return HealthPlan.query.get(plan_id)
     
+    @staticmethod
+    def get_by_ids(plan_ids: Iterable[int]) -> List[HealthPlan]:
+        return HealthPlan.query.options(joinedload(HealthPlan.category)).filter(
+            HealthPlan.id.in_(list(plan_ids))
+        ).all()
+    
     @staticmethod
     def get_all(active_only: bool = True) -> List[HealthPlan]:
-        query = HealthPlan.query
+        query = HealthPlan.query.options(joinedload(HealthPlan.category))
         if active_only:
             query = query.filter_by(is_active=True)
         return query.all()
     
     @staticmethod
     def get_by_category(category_id: int, active_only: bool = True) -> List[HealthPlan]:
-        query = HealthPlan.query.filter_by(category_id=category_id)
+        query = HealthPlan.query.options(joinedload(HealthPlan.category)).filter_by(category_id=category_id)
         if active_only:
             query = query.filter_by(is_active=True)
         return query.all()
@@ -85,11 +102,11 @@ class HealthPlanDAO:
         for key, value in kwargs.items():
             if hasattr(plan, key) and key != 'id':
                 setattr(plan, key, value)
-        db.session.commit()
+        invalidation.publish(CATALOG_TOPIC, key=plan.id)
         return plan
     
     @staticmethod
     def delete(plan: HealthPlan) -> bool:
         plan.is_active = False
-        db.session.commit()
+        invalidation.publish(CATALOG_TOPIC, key=plan.id)
         return True
\ No newline at end of file
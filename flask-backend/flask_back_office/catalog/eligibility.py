@@ -0,0 +1,181 @@
+"""
+Plan Eligibility Rules
+
+Each plan may carry rules (HealthPlan.eligibility, a JSON object next to
+``features``), every one optional:
+
+    {"min_age": 18, "max_age": 45,          entry age, inclusive
+     "genders": ["Female"],                 e.g. maternity plans
+     "states": ["Karnataka", "Kerala"],     states served
+     "pincodes": ["560", "682001"],         pincodes or prefixes served
+     "pre_existing": false}                 false: declines pre-existing conditions
+
+plus the pre-existing condition waiting period the plan already lists in
+``features`` (``pre_existing_waiting_years``).
+
+Rules are compiled once per catalog snapshot into NumPy arrays in snapshot
+order: age bounds and waiting years as vectors, genders as a bitset per
+plan, for each state the positions of the plans serving it, and pincodes
+in a ServiceabilityIndex (serviceability.py). A customer then becomes one boolean mask over the whole catalog, a handful
+of array operations however many plans there are. An attribute the
+customer does not give is not checked.
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from flask_back_office.catalog.serviceability import ServiceabilityIndex, is_pincode_prefix
+
+GENDERS = ('Male', 'Female', 'Other')
+ALL_GENDERS = (1 << len(GENDERS)) - 1
+MAX_AGE = 200
+RULE_KEYS = {'min_age', 'max_age', 'genders', 'states', 'pincodes', 'pre_existing'}
+
+
+def parse_rules(text: Optional[str]) -> Dict[str, Any]:
+    """Validated rules of one plan (ValueError when malformed)"""
+    if not text:
+        return {}
+    try:
+        rules = json.loads(text)
+    except ValueError:
+        raise ValueError('eligibility must be a JSON object')
+    if not isinstance(rules, dict):
+        raise ValueError('eligibility must be a JSON object')
+    unknown = set(rules) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Unknown eligibility rules: {', '.join(sorted(unknown))}")
+
+    for key in ('min_age', 'max_age'):
+        if key in rules and (not isinstance(rules[key], int) or isinstance(rules[key], bool)
+                             or not 0 <= rules[key] <= MAX_AGE):
+            raise ValueError(f'{key} must be a whole number of years')
+    if rules.get('min_age', 0) > rules.get('max_age', MAX_AGE):
+        raise ValueError('min_age must not exceed max_age')
+    if 'genders' in rules and (not isinstance(rules['genders'], list) or not rules['genders']
+                               or not all(gender in GENDERS for gender in rules['genders'])):
+        raise ValueError(f"genders must be a list of {', '.join(GENDERS)}")
+    for key in ('states', 'pincodes'):
+        if key in rules and (not isinstance(rules[key], list) or not rules[key]
+                             or not all(isinstance(value, str) and value.strip() for value in rules[key])):
+            raise ValueError(f'{key} must be a non-empty list of strings')
+    if 'pincodes' in rules and not all(is_pincode_prefix(value) for value in rules['pincodes']):
+        raise ValueError('pincodes must be prefixes of 6-digit pincodes')
+    if 'pre_existing' in rules and not isinstance(rules['pre_existing'], bool):
+        raise ValueError('pre_existing must be true or false')
+    return rules
+
+
+def _waiting_years(features: Optional[str]) -> float:
+    try:
+        value = json.loads(features).get('pre_existing_waiting_years', 0) if features else 0
+    except (ValueError, AttributeError):
+        return 0
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _positions(by_value: Dict[str, List[int]]) -> Dict[str, np.ndarray]:
+    return {value: np.array(positions, dtype=np.intp) for value, positions in by_value.items()}
+
+
+class CompiledRules:
+    """Eligibility rules of one catalog snapshot as arrays in snapshot order"""
+
+    def __init__(self, snapshot):
+        texts = snapshot.plan_text('eligibility')
+        features = snapshot.plan_text('features')
+        count = len(texts)
+        self.min_age = np.zeros(count, dtype=np.int16)
+        self.max_age = np.full(count, MAX_AGE, dtype=np.int16)
+        self.genders = np.full(count, ALL_GENDERS, dtype=np.uint8)
+        self.any_state = np.ones(count, dtype=bool)
+        self.accepts_pre_existing = np.ones(count, dtype=bool)
+        self.valid = np.ones(count, dtype=bool)
+        self.waiting_years = np.array([_waiting_years(text) for text in features], dtype=np.float32)
+        states: Dict[str, List[int]] = {}
+        pincodes: List[Optional[List[str]]] = []
+
+        for position, text in enumerate(texts):
+            try:
+                rules = parse_rules(text)
+            except ValueError:
+                # Written before validation or by hand: offer the plan to nobody
+                self.valid[position] = False
+                rules = {}
+            self.min_age[position] = rules.get('min_age', 0)
+            self.max_age[position] = rules.get('max_age', MAX_AGE)
+            if 'genders' in rules:
+                self.genders[position] = sum(1 << GENDERS.index(gender) for gender in rules['genders'])
+            if 'states' in rules:
+                self.any_state[position] = False
+                for state in rules['states']:
+                    states.setdefault(state.strip().casefold(), []).append(position)
+            pincodes.append(rules.get('pincodes'))
+            self.accepts_pre_existing[position] = rules.get('pre_existing', True)
+        self.states = _positions(states)
+        self.serviceability = ServiceabilityIndex(pincodes)
+
+        self.ids = np.asarray(snapshot.plan_column('id'), dtype=np.int64)
+        # Snapshot references (plan ids or table rows) to positions
+        self.refs = np.asarray(snapshot.refs(), dtype=np.int64)
+        self._order = np.argsort(self.refs, kind='stable')
+        self._sorted_refs = self.refs[self._order]
+
+    def mask(self, age: Optional[int] = None, gender: Optional[str] = None, state: Optional[str] = None,
+             pincode: Optional[str] = None, pre_existing: bool = False,
+             max_waiting_years: Optional[float] = None) -> np.ndarray:
+        """Which plans (in snapshot order) the customer is eligible for
+
+        ``pincode`` may also be a prefix: plans sold anywhere under it.
+        """
+        mask = self.valid.copy()
+        if age is not None:
+            mask &= (self.min_age <= age) & (age <= self.max_age)
+        if gender is not None:
+            mask &= (self.genders & (1 << GENDERS.index(gender))) != 0
+        if state is not None:
+            served = self.any_state.copy()
+            served[self.states.get(state.strip().casefold(), [])] = True
+            mask &= served
+        if pincode is not None:
+            mask &= self.serviceability.mask(pincode)
+        if pre_existing:
+            mask &= self.accepts_pre_existing
+        if max_waiting_years is not None:
+            mask &= self.waiting_years <= max_waiting_years
+        return mask
+
+    def plan_ids(self, mask: np.ndarray) -> List[int]:
+        """Ids of the plans in ``mask``, ascending"""
+        return np.sort(self.ids[mask]).tolist()
+
+    def select(self, refs: Sequence[int], mask: np.ndarray) -> Sequence[int]:
+        """The ``refs`` whose plans are in ``mask``, in their order"""
+        refs = np.asarray(refs, dtype=np.int64)
+        if not len(refs):
+            return []
+        positions = self._order[np.searchsorted(self._sorted_refs, refs)]
+        return refs[mask[positions]].tolist()
+
+
+class EligibilityRules:
+    """Process-wide CompiledRules of the current catalog snapshot"""
+
+    def __init__(self):
+        self._compiled: Optional[CompiledRules] = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, snapshot) -> CompiledRules:
+        """Rules of ``snapshot`` (the current one), compiled on first use"""
+        with self._lock:
+            if self._snapshot is snapshot:
+                return self._compiled
+            compiled = CompiledRules(snapshot)
+            self._compiled, self._snapshot = compiled, snapshot
+            return compiled
+
+
+eligibility_rules = EligibilityRules()
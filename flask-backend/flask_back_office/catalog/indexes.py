@@ -0,0 +1,101 @@
+"""
+Plan Range Indexes
+
+Sorted indexes over premium_monthly, premium_yearly and coverage_amount of a
+catalog snapshot. Browse filters ("premium between 500 and 1500 a month",
+"coverage of at least 10 lakh") and sorted pages become bisect lookups over
+the cached catalog, O(log n + k), instead of SQL scans or a pass over every
+plan.
+
+An index is two parallel arrays: the column's values in ascending order and
+the snapshot reference (plan id or table row) of each. Plan writes copy the
+arrays and move just the changed entries (bisect, then one delete and one
+insert each) instead of sorting everything again.
+"""
+import bisect
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+INDEXED_COLUMNS = ('premium_monthly', 'premium_yearly', 'coverage_amount')
+
+Range = Tuple[Optional[float], Optional[float]]
+
+
+class SortedIndex:
+    """Values of one column in ascending order, with the reference holding each"""
+
+    def __init__(self, values: Sequence[float], refs: Sequence[int]):
+        self.values = values
+        self.refs = refs
+
+    @classmethod
+    def build(cls, values: Sequence[float], refs: Sequence[int]) -> 'SortedIndex':
+        order = sorted(range(len(values)), key=values.__getitem__)
+        return cls(array('d', [values[i] for i in order]), array('q', [refs[i] for i in order]))
+
+    def bounds(self, low: Optional[float] = None, high: Optional[float] = None) -> Tuple[int, int]:
+        """Positions [start, stop) of the values within [low, high]"""
+        start = 0 if low is None else bisect.bisect_left(self.values, low)
+        stop = len(self.values) if high is None else bisect.bisect_right(self.values, high)
+        return start, max(start, stop)
+
+    def changed(self, removed: Iterable[Tuple[float, int]], added: Iterable[Tuple[float, int]]) -> 'SortedIndex':
+        """Copy without the ``removed`` and with the ``added`` (value, ref) entries"""
+        values, refs = array('d', self.values), array('q', self.refs)
+        for value, ref in removed:
+            position = bisect.bisect_left(values, value)
+            # Several refs can share the value
+            while position < len(refs) and values[position] == value and refs[position] != ref:
+                position += 1
+            if position < len(refs) and refs[position] == ref:
+                del values[position]
+                del refs[position]
+        for value, ref in added:
+            position = bisect.bisect_right(values, value)
+            values.insert(position, value)
+            refs.insert(position, ref)
+        return SortedIndex(values, refs)
+
+
+def search(snapshot, ranges: Dict[str, Range], sort: Optional[str] = None, descending: bool = False,
+           offset: int = 0, limit: Optional[int] = None,
+           keep: Optional[Callable[[Sequence[int]], Sequence[int]]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Filter ``snapshot`` plans by inclusive column ranges; return (total, requested page)
+
+    The narrowest range is read off its index; the other ranges filter those
+    candidates. ``keep`` narrows the candidates further (e.g. to the plans a
+    customer is eligible for), keeping their order. Without ``sort`` plans
+    keep catalog order.
+    """
+    indexes = snapshot.indexes
+    ranges = {column: bounds for column, bounds in ranges.items() if bounds != (None, None)}
+
+    if not ranges:
+        matches = snapshot.refs() if sort is None else indexes[sort].refs
+        if keep is not None:
+            matches = keep(matches)
+    else:
+        spans = {column: indexes[column].bounds(*bounds) for column, bounds in ranges.items()}
+        driver = min(spans, key=lambda column: spans[column][1] - spans[column][0])
+        start, stop = spans[driver]
+        matches = indexes[driver].refs[start:stop]
+        if keep is not None:
+            matches = keep(matches)
+
+        value = snapshot.value
+        for column, (low, high) in ranges.items():
+            if column != driver:
+                matches = [ref for ref in matches
+                           if (low is None or value(ref, column) >= low) and (high is None or value(ref, column) <= high)]
+        if sort is None:
+            matches = sorted(matches, key=snapshot.position)
+        elif sort != driver:
+            matches = sorted(matches, key=lambda ref: value(ref, sort))
+
+    total = len(matches)
+    if descending and sort is not None:
+        stop = max(total - offset, 0)
+        page = matches[0 if limit is None else max(stop - limit, 0):stop][::-1]
+    else:
+        page = matches[offset:None if limit is None else offset + limit]
+    return total, [snapshot.plan_at(ref) for ref in page]
@@ -30,6 +30,9 @@ class PlanCategory(db.Model):
 class HealthPlan(db.Model):
     """Health plan"""
     __tablename__ = 'health_plans'
+    __table_args__ = (
+        db.Index('ix_health_plans_category_id_is_active', 'category_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('plan_categories.id'), nullable=False)
@@ -39,6 +42,7 @@ class HealthPlan(db.Model):
     premium_monthly = db.Column(db.Float, nullable=False)
     premium_yearly = db.Column(db.Float, nullable=False)
     features = db.Column(db.Text, nullable=True)  # JSON string
+    eligibility = db.Column(db.Text, nullable=True)  # JSON string, see catalog/eligibility.py
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -54,5 +58,6 @@ class HealthPlan(db.Model):
             'premium_monthly': self.premium_monthly,
             'premium_yearly': self.premium_yearly,
             'features': self.features,
+            'eligibility': self.eligibility,
             'is_active': self.is_active
         }
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Household Premium Quotes
+
+Premiums for M household members across N candidate plans in one NumPy
+pass. A plan lists the premium of a reference adult (age 26-35); each
+member pays it times the factor of their age band, raised by any loadings,
+on the monthly or yearly price depending on their billing cycle:
+
+    premium[m, n] = price[cycle[m], n] * AGE_FACTORS[band(age[m])] * (1 + loading[m])
+
+The yearly price already carries the plan's discount for paying a year
+up front; ``yearly_discount`` reports what that saves the yearly members
+against twelve monthly payments.
+
+Plan ids and prices come from the catalog snapshot as arrays sorted by id,
+built once per snapshot, so a quote reads no rows and candidate plans are
+found with one searchsorted.
+"""
+import threading
+from datetime import date
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from flask_back_office.catalog.cache import catalog_cache
+
+# Lowest age of each band and its premium factor against the listed (26-35) premium
+AGE_BANDS = (
+    (0, 0.55), (18, 0.85), (26, 1.0), (36, 1.35), (46, 1.8),
+    (51, 2.2), (56, 2.7), (61, 3.3), (66, 4.0), (71, 4.8),
+)
+AGE_FLOORS = np.array([floor for floor, _ in AGE_BANDS])
+AGE_FACTORS = np.array([factor for _, factor in AGE_BANDS])
+MAX_AGE = 120
+
+# Extra premium per member risk, added up when a member has several
+LOADINGS = {
+    'tobacco': 0.25,
+    'pre_existing': 0.20,
+    'hazardous_occupation': 0.15,
+}
+
+BILLING_CYCLES = ('monthly', 'yearly')
+
+
+def age_on(date_of_birth: date, day: date) -> int:
+    """Completed years on ``day``"""
+    return day.year - date_of_birth.year - ((day.month, day.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def age_band(age: int) -> str:
+    band = int(np.searchsorted(AGE_FLOORS, age, side='right')) - 1
+    if band + 1 < len(AGE_BANDS):
+        return f'{AGE_BANDS[band][0]}-{AGE_BANDS[band + 1][0] - 1}'
+    return f'{AGE_BANDS[band][0]}+'
+
+
+class PlanPrices:
+    """Ids and premiums of a snapshot's plans as arrays, ordered by plan id"""
+
+    def __init__(self, snapshot):
+        ids = np.asarray(snapshot.plan_column('id'), dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        self.monthly = np.asarray(snapshot.plan_column('premium_monthly'), dtype=np.float64)[order]
+        self.yearly = np.asarray(snapshot.plan_column('premium_yearly'), dtype=np.float64)[order]
+
+    def positions(self, plan_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of ``plan_ids`` in the arrays, and which of them were found"""
+        wanted = np.asarray(plan_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(wanted), dtype=np.intp), np.zeros(len(wanted), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, wanted), len(self.ids) - 1)
+        return positions, self.ids[positions] == wanted
+
+
+def quote(prices: PlanPrices, plan_ids: Sequence[int], ages: Sequence[int],
+          yearly: Sequence[bool], loadings: Sequence[float]) -> Dict[str, Any]:
+    """Per-member premiums (M x N) and per-plan totals for the ``plan_ids`` in ``prices``
+
+    ``yearly`` is each member's billing cycle and ``loadings`` the sum of
+    their loadings. Plans not in ``prices`` are returned as ``missing``.
+    """
+    positions, found = prices.positions(plan_ids)
+    positions = positions[found]
+    yearly = np.asarray(yearly, dtype=bool)
+    bands = np.searchsorted(AGE_FLOORS, np.asarray(ages), side='right') - 1
+    factors = AGE_FACTORS[bands] * (1 + np.asarray(loadings, dtype=np.float64))
+
+    monthly_prices, yearly_prices = prices.monthly[positions], prices.yearly[positions]
+    premiums = np.round(np.where(yearly[:, None], yearly_prices, monthly_prices) * factors[:, None], 2)
+    monthly_total = premiums[~yearly].sum(axis=0)
+    yearly_total = premiums[yearly].sum(axis=0)
+    return {
+        'plan_ids': prices.ids[positions],
+        'missing': np.asarray(plan_ids, dtype=np.int64)[~found],
+        'factors': factors,
+        'premiums': premiums,
+        'monthly_total': np.round(monthly_total, 2),
+        'yearly_total': np.round(yearly_total, 2),
+        'annual_cost': np.round(12 * monthly_total + yearly_total, 2),
+        'yearly_discount': np.round((12 * monthly_prices - yearly_prices) * factors[yearly].sum(), 2),
+    }
+
+
+class QuotePrices:
+    """Process-wide PlanPrices of the current catalog snapshot"""
+
+    def __init__(self):
+        self._prices = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self) -> PlanPrices:
+        snapshot = catalog_cache.get()
+        with self._lock:
+            if self._snapshot is snapshot:
+                return self._prices
+        # Cheap enough (one pass over three columns) that concurrent builders need not wait for each other
+        prices = PlanPrices(snapshot)
+        with self._lock:
+            self._prices, self._snapshot = prices, snapshot
+        return prices
+
+
+quote_prices = QuotePrices()
+
+
+def quote_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One dict per quoted plan, in the order the plans were asked for"""
+    premiums = result['premiums'].T.tolist()
+    return [
+        {
+            'plan_id': plan_id,
+            'member_premiums': member_premiums,
+            'monthly_total': monthly_total,
+            'yearly_total': yearly_total,
+            'annual_cost': annual_cost,
+            'yearly_discount': yearly_discount,
+        }
+        for plan_id, member_premiums, monthly_total, yearly_total, annual_cost, yearly_discount in zip(
+            result['plan_ids'].tolist(), premiums, result['monthly_total'].tolist(),
+            result['yearly_total'].tolist(), result['annual_cost'].tolist(), result['yearly_discount'].tolist())
+    ]
@@ -0,0 +1,91 @@
+"""
+Pincode Serviceability Index
+
+Which plans can be bought at a pincode, or anywhere under a pincode prefix
+(a postal region "5", sub-region "56" or sorting district "560"), from the
+``pincodes`` eligibility rule of each plan (see eligibility.py). Plans
+without it are served everywhere.
+
+Every (prefix, plan) pair of the rules is kept as sorted int arrays, built
+with a few vectorized sorts rather than row by row:
+
+    keys       distinct prefixes as length * 10**6 + int(prefix), ascending
+    offsets    where each key's plans start in ``positions`` (CSR layout)
+    positions  plan positions (snapshot order), grouped by key
+
+Keys of one length are in numeric order, so the prefixes under "560" of
+length l are the contiguous key range [560 * 10**(l-3), 561 * 10**(l-3))
+and their plans one contiguous slice of ``positions``. A lookup is thus
+the unrestricted plans, the plans naming an ancestor of the prefix (one
+key each) and the district rollup under it (one slice per longer length):
+at most a dozen slices, however many pincodes and plans there are.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+PINCODE_LENGTH = 6
+_SCALE = 10 ** PINCODE_LENGTH
+
+
+def is_pincode_prefix(value: str) -> bool:
+    """Whether ``value`` is a pincode or its first digits (ASCII only: ``_keys`` parses them by code point)"""
+    return value.isascii() and value.isdigit() and len(value) <= PINCODE_LENGTH
+
+
+def _keys(prefixes: Sequence[str]) -> np.ndarray:
+    """length * 10**6 + int(prefix) of each digit string, parsed column by column"""
+    # Each row holds one prefix's UCS-4 code points, zero-padded on the right
+    codes = np.array(prefixes, dtype=f'U{PINCODE_LENGTH}').view(np.uint32).reshape(-1, PINCODE_LENGTH)
+    values = np.zeros(len(codes), dtype=np.int64)
+    for column in codes.T.astype(np.int64):
+        values = np.where(column > 0, values * 10 + column - ord('0'), values)
+    return (codes > 0).sum(axis=1) * _SCALE + values
+
+
+class ServiceabilityIndex:
+    """Pincode prefix -> plans serving it, for one catalog snapshot"""
+
+    def __init__(self, pincodes: Sequence[Optional[Sequence[str]]]):
+        """``pincodes``: each plan's pincode prefixes in snapshot order (None when unrestricted)"""
+        self.count = len(pincodes)
+        self.unrestricted = np.array([position for position, prefixes in enumerate(pincodes) if prefixes is None],
+                                     dtype=np.uint32)
+        restricted = [(position, prefixes) for position, prefixes in enumerate(pincodes) if prefixes is not None]
+
+        prefixes = [prefix for _, plan_prefixes in restricted for prefix in plan_prefixes]
+        owners = np.repeat(np.array([position for position, _ in restricted], dtype=np.int64),
+                           [len(plan_prefixes) for _, plan_prefixes in restricted])
+        keys = _keys(prefixes)
+
+        # Sorted by key, then plan; a plan naming the same prefix twice counts once
+        pairs = np.sort(keys * max(self.count, 1) + owners)
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])] if len(pairs) else pairs
+        keys, owners = pairs // max(self.count, 1), pairs % max(self.count, 1)
+
+        starts = np.flatnonzero(np.append(True, keys[1:] != keys[:-1])) if len(keys) else np.zeros(0, dtype=np.int64)
+        self.keys = keys[starts]
+        self.offsets = np.append(starts, len(keys))
+        self.positions = owners.astype(np.uint32)
+
+    def mask(self, prefix: str) -> np.ndarray:
+        """Plans (in snapshot order) sold at ``prefix``: a pincode, or anywhere under a shorter prefix"""
+        value, length = int(prefix), len(prefix)
+        # Shorter prefixes covering all of it, then it and the longer ones under it
+        ancestors = [(shorter, value // 10 ** (length - shorter), 1) for shorter in range(1, length)]
+        under = [(longer, value * 10 ** (longer - length), 10 ** (longer - length))
+                 for longer in range(length, PINCODE_LENGTH + 1)]
+        lows = np.array([size * _SCALE + low for size, low, _ in ancestors + under], dtype=np.int64)
+        highs = lows + np.array([width for _, _, width in ancestors + under], dtype=np.int64)
+        starts = self.offsets[np.searchsorted(self.keys, lows)]
+        stops = self.offsets[np.searchsorted(self.keys, highs)]
+
+        mask = np.zeros(self.count, dtype=bool)
+        mask[self.unrestricted] = True
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            mask[self.positions[start:stop]] = True
+        return mask
+
+    @property
+    def nbytes(self) -> int:
+        return self.unrestricted.nbytes + self.keys.nbytes + self.offsets.nbytes + self.positions.nbytes
@@ -1,8 +1,91 @@
 """
 Catalog Services (Business Logic)
 """
-from typing import Tuple, Dict, Any, List
+import math
+from datetime import date
+from typing import Tuple, Dict, Any, List, Optional, Mapping
+from flask_back_office.accounts.dao import UserProfileDAO
 from flask_back_office.catalog.dao import PlanCategoryDAO, HealthPlanDAO
+from flask_back_office.catalog.cache import catalog_cache
+from flask_back_office.catalog.eligibility import GENDERS, eligibility_rules, parse_rules
+from flask_back_office.catalog.serviceability import PINCODE_LENGTH, is_pincode_prefix
+from flask_back_office.catalog.indexes import INDEXED_COLUMNS, search
+from flask_back_office.catalog.quotes import (
+    BILLING_CYCLES, LOADINGS, MAX_AGE, age_band, age_on, quote, quote_prices, quote_rows
+)
+from flask_back_office.catalog.simulation import PERCENTILES, age_band_index, simulate, simulation_rows, simulations
+from flask_back_office.catalog.suggest import MAX_LIMIT, suggestions
+from flask_back_office.single_flight import SingleFlight
+from flask_back_office.unit_of_work import unit_of_work
+
+# Concurrent requests for the same plan or category in a worker share one query
+plan_reads = SingleFlight('plan')
+category_plan_reads = SingleFlight('category_plans')
+
+MAX_PLAN_ID = 2 ** 63 - 1
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+def _plan_ids(value: Any, limit: int, per: str) -> List[int]:
+    """Distinct plan ids of a request body, in order (ValueError when invalid)"""
+    # Ids are looked up as int64, so larger ones cannot name a plan
+    if not isinstance(value, list) or not value or \
+            not all(isinstance(plan_id, int) and not isinstance(plan_id, bool) and 1 <= plan_id <= MAX_PLAN_ID
+                    for plan_id in value):
+        raise ValueError('plan_ids must be a non-empty list of plan ids')
+    plan_ids = list(dict.fromkeys(value))
+    if len(plan_ids) > limit:
+        raise ValueError(f'At most {limit} plans per {per}')
+    return plan_ids
+
+
+def _customer(params: Mapping[str, str]) -> Dict[str, Any]:
+    """Eligibility attributes of the customer given in ``params`` (ValueError when invalid)"""
+    customer: Dict[str, Any] = {}
+    if params.get('age'):
+        # str.isdigit() also accepts digits int() rejects, such as '²'
+        if not (params['age'].isascii() and params['age'].isdigit()):
+            raise ValueError('age must be a whole number of years')
+        customer['age'] = int(params['age'])
+    elif params.get('date_of_birth'):
+        try:
+            customer['age'] = age_on(date.fromisoformat(params['date_of_birth']), date.today())
+        except ValueError:
+            raise ValueError('date_of_birth must be a date (YYYY-MM-DD)')
+    if params.get('gender'):
+        gender = params['gender'].capitalize()
+        if gender not in GENDERS:
+            raise ValueError(f"gender must be one of {', '.join(GENDERS)}")
+        customer['gender'] = gender
+    if params.get('state'):
+        customer['state'] = params['state']
+    if params.get('pincode') and params.get('serviceable_in'):
+        raise ValueError('Give pincode or serviceable_in, not both')
+    if params.get('pincode'):
+        if not (is_pincode_prefix(params['pincode']) and len(params['pincode']) == PINCODE_LENGTH):
+            raise ValueError(f'pincode must be {PINCODE_LENGTH} digits')
+        customer['pincode'] = params['pincode']
+    if params.get('serviceable_in'):
+        # Plans sold anywhere under a pincode prefix (region, district)
+        if not is_pincode_prefix(params['serviceable_in']):
+            raise ValueError('serviceable_in must be a pincode or its first digits')
+        customer['pincode'] = params['serviceable_in']
+    if params.get('pre_existing'):
+        customer['pre_existing'] = params['pre_existing'].lower() in ('true', '1', 'yes')
+    if params.get('max_waiting_years'):
+        try:
+            customer['max_waiting_years'] = _number(params['max_waiting_years'])
+        except ValueError:
+            raise ValueError('max_waiting_years must be a number')
+    return customer
 
 
 class CategoryService:
@@ -11,9 +94,9 @@ class CategoryService:
     @staticmethod
     def get_all_categories() -> Tuple[bool, Dict[str, Any]]:
         """Get all active categories"""
-        categories = PlanCategoryDAO.get_all(active_only=True)
+        snapshot = catalog_cache.get()
         return True, {
-            'categories': [c.to_dict() for c in categories]
+            'categories': snapshot.categories
         }
     
     @staticmethod
@@ -33,7 +116,8 @@ class CategoryService:
             return False, {'error': 'Category name is required'}
         
         try:
-            category = PlanCategoryDAO.create(name=name.strip(), description=description)
+            with unit_of_work():
+                category = PlanCategoryDAO.create(name=name.strip(), description=description)
             return True, {
                 'message': 'Category created',
                 'category': category.to_dict()
@@ -42,37 +126,272 @@ class CategoryService:
             return False, {'error': str(e)}
 
 
+class SuggestService:
+    """Typeahead suggestions over plan and category names"""
+    
+    MAX_PREFIX_LENGTH = 100
+    DEFAULT_LIMIT = 8
+    
+    @staticmethod
+    def suggest(prefix: Optional[str], limit: Optional[str] = None) -> Tuple[bool, Dict[str, Any]]:
+        """Most popular plans and categories with a word starting with ``prefix``"""
+        prefix = (prefix or '').strip()
+        if not prefix:
+            return False, {'error': 'prefix is required'}
+        if len(prefix) > SuggestService.MAX_PREFIX_LENGTH:
+            return False, {'error': f'prefix must be at most {SuggestService.MAX_PREFIX_LENGTH} characters'}
+        
+        try:
+            limit = int(limit) if limit else SuggestService.DEFAULT_LIMIT
+        except ValueError:
+            return False, {'error': 'limit must be a whole number'}
+        if not 1 <= limit <= MAX_LIMIT:
+            return False, {'error': f'limit must be between 1 and {MAX_LIMIT}'}
+        
+        return True, {
+            'prefix': prefix,
+            'suggestions': suggestions.suggest(prefix, limit)
+        }
+
+
+class QuoteService:
+    """Household premium quotes"""
+    
+    MAX_MEMBERS = 10
+    MAX_PLANS = 1000
+    
+    @staticmethod
+    def quote(plan_ids: Any, members: Any, user_id: Optional[int] = None) -> Tuple[bool, Dict[str, Any]]:
+        """Premiums of every member on every plan, with per-plan totals
+        
+        A member is {"age": n} or {"date_of_birth": "YYYY-MM-DD"} or, signed in,
+        {"relation": "self"} (date of birth from the profile), plus optional
+        "billing_cycle" (monthly/yearly) and "loadings" (see quotes.LOADINGS).
+        """
+        try:
+            plan_ids = _plan_ids(plan_ids, QuoteService.MAX_PLANS, 'quote')
+        except ValueError as e:
+            return False, {'error': str(e)}
+        if not isinstance(members, list) or not members:
+            return False, {'error': 'members must be a non-empty list'}
+        if len(members) > QuoteService.MAX_MEMBERS:
+            return False, {'error': f'At most {QuoteService.MAX_MEMBERS} members per quote'}
+        
+        today = date.today()
+        ages, yearly, loadings = [], [], []
+        for number, member in enumerate(members, start=1):
+            if not isinstance(member, dict):
+                return False, {'error': f'Member {number} must be an object'}
+            age = QuoteService._age(member, user_id, today)
+            if isinstance(age, str):
+                return False, {'error': f'Member {number}: {age}'}
+            
+            cycle = member.get('billing_cycle', 'monthly')
+            if cycle not in BILLING_CYCLES:
+                return False, {'error': f"Member {number}: billing_cycle must be one of {', '.join(BILLING_CYCLES)}"}
+            member_loadings = member.get('loadings') or []
+            if not isinstance(member_loadings, list) or \
+                    not all(isinstance(loading, str) and loading in LOADINGS for loading in member_loadings):
+                return False, {'error': f"Member {number}: loadings must be a list of {', '.join(LOADINGS)}"}
+            
+            ages.append(age)
+            yearly.append(cycle == 'yearly')
+            loadings.append(sum(LOADINGS[loading] for loading in set(member_loadings)))
+        
+        result = quote(quote_prices.get(), plan_ids, ages, yearly, loadings)
+        return True, {
+            'as_of': today.isoformat(),
+            'members': [
+                {
+                    'age': age,
+                    'age_band': age_band(age),
+                    'billing_cycle': BILLING_CYCLES[is_yearly],
+                    'factor': round(factor, 4)
+                }
+                for age, is_yearly, factor in zip(ages, yearly, result['factors'].tolist())
+            ],
+            'quotes': quote_rows(result),
+            'missing_plan_ids': result['missing'].tolist()
+        }
+    
+    @staticmethod
+    def _age(member: Dict[str, Any], user_id: Optional[int], today: date):
+        """The member's age, or an error message"""
+        if member.get('relation') == 'self' and 'age' not in member and 'date_of_birth' not in member:
+            if user_id is None:
+                return 'sign in to quote for yourself, or give age or date_of_birth'
+            profile = UserProfileDAO.get_by_user_id(user_id)
+            if not profile or not profile.date_of_birth:
+                return 'add date_of_birth to your profile, or give age or date_of_birth'
+            return age_on(profile.date_of_birth, today)
+        
+        if 'date_of_birth' in member:
+            try:
+                date_of_birth = date.fromisoformat(member['date_of_birth'])
+            except (TypeError, ValueError):
+                return 'date_of_birth must be a date (YYYY-MM-DD)'
+            age = age_on(date_of_birth, today)
+        else:
+            age = member.get('age')
+            if not isinstance(age, int) or isinstance(age, bool):
+                return 'age or date_of_birth is required'
+        if not 0 <= age <= MAX_AGE:
+            return f'age must be between 0 and {MAX_AGE}'
+        return age
+
+
+class SimulationService:
+    """Monte Carlo out-of-pocket cost of candidate plans"""
+    
+    MAX_PLANS = 1000
+    
+    @staticmethod
+    def simulate(plan_ids: Any, member: Any, user_id: Optional[int] = None) -> Tuple[bool, Dict[str, Any]]:
+        """Expected and tail (PERCENTILES) yearly cost of each plan for one member, cheapest first
+        
+        The member is given as for a quote ({"age": n}, {"date_of_birth": ...} or
+        {"relation": "self"}), plus optional "pre_existing" (true/false).
+        """
+        try:
+            plan_ids = _plan_ids(plan_ids, SimulationService.MAX_PLANS, 'simulation')
+        except ValueError as e:
+            return False, {'error': str(e)}
+        if not isinstance(member, dict):
+            return False, {'error': 'member must be an object'}
+        
+        today = date.today()
+        age = QuoteService._age(member, user_id, today)
+        if isinstance(age, str):
+            return False, {'error': age}
+        pre_existing = member.get('pre_existing', False)
+        if not isinstance(pre_existing, bool):
+            return False, {'error': 'pre_existing must be true or false'}
+        
+        band = age_band_index(age)
+        result = simulate(simulations.terms(), simulations.scenarios(band, pre_existing), plan_ids, band, pre_existing)
+        return True, {
+            'as_of': today.isoformat(),
+            'member': {'age': age, 'age_band': age_band(age), 'pre_existing': pre_existing},
+            'scenarios': simulations.scenario_count,
+            'seed': simulations.seed,
+            'percentiles': list(PERCENTILES),
+            'plans': simulation_rows(result),
+            'missing_plan_ids': result['missing'].tolist()
+        }
+
+
 class PlanService:
     """Health plan service"""
     
     @staticmethod
     def get_all_plans() -> Tuple[bool, Dict[str, Any]]:
         """Get all active plans"""
-        plans = HealthPlanDAO.get_all(active_only=True)
+        snapshot = catalog_cache.get()
         return True, {
-            'plans': [p.to_dict() for p in plans]
+            'plans': snapshot.plans
+        }
+    
+    @staticmethod
+    def search_plans(params: Mapping[str, str]) -> Tuple[bool, Dict[str, Any]]:
+        """Active plans within min_/max_<column> ranges, sorted by ``sort`` ([-]<column>), paginated
+        
+        Columns: premium_monthly, premium_yearly, coverage_amount (served from the range indexes).
+        age (or date_of_birth), gender, state, pincode (or serviceable_in, a
+        pincode prefix), pre_existing and max_waiting_years keep the plans
+        that customer is eligible for.
+        """
+        try:
+            ranges = {
+                column: (_number(params.get(f'min_{column}')), _number(params.get(f'max_{column}')))
+                for column in INDEXED_COLUMNS
+            }
+        except ValueError:
+            return False, {'error': 'Range filters must be numbers'}
+        
+        try:
+            offset = int(params.get('offset') or 0)
+            limit = int(params['limit']) if params.get('limit') else None
+        except ValueError:
+            return False, {'error': 'offset and limit must be whole numbers'}
+        if offset < 0 or (limit is not None and limit < 0):
+            return False, {'error': 'offset and limit must not be negative'}
+        
+        sort = params.get('sort') or None
+        descending = bool(sort) and sort.startswith('-')
+        if sort:
+            sort = sort.lstrip('-')
+            if sort not in INDEXED_COLUMNS:
+                return False, {'error': f"sort must be one of {', '.join(INDEXED_COLUMNS)} (prefix - for descending)"}
+        
+        try:
+            customer = _customer(params)
+        except ValueError as e:
+            return False, {'error': str(e)}
+        
+        snapshot = catalog_cache.get()
+        keep = None
+        if customer:
+            rules = eligibility_rules.get(snapshot)
+            eligible = rules.mask(**customer)
+            keep = lambda refs: rules.select(refs, eligible)
+        
+        total, plans = search(snapshot, ranges, sort=sort, descending=descending,
+                              offset=offset, limit=limit, keep=keep)
+        return True, {
+            'plans': plans,
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        }
+    
+    @staticmethod
+    def get_serviceable_plans(prefix: str) -> Tuple[bool, Dict[str, Any]]:
+        """Ids of the active plans sold at a pincode, or anywhere under a pincode prefix"""
+        if not is_pincode_prefix(prefix):
+            return False, {'error': 'Expected a pincode or its first digits'}
+        
+        rules = eligibility_rules.get(catalog_cache.get())
+        # A plan with malformed rules is offered to nobody, wherever it is sold
+        plan_ids = rules.plan_ids(rules.serviceability.mask(prefix) & rules.valid)
+        return True, {
+            'prefix': prefix,
+            'plan_ids': plan_ids,
+            'total': len(plan_ids)
         }
     
     @staticmethod
     def get_plan(plan_id: int) -> Tuple[bool, Dict[str, Any]]:
         """Get plan by ID"""
-        plan = HealthPlanDAO.get_by_id(plan_id)
+        plan = plan_reads.do(plan_id, lambda: PlanService._load_plan(plan_id))
         
         if not plan:
             return False, {'error': 'Plan not found'}
         
-        return True, {'plan': plan.to_dict()}
+        return True, {'plan': plan}
     
     @staticmethod
     def get_plans_by_category(category_id: int) -> Tuple[bool, Dict[str, Any]]:
         """Get plans by category"""
-        category = PlanCategoryDAO.get_by_id(category_id)
+        result = category_plan_reads.do(category_id, lambda: PlanService._load_category_plans(category_id))
         
-        if not category:
+        if not result:
             return False, {'error': 'Category not found'}
         
+        return True, result
+    
+    @staticmethod
+    def _load_plan(plan_id: int) -> Optional[Dict[str, Any]]:
+        plan = HealthPlanDAO.get_by_id(plan_id)
+        return plan.to_dict() if plan else None
+    
+    @staticmethod
+    def _load_category_plans(category_id: int) -> Optional[Dict[str, Any]]:
+        category = PlanCategoryDAO.get_by_id(category_id)
+        if not category:
+            return None
+        
         plans = HealthPlanDAO.get_by_category(category_id, active_only=True)
-        return True, {
+        return {
             'category': category.to_dict(),
             'plans': [p.to_dict() for p in plans]
         }
@@ -80,7 +399,8 @@ class PlanService:
     @staticmethod
     def create_plan(category_id: int, name: str, coverage_amount: float,
                     premium_monthly: float, premium_yearly: float,
-                    description: str = None, features: str = None) -> Tuple[bool, Dict[str, Any]]:
+                    description: str = None, features: str = None,
+                    eligibility: str = None) -> Tuple[bool, Dict[str, Any]]:
         """Create a new plan"""
         # Validate
         if not name:
@@ -92,21 +412,28 @@ class PlanService:
         if premium_monthly <= 0 or premium_yearly <= 0:
             return False, {'error': 'Premium must be positive'}
         
+        try:
+            parse_rules(eligibility)
+        except ValueError as e:
+            return False, {'error': str(e)}
+        
         # Check category exists
         category = PlanCategoryDAO.get_by_id(category_id)
         if not category:
             return False, {'error': 'Category not found'}
         
         try:
-            plan = HealthPlanDAO.create(
-                category_id=category_id,
-                name=name,
-                description=description,
-                coverage_amount=coverage_amount,
-                premium_monthly=premium_monthly,
-                premium_yearly=premium_yearly,
-                features=features
-            )
+            with unit_of_work():
+                plan = HealthPlanDAO.create(
+                    category_id=category_id,
+                    name=name,
+                    description=description,
+                    coverage_amount=coverage_amount,
+                    premium_monthly=premium_monthly,
+                    premium_yearly=premium_yearly,
+                    features=features,
+                    eligibility=eligibility
+                )
             return True, {
                 'message': 'Plan created',
                 'plan': plan.to_dict()
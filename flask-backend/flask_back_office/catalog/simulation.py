@@ -0,0 +1,265 @@
+"""
+Out-of-Pocket Cost Simulation (Monte Carlo plan comparison)
+
+What a customer may pay in a year on each candidate plan: the premium plus
+their share of the claims, over SIMULATION_SCENARIOS simulated years. In a
+year the customer is hospitalised a Poisson number of times, at the rate of
+their age band (CLAIM_BANDS, raised for a pre-existing condition), each
+claim drawn from the configured severity distribution (lognormal or gamma
+with SIMULATION_SEVERITY_MEAN and SIMULATION_SEVERITY_CV, scaled by band).
+
+Given a year's claims A, a plan with sum insured SI and co-payment c pays
+its share of the admissible amount up to SI. While its pre-existing
+waiting period runs, the part of every claim due to a pre-existing
+condition (PRE_EXISTING_SHARE) is not admissible:
+
+    out_of_pocket(A) = u * A + max(c * (1 - u) * A, (1 - u) * A - SI)
+
+with u that share (0 without the condition or the wait). This is
+non-decreasing in A, so every plan's percentiles are its out-of-pocket at
+the same percentiles of A, and its mean is two prefix sums either side of
+the kink A = SI / ((1 - u) * (1 - c)). With the year totals of a profile
+sorted once, comparing N plans is one searchsorted over the scenarios and a
+few length-N array operations: the exact result of the scenarios x plans
+matrix, without building it.
+
+Scenarios depend only on the profile bucket (age band, pre-existing
+condition) and are drawn from a stream seeded with (SIMULATION_SEED,
+bucket), so every worker and every run sees the same years for a bucket,
+and every plan is compared on the same years. The sorted totals are kept
+per bucket (SIMULATION_CACHE_SIZE buckets, least recently used dropped);
+plan terms follow the catalog snapshot.
+"""
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from flask_back_office.catalog.cache import catalog_cache
+from flask_back_office.catalog.quotes import AGE_FACTORS, AGE_FLOORS, LOADINGS
+from flask_back_office.single_flight import SingleFlight
+
+# Per AGE_BANDS band: hospitalisations per year and claim size against SIMULATION_SEVERITY_MEAN
+CLAIM_BANDS = (
+    (0.08, 0.6), (0.05, 0.7), (0.06, 0.8), (0.08, 1.0), (0.11, 1.2),
+    (0.14, 1.4), (0.18, 1.6), (0.23, 1.8), (0.30, 2.1), (0.38, 2.4),
+)
+PRE_EXISTING_RATE_FACTOR = 1.5
+# Part of each claim due to the pre-existing condition
+PRE_EXISTING_SHARE = 0.4
+SEVERITIES = ('lognormal', 'gamma')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def age_band_index(age: int) -> int:
+    return int(np.searchsorted(AGE_FLOORS, age, side='right')) - 1
+
+
+class ClaimModel:
+    """Claim frequency and severity of a profile bucket"""
+
+    def __init__(self, severity: str = 'lognormal', severity_mean: float = 60000, severity_cv: float = 1.5):
+        if severity not in SEVERITIES:
+            raise ValueError(f'Unknown SIMULATION_SEVERITY {severity!r}')
+        if severity_mean <= 0 or severity_cv <= 0:
+            raise ValueError('SIMULATION_SEVERITY_MEAN and SIMULATION_SEVERITY_CV must be positive')
+        self.severity = severity
+        self.severity_mean = severity_mean
+        self.severity_cv = severity_cv
+
+    def claim_rate(self, band: int, pre_existing: bool) -> float:
+        rate = CLAIM_BANDS[band][0]
+        return rate * PRE_EXISTING_RATE_FACTOR if pre_existing else rate
+
+    def claims(self, rng: np.random.Generator, band: int, size: int) -> np.ndarray:
+        """``size`` claim amounts of the band"""
+        mean, cv = self.severity_mean * CLAIM_BANDS[band][1], self.severity_cv
+        if self.severity == 'gamma':
+            return rng.gamma(1 / cv ** 2, mean * cv ** 2, size)
+        sigma = math.sqrt(math.log1p(cv ** 2))
+        return rng.lognormal(math.log(mean) - sigma ** 2 / 2, sigma, size)
+
+    def years(self, rng: np.random.Generator, band: int, pre_existing: bool, scenarios: int) -> np.ndarray:
+        """Total claims of each of ``scenarios`` simulated years"""
+        counts = rng.poisson(self.claim_rate(band, pre_existing), scenarios)
+        amounts = self.claims(rng, band, int(counts.sum()))
+        return np.bincount(np.repeat(np.arange(scenarios), counts), weights=amounts, minlength=scenarios)
+
+
+class Scenarios:
+    """Simulated years of one profile bucket, as sorted claim totals"""
+
+    def __init__(self, years: np.ndarray):
+        self.claims = np.sort(years)
+        self.count = len(self.claims)
+        # Sum of the i smallest totals at [i]
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.claims)))
+        # Sample percentiles (a simulated year each, so exact for any monotone cost)
+        self.at = np.array([max(math.ceil(p / 100 * self.count) - 1, 0) for p in PERCENTILES], dtype=np.intp)
+
+    def out_of_pocket(self, coverage: np.ndarray, copay: np.ndarray, uncovered: np.ndarray) -> Dict[str, np.ndarray]:
+        """Mean, PERCENTILES (P x N) and chance of outgrowing the cover, per plan"""
+        admissible = (1 - uncovered) * (1 - copay)
+        with np.errstate(divide='ignore'):
+            kink = np.where(admissible > 0, coverage / np.where(admissible > 0, admissible, 1), np.inf)
+        below = np.searchsorted(self.claims, kink, side='left')
+        rate = uncovered + copay * (1 - uncovered)
+        total = self.prefix[-1]
+        mean = (rate * self.prefix[below] + total - self.prefix[below] - coverage * (self.count - below)) / self.count
+
+        claims = self.claims[self.at][:, None]
+        percentiles = np.where(claims < kink, rate * claims, claims - coverage)
+        return {'mean': mean, 'percentiles': percentiles, 'exceeds_cover': (self.count - below) / self.count}
+
+    @property
+    def nbytes(self) -> int:
+        return self.claims.nbytes + self.prefix.nbytes
+
+
+def _features(text: Optional[str]) -> Dict[str, Any]:
+    try:
+        features = json.loads(text) if text else {}
+    except ValueError:
+        return {}
+    return features if isinstance(features, dict) else {}
+
+
+def _number(value: Any, default: float = 0) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+class PlanTerms:
+    """Sum insured, co-payment, waiting period and yearly premium of a snapshot's plans, ordered by plan id"""
+
+    def __init__(self, snapshot):
+        ids = np.asarray(snapshot.plan_column('id'), dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        features = [_features(text) for text in snapshot.plan_text('features')]
+        self.ids = ids[order]
+        self.coverage = np.asarray(snapshot.plan_column('coverage_amount'), dtype=np.float64)[order]
+        self.premium_yearly = np.asarray(snapshot.plan_column('premium_yearly'), dtype=np.float64)[order]
+        self.copay = np.clip([_number(plan.get('copay_percent')) / 100 for plan in features], 0, 1)[order]
+        self.waiting_years = np.array([_number(plan.get('pre_existing_waiting_years')) for plan in features],
+                                      dtype=np.float64)[order]
+
+    def positions(self, plan_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of ``plan_ids`` in the arrays, and which of them were found"""
+        wanted = np.asarray(plan_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(wanted), dtype=np.intp), np.zeros(len(wanted), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, wanted), len(self.ids) - 1)
+        return positions, self.ids[positions] == wanted
+
+
+def simulate(terms: PlanTerms, scenarios: Scenarios, plan_ids: Sequence[int], band: int,
+             pre_existing: bool) -> Dict[str, Any]:
+    """Premium, out-of-pocket statistics and annual cost of the ``plan_ids`` in ``terms``, cheapest first
+
+    Plans not in ``terms`` are returned as ``missing``.
+    """
+    positions, found = terms.positions(plan_ids)
+    positions = positions[found]
+    loading = LOADINGS['pre_existing'] if pre_existing else 0
+    premiums = np.round(terms.premium_yearly[positions] * AGE_FACTORS[band] * (1 + loading), 2)
+    uncovered = np.where(terms.waiting_years[positions] > 0, PRE_EXISTING_SHARE, 0) if pre_existing \
+        else np.zeros(len(positions))
+    costs = scenarios.out_of_pocket(terms.coverage[positions], terms.copay[positions], uncovered)
+
+    annual_cost = premiums + costs['mean']
+    order = np.argsort(annual_cost, kind='stable')
+    return {
+        'plan_ids': terms.ids[positions][order],
+        'missing': np.asarray(plan_ids, dtype=np.int64)[~found],
+        'premiums': premiums[order],
+        'expected_out_of_pocket': np.round(costs['mean'][order], 2),
+        'out_of_pocket_percentiles': np.round(costs['percentiles'][:, order], 2),
+        'expected_annual_cost': np.round(annual_cost[order], 2),
+        'annual_cost_percentiles': np.round(premiums[order] + costs['percentiles'][:, order], 2),
+        'exceeds_cover': costs['exceeds_cover'][order],
+    }
+
+
+def simulation_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One dict per simulated plan, cheapest expected annual cost first"""
+    out_of_pocket = result['out_of_pocket_percentiles'].T.tolist()
+    annual_cost = result['annual_cost_percentiles'].T.tolist()
+    return [
+        {
+            'plan_id': plan_id,
+            'premium_yearly': premium,
+            'expected_out_of_pocket': expected_out_of_pocket,
+            'expected_annual_cost': expected_annual_cost,
+            'out_of_pocket': {f'p{p}': value for p, value in zip(PERCENTILES, plan_out_of_pocket)},
+            'annual_cost': {f'p{p}': value for p, value in zip(PERCENTILES, plan_annual_cost)},
+            'exceeds_cover_probability': round(exceeds_cover, 4),
+        }
+        for plan_id, premium, expected_out_of_pocket, expected_annual_cost, plan_out_of_pocket, plan_annual_cost,
+        exceeds_cover in zip(
+            result['plan_ids'].tolist(), result['premiums'].tolist(), result['expected_out_of_pocket'].tolist(),
+            result['expected_annual_cost'].tolist(), out_of_pocket, annual_cost, result['exceeds_cover'].tolist())
+    ]
+
+
+class Simulations:
+    """Process-wide scenarios per profile bucket and PlanTerms of the current catalog snapshot"""
+
+    def __init__(self, scenarios: int = 100000, seed: int = 0, model: Optional[ClaimModel] = None,
+                 cache_size: int = 20):
+        self.scenario_count = scenarios
+        self.seed = seed
+        self.model = model or ClaimModel()
+        self.cache_size = cache_size
+        self._scenarios: 'OrderedDict[Tuple[int, bool], Scenarios]' = OrderedDict()
+        self._terms: Optional[PlanTerms] = None
+        self._terms_snapshot = None
+        self._builds = SingleFlight('simulation')
+        self._lock = threading.Lock()
+
+    def configure(self, scenarios: int, seed: int, model: ClaimModel, cache_size: int):
+        if scenarios < 1:
+            raise ValueError('SIMULATION_SCENARIOS must be positive')
+        with self._lock:
+            self.scenario_count, self.seed, self.model, self.cache_size = scenarios, seed, model, cache_size
+            self._scenarios.clear()
+            self._terms, self._terms_snapshot = None, None
+
+    def scenarios(self, band: int, pre_existing: bool) -> Scenarios:
+        """Simulated years of the bucket, drawn on first use"""
+        bucket = (band, pre_existing)
+        with self._lock:
+            scenarios = self._scenarios.get(bucket)
+            if scenarios is not None:
+                self._scenarios.move_to_end(bucket)
+                return scenarios
+        return self._builds.do(bucket, lambda: self._draw(bucket))
+
+    def _draw(self, bucket: Tuple[int, bool]) -> Scenarios:
+        band, pre_existing = bucket
+        with self._lock:
+            count, seed, model = self.scenario_count, self.seed, self.model
+        # Same stream for the bucket in every worker and every run
+        rng = np.random.default_rng(np.random.SeedSequence([seed, band, int(pre_existing)]))
+        scenarios = Scenarios(model.years(rng, band, pre_existing, count))
+        with self._lock:
+            if (count, seed, model) == (self.scenario_count, self.seed, self.model):
+                self._scenarios[bucket] = scenarios
+                while len(self._scenarios) > self.cache_size:
+                    self._scenarios.popitem(last=False)
+        return scenarios
+
+    def terms(self) -> PlanTerms:
+        snapshot = catalog_cache.get()
+        with self._lock:
+            if self._terms_snapshot is snapshot:
+                return self._terms
+        # One pass over the snapshot's features, like PlanPrices: concurrent builders need not wait
+        terms = PlanTerms(snapshot)
+        with self._lock:
+            self._terms, self._terms_snapshot = terms, snapshot
+        return terms
+
+
+simulations = Simulations()
@@ -0,0 +1,164 @@
+"""
+Catalog Suggestions (typeahead over plan and category names)
+
+A sorted array of search keys with bisect: every name is keyed once per word
+it contains (up to MAX_WORDS), from that word to the end, so "gol" finds
+"Family Floater Gold" and "family f" finds it too. Keys are normalized
+(accents dropped, case folded, punctuation to spaces). A prefix is the key
+range [bisect_left(prefix), bisect_left(prefix + U+FFFF)).
+
+Matches are ranked by popularity (cart items holding the plan, over every
+shard; for a category, those of its plans), then names that start with the
+prefix, then shorter names. One- and two-character prefixes match a large
+part of the catalog, so their top MAX_LIMIT are ranked when the index is
+built; longer ones rank just their (short) range.
+
+The index is built from a catalog snapshot, so it follows catalog writes:
+a new snapshot (after any invalidation) gets a new index on its first
+suggestion. Popularity is read again every CATALOG_SUGGEST_POPULARITY_TTL
+seconds. Memory stays proportional to the catalog: at most MAX_WORDS keys
+per name and MAX_LIMIT entries per precomputed prefix.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask_back_office.cart.dao import CartItemDAO
+from flask_back_office.catalog.cache import catalog_cache
+from flask_back_office.instrumentation import untracked
+from flask_back_office.single_flight import SingleFlight
+
+MAX_WORDS = 6
+MAX_LIMIT = 20
+RANKED_PREFIX_LENGTH = 2
+_SEPARATORS = re.compile(r'[\W_]+')
+_END = '\uffff'
+
+
+def normalize(text: str) -> str:
+    """Lower-case, accent-free words separated by single spaces"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+class SuggestIndex:
+    """Name keys of one catalog snapshot, in sorted order, with the entry each belongs to"""
+
+    def __init__(self, entries: List[Tuple[str, int, str]], weights: List[int]):
+        # Entry: (type, id, name)
+        self.entries = entries
+        self.weights = weights
+        keyed = []
+        for entry, (_, _, name) in enumerate(entries):
+            words = normalize(name).split(' ')
+            for word in range(min(len(words), MAX_WORDS)):
+                keyed.append((' '.join(words[word:]), word == 0, entry))
+        keyed.sort()
+        self.keys = [key for key, _, _ in keyed]
+        self.key_entries = array('i', [entry for _, _, entry in keyed])
+        self.key_starts = array('B', [1 if starts else 0 for _, starts, _ in keyed])
+        self.ranked: Dict[str, List[int]] = {}
+        for length in range(1, RANKED_PREFIX_LENGTH + 1):
+            for prefix in {key[:length] for key in self.keys if len(key) >= length and key[length - 1] != ' '}:
+                self.ranked[prefix] = self._rank(*self._bounds(prefix), MAX_LIMIT)
+
+    @classmethod
+    def build(cls, snapshot, popularity: Dict[int, int]) -> 'SuggestIndex':
+        category_weights: Dict[int, int] = {}
+        entries, weights = [], []
+        for plan_id, category_id, name in snapshot.plan_names():
+            weight = popularity.get(plan_id, 0)
+            category_weights[category_id] = category_weights.get(category_id, 0) + weight
+            entries.append(('plan', plan_id, name))
+            weights.append(weight)
+        for category in snapshot.categories:
+            entries.append(('category', category['id'], category['name']))
+            weights.append(category_weights.get(category['id'], 0))
+        return cls(entries, weights)
+
+    def _bounds(self, prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + _END)
+
+    def _rank(self, start: int, stop: int, limit: int) -> List[int]:
+        # A name matched through several of its words counts once
+        starts: Dict[int, bool] = {}
+        for position in range(start, stop):
+            entry = self.key_entries[position]
+            starts[entry] = starts.get(entry, False) or bool(self.key_starts[position])
+        entries, weights = self.entries, self.weights
+        return heapq.nlargest(limit, starts, key=lambda entry: (
+            weights[entry], starts[entry], -len(entries[entry][2]), entries[entry][2]))
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` (at most MAX_LIMIT) best entries with a word starting with ``prefix``"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        ranked = self.ranked.get(prefix)
+        if ranked is None:
+            ranked = self._rank(*self._bounds(prefix), limit)
+        return [
+            {'type': kind, 'id': entry_id, 'name': name}
+            for kind, entry_id, name in (self.entries[entry] for entry in ranked[:limit])
+        ]
+
+
+class Suggestions:
+    """Process-wide SuggestIndex of the current catalog snapshot"""
+
+    def __init__(self, popularity_ttl: float = 300):
+        self.popularity_ttl = popularity_ttl
+        self._index: Optional[SuggestIndex] = None
+        self._index_snapshot = None
+        self._index_popularity: Optional[Dict[int, int]] = None
+        self._popularity: Optional[Dict[int, int]] = None
+        self._popularity_loaded_at = 0.0
+        self._builds = SingleFlight('suggest')
+        self._lock = threading.Lock()
+
+    def configure(self, popularity_ttl: float):
+        self.popularity_ttl = popularity_ttl
+        with self._lock:
+            self._index, self._index_snapshot, self._index_popularity = None, None, None
+            self._popularity, self._popularity_loaded_at = None, 0.0
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        return self.index().suggest(prefix, limit)
+
+    def index(self) -> SuggestIndex:
+        """Index of the current snapshot and popularity, built on first use"""
+        snapshot, popularity = catalog_cache.get(), self._current_popularity()
+        with self._lock:
+            if self._index_snapshot is snapshot and self._index_popularity is popularity:
+                return self._index
+        return self._builds.do('index', lambda: self._build(snapshot, popularity))
+
+    def _build(self, snapshot, popularity: Dict[int, int]) -> SuggestIndex:
+        index = SuggestIndex.build(snapshot, popularity)
+        with self._lock:
+            self._index, self._index_snapshot, self._index_popularity = index, snapshot, popularity
+        return index
+
+    def _current_popularity(self) -> Dict[int, int]:
+        popularity = self._popularity
+        if popularity is not None and time.time() - self._popularity_loaded_at < self.popularity_ttl:
+            return popularity
+        return self._builds.do('popularity', self._load_popularity)
+
+    def _load_popularity(self) -> Dict[int, int]:
+        loaded_at = time.time()
+        # Refreshed once per TTL for the whole worker, not part of this request's queries
+        with untracked():
+            popularity = CartItemDAO.count_by_plan()
+        with self._lock:
+            self._popularity, self._popularity_loaded_at = popularity, loaded_at
+        return popularity
+
+
+suggestions = Suggestions()
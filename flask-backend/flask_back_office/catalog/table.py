@@ -0,0 +1,207 @@
+"""
+Catalog Table (compact catalog shared by every worker on a node)
+
+The catalog as a struct of arrays in one memory-mapped file: a fixed-width
+array per numeric column and, for text, an index into an interned string
+table (each distinct string stored once), plus the sorted range indexes
+of indexes.py. Workers map the file read-only and read the columns in
+place, so they all share one copy in the page cache instead of each
+holding its own objects; rows become dicts only when a response needs them.
+
+Layout (native byte order, sections 8-byte aligned):
+
+    header      magic, built_at, category/plan/string counts
+    categories  id q, name i, description i, is_active B
+    plans       id q, category_id q, category_row i, name i, description i,
+                features i, eligibility i, coverage_amount d, premium_monthly d,
+                premium_yearly d
+    indexes     per indexed column: sorted values d, their plan rows q
+    strings     offsets I (count + 1), UTF-8 bytes
+
+String columns hold -1 for NULL; ``category_row`` is the plan's row in the
+category columns. Only active plans are stored; every category is, as
+inactive ones can still own active plans. A new version is written to a
+temporary file and renamed over the old one: readers switch atomically,
+and a worker still reading the old mapping keeps it until it lets go.
+"""
+import mmap
+import os
+import struct
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask_back_office.catalog.dao import PlanCategoryDAO, HealthPlanDAO
+from flask_back_office.catalog.indexes import INDEXED_COLUMNS, SortedIndex
+from flask_back_office.catalog.models import PlanCategory, HealthPlan
+
+MAGIC = b'HCCATLG3'
+HEADER = struct.Struct('=8sdIII4x')
+
+CATEGORY_COLUMNS = (('id', 'q'), ('name', 'i'), ('description', 'i'), ('is_active', 'B'))
+PLAN_COLUMNS = (
+    ('id', 'q'), ('category_id', 'q'), ('category_row', 'i'), ('name', 'i'), ('description', 'i'),
+    ('features', 'i'), ('eligibility', 'i'), ('coverage_amount', 'd'), ('premium_monthly', 'd'), ('premium_yearly', 'd'),
+)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on the file ``path`` (created if missing) across processes"""
+    import fcntl
+    with open(path, 'a') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _columns(view: memoryview, offset: int, layout, count: int) -> Tuple[Dict[str, memoryview], int]:
+    columns = {}
+    for name, typecode in layout:
+        size = struct.calcsize(typecode) * count
+        columns[name] = view[offset:offset + size].cast(typecode)
+        offset = _align(offset + size)
+    return columns, offset
+
+
+class _Interner:
+    def __init__(self):
+        self.refs: Dict[str, int] = {}
+        self.strings: List[bytes] = []
+
+    def ref(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        ref = self.refs.get(value)
+        if ref is None:
+            ref = self.refs[value] = len(self.strings)
+            self.strings.append(value.encode('utf-8'))
+        return ref
+
+
+class CatalogTable:
+    """Read-only, zero-copy view of a catalog table file"""
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.built_at, self.category_count, self.plan_count, string_count = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Not a catalog table (or an older format)')
+
+        self.categories, offset = _columns(view, HEADER.size, CATEGORY_COLUMNS, self.category_count)
+        self.plans, offset = _columns(view, offset, PLAN_COLUMNS, self.plan_count)
+        self.indexes = {}
+        for column in INDEXED_COLUMNS:
+            index, offset = _columns(view, offset, (('values', 'd'), ('rows', 'q')), self.plan_count)
+            self.indexes[column] = SortedIndex(index['values'], index['rows'])
+        size = 4 * (string_count + 1)
+        self._string_offsets = view[offset:offset + size].cast('I')
+        offset = _align(offset + size)
+        self._strings = view[offset:offset + self._string_offsets[string_count]]
+
+    @classmethod
+    def open(cls, path: str) -> 'CatalogTable':
+        with open(path, 'rb') as fh:
+            return cls(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @staticmethod
+    def write(path: str, categories: Iterable[PlanCategory], plans: Iterable[HealthPlan], built_at: float):
+        """Write a table and atomically replace ``path`` with it"""
+        categories, plans = list(categories), list(plans)
+        interner = _Interner()
+        category_rows = {category.id: row for row, category in enumerate(categories)}
+        sections = [
+            array('q', [category.id for category in categories]),
+            array('i', [interner.ref(category.name) for category in categories]),
+            array('i', [interner.ref(category.description) for category in categories]),
+            array('B', [1 if category.is_active else 0 for category in categories]),
+            array('q', [plan.id for plan in plans]),
+            array('q', [plan.category_id for plan in plans]),
+            array('i', [category_rows.get(plan.category_id, -1) for plan in plans]),
+            array('i', [interner.ref(plan.name) for plan in plans]),
+            array('i', [interner.ref(plan.description) for plan in plans]),
+            array('i', [interner.ref(plan.features) for plan in plans]),
+            array('i', [interner.ref(plan.eligibility) for plan in plans]),
+            array('d', [plan.coverage_amount for plan in plans]),
+            array('d', [plan.premium_monthly for plan in plans]),
+            array('d', [plan.premium_yearly for plan in plans]),
+        ]
+        for column in INDEXED_COLUMNS:
+            index = SortedIndex.build([getattr(plan, column) for plan in plans], range(len(plans)))
+            sections.extend((index.values, index.refs))
+        offsets = array('I', [0])
+        for value in interner.strings:
+            offsets.append(offsets[-1] + len(value))
+        sections.append(offsets)
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, built_at, len(categories), len(plans), len(interner.strings)))
+            for section in sections:
+                fh.write(section.tobytes())
+                fh.write(b'\0' * (_align(fh.tell()) - fh.tell()))
+            fh.write(b''.join(interner.strings))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    def string(self, ref: int) -> Optional[str]:
+        if ref < 0:
+            return None
+        return str(self._strings[self._string_offsets[ref]:self._string_offsets[ref + 1]], 'utf-8')
+
+    def category_dict(self, row: int) -> Dict[str, Any]:
+        """Same shape as PlanCategory.to_dict"""
+        columns = self.categories
+        return {
+            'id': columns['id'][row],
+            'name': self.string(columns['name'][row]),
+            'description': self.string(columns['description'][row]),
+            'is_active': bool(columns['is_active'][row])
+        }
+
+    def plan_dict(self, row: int) -> Dict[str, Any]:
+        """Same shape as HealthPlan.to_dict"""
+        columns = self.plans
+        category_row = columns['category_row'][row]
+        return {
+            'id': columns['id'][row],
+            'category_id': columns['category_id'][row],
+            'category': self.category_dict(category_row) if category_row >= 0 else None,
+            'name': self.string(columns['name'][row]),
+            'description': self.string(columns['description'][row]),
+            'coverage_amount': columns['coverage_amount'][row],
+            'premium_monthly': columns['premium_monthly'][row],
+            'premium_yearly': columns['premium_yearly'][row],
+            'features': self.string(columns['features'][row]),
+            'eligibility': self.string(columns['eligibility'][row]),
+            'is_active': True
+        }
+
+
+def load(path: str, newer_than: float) -> CatalogTable:
+    """Map the table at ``path``, first rebuilding it unless it was built after ``newer_than``
+
+    One process per node rebuilds at a time; the others wait and map its file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with file_lock(f'{path}.lock'):
+        try:
+            table = CatalogTable.open(path)
+            if table.built_at > newer_than:
+                return table
+        except (FileNotFoundError, ValueError, struct.error):
+            pass
+
+        # Whatever commits before the reads start is in the table
+        started = time.time()
+        CatalogTable.write(path, PlanCategoryDAO.get_all(active_only=False),
+                           HealthPlanDAO.get_all(active_only=True), built_at=started)
+        return CatalogTable.open(path)
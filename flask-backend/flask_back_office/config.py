@@ -2,9 +2,16 @@
 Flask Application Configuration
 """
 import os
+import tempfile
 from datetime import timedelta
 
 
+def _url_binds(variable, prefix, start=0):
+    """One SQLAlchemy bind per URL in a comma-separated environment variable"""
+    urls = [url.strip() for url in os.environ.get(variable, '').split(',') if url.strip()]
+    return {f'{prefix}{index}': url for index, url in enumerate(urls, start)}
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -17,20 +24,127 @@ class Config:
     # Database - SQLite by default
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///healthcare_plans.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Read replicas (safe-method reads go to a replica, see db_routing.py) and
+    # cart shards 1..N (shard 0 is the primary, see cart/sharding.py)
+    SQLALCHEMY_BINDS = {
+        **_url_binds('DATABASE_REPLICA_URLS', 'replica_'),
+        **_url_binds('CART_SHARD_URLS', 'cart_shard_', start=1),
+    }
+    # Set from adding a shard until `flask cart-shards rebalance` has run: carts missing on
+    # the newest shard are then also looked for where they were before it was added
+    CART_SHARD_REBALANCE_PENDING = os.environ.get('CART_SHARD_REBALANCE_PENDING', 'False').lower() == 'true'
+    DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 15))
+    DATABASE_REPLICA_PIN_COOKIE = os.environ.get('DATABASE_REPLICA_PIN_COOKIE', 'db_pin_primary')
+    
+    # SQLite high-concurrency mode - WAL and one queued writer, see sqlite_mode.py
+    SQLITE_HIGH_CONCURRENCY = os.environ.get('SQLITE_HIGH_CONCURRENCY', 'False').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
+    # Catalog cache - seconds before the in-process snapshot is reloaded (0 = never); only with
+    # INVALIDATION_TRANSPORT=memory, otherwise a snapshot is kept until it is invalidated
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+    # memory (dicts per worker) or shared (one memory-mapped table per node, see catalog/table.py)
+    CATALOG_STORAGE = os.environ.get('CATALOG_STORAGE', 'memory')
+    CATALOG_SHARED_DIR = os.environ.get(
+        'CATALOG_SHARED_DIR', os.path.join(tempfile.gettempdir(), 'healthcare-catalog'))
+    # Typeahead suggestions - seconds before plan popularity (cart items per plan) is counted again
+    CATALOG_SUGGEST_POPULARITY_TTL = int(os.environ.get('CATALOG_SUGGEST_POPULARITY_TTL', 300))
+    # Out-of-pocket simulation - simulated years per profile bucket, their seed, claim sizes (lognormal or gamma)
+    SIMULATION_SCENARIOS = int(os.environ.get('SIMULATION_SCENARIOS', 100000))
+    SIMULATION_SEED = int(os.environ.get('SIMULATION_SEED', 20240601))
+    SIMULATION_SEVERITY = os.environ.get('SIMULATION_SEVERITY', 'lognormal')
+    SIMULATION_SEVERITY_MEAN = float(os.environ.get('SIMULATION_SEVERITY_MEAN', 60000))
+    SIMULATION_SEVERITY_CV = float(os.environ.get('SIMULATION_SEVERITY_CV', 1.5))
+    SIMULATION_CACHE_SIZE = int(os.environ.get('SIMULATION_CACHE_SIZE', 20))
+    
+    # Cache invalidation across workers - memory (this process), table (polled) or notify (PostgreSQL)
+    INVALIDATION_TRANSPORT = os.environ.get('INVALIDATION_TRANSPORT', 'memory')
+    INVALIDATION_POLL_INTERVAL = float(os.environ.get('INVALIDATION_POLL_INTERVAL', 1))
+    INVALIDATION_MAX_LAG = float(os.environ.get('INVALIDATION_MAX_LAG', 5))
+    
+    # SQL instrumentation - per-request query counts, N+1 detection, budgets
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', 'True').lower() == 'true'
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    SQL_QUERY_BUDGET_STRICT = False
+    SQL_TIMING_HEADER = False
+    
+    # Audit/access log - events queued by requests, written in batches to a JSON-lines file or the audit_events table
+    AUDIT_LOG = os.environ.get('AUDIT_LOG', 'True').lower() == 'true'
+    AUDIT_ACCESS_LOG = os.environ.get('AUDIT_ACCESS_LOG', 'True').lower() == 'true'
+    AUDIT_LOG_SINK = os.environ.get('AUDIT_LOG_SINK', 'file')
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_ENQUEUE_TIMEOUT_MS = float(os.environ.get('AUDIT_ENQUEUE_TIMEOUT_MS', 50))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 0.5))
+    AUDIT_LOG_FILE = os.environ.get('AUDIT_LOG_FILE', 'logs/audit.log')
+    AUDIT_LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', 50 * 1024 * 1024))
+    AUDIT_LOG_BACKUP_COUNT = int(os.environ.get('AUDIT_LOG_BACKUP_COUNT', 10))
+    
+    # Slow query log - JSON lines with EXPLAIN output, written off the request path
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'True').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+    SLOW_QUERY_EXPLAIN_INTERVAL = float(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', 60))
+    SLOW_QUERY_QUEUE_SIZE = int(os.environ.get('SLOW_QUERY_QUEUE_SIZE', 1000))
+    SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE', 'logs/slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUP_COUNT = int(os.environ.get('SLOW_QUERY_LOG_BACKUP_COUNT', 5))
+    
+    # Prometheus metrics on /metrics (multiprocess mode when a directory is set)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+    
+    # Per-request profiling - signed X-Profile header and/or random sampling
+    PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_MODE = os.environ.get('PROFILING_MODE', 'cprofile')
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', 5))
+    PROFILING_OUTPUT_DIR = os.environ.get('PROFILING_OUTPUT_DIR', 'logs/profiles')
+    
+    # Admission control - per worker <class>=<concurrency>:<max queued>:<queue timeout s>, see admission.py;
+    # on by default in production only, the limits are sized for gunicorn workers
+    ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'False').lower() == 'true'
+    ADMISSION_CLASSES = os.environ.get('ADMISSION_CLASSES', 'expensive=2:1:0.25,default=3:1:0.5')
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+    
+    # Idempotency-Key on mutating requests - memory (per worker) or sql (shared) store
+    IDEMPOTENCY_ENABLED = os.environ.get('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+    IDEMPOTENCY_STORE = os.environ.get('IDEMPOTENCY_STORE', 'memory')
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
 
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    SQL_TIMING_HEADER = True
+
+
+class TestingConfig(Config):
+    """Testing configuration"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    SQL_QUERY_BUDGET_STRICT = True
+    SLOW_QUERY_LOG = False
 
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    INVALIDATION_TRANSPORT = os.environ.get('INVALIDATION_TRANSPORT', 'table')
+    ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'True').lower() == 'true'
 
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Read-Replica Routing
+
+With DATABASE_REPLICA_URLS set, every replica becomes an SQLAlchemy bind
+(``replica_0``, ``replica_1``, ...) and the session sends plain SELECTs made
+while serving GET/HEAD/OPTIONS requests to one replica chosen per request.
+Everything else goes to the primary:
+
+- INSERT/UPDATE/DELETE and flushes
+- every statement of a request that has already written (read-your-writes)
+- every statement of POST/PUT/PATCH/DELETE requests, so a read-then-write
+  never acts on a stale row
+- the rest of a request after ``use_primary()`` (read-then-write DAO paths
+  reached from GET, like the cart's get-or-create)
+- CLI commands and other work outside a request
+
+A request that wrote sets a short-lived cookie that keeps the same client
+on the primary for DATABASE_REPLICA_PIN_SECONDS, long enough for the
+replicas to catch up. Being a cookie, the pin holds whichever worker serves
+the next request.
+
+The pin only reaches clients that send cookies back. The Angular app is a
+cross-origin client authenticating with a bearer token and CORS is not set
+up with credentials, so it never returns the cookie: its reads go to a
+replica from the request after a write, and may miss that write for as
+long as the replica lags. Views that must show a client's own write right
+away should call ``use_primary()`` (or return the written data, as the
+write endpoints do).
+
+Try it locally with two SQLite files (the copy plays a lagging replica):
+
+    cp instance/healthcare_plans.db instance/replica.db
+    DATABASE_REPLICA_URLS=sqlite:///replica.db flask --app wsgi run
+"""
+import random
+from typing import List
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_bind_keys(binds) -> List[str]:
+    return sorted(key for key in binds if key and key.startswith(REPLICA_BIND_PREFIX))
+
+
+class RoutingSession(Session):
+    """Session that reads from a replica unless the current request needs the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or (clause is not None and not getattr(clause, 'is_select', False)):
+                g.db_wrote = True
+            elif g.get('db_replica') and not g.get('db_wrote'):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_primary():
+    """Send the rest of this request to the primary, for reads that decide a write"""
+    if has_request_context():
+        g.db_replica = None
+
+
+def _choose_database():
+    g.db_wrote = False
+    g.db_replica = None
+    pinned = request.cookies.get(current_app.config['DATABASE_REPLICA_PIN_COOKIE'])
+    if request.method in SAFE_METHODS and not pinned:
+        g.db_replica = random.choice(current_app.extensions['db_routing'])
+
+
+def _pin_to_primary(response):
+    if g.get('db_wrote'):
+        response.set_cookie(
+            current_app.config['DATABASE_REPLICA_PIN_COOKIE'], '1',
+            max_age=current_app.config['DATABASE_REPLICA_PIN_SECONDS'],
+            httponly=True, samesite='Lax',
+        )
+    return response
+
+
+def init_app(app):
+    """Route reads to the configured replicas, if there are any"""
+    replicas = replica_bind_keys(app.config.get('SQLALCHEMY_BINDS') or {})
+    if not replicas:
+        return
+
+    app.extensions['db_routing'] = replicas
+    app.before_request(_choose_database)
+    app.after_request(_pin_to_primary)
@@ -0,0 +1,271 @@
+"""
+Idempotency Keys for Mutating Requests
+
+A POST/PUT/PATCH/DELETE carrying an ``Idempotency-Key`` header runs once;
+retries with the same key get the stored response back, marked
+``Idempotent-Replayed: true``. Keys are scoped to the caller (Authorization
+header), method and path. Reusing a key for a different request body is
+rejected with 422.
+
+A retry arriving while the first request is still running waits for it
+(up to IDEMPOTENCY_WAIT_SECONDS, then 409 with Retry-After) instead of
+running the work a second time. 5xx and auth/rate-limit responses are not
+stored, so those retries run again.
+
+IDEMPOTENCY_STORE picks where responses live for IDEMPOTENCY_TTL seconds:
+
+- ``memory``: per process, at most IDEMPOTENCY_MAX_ENTRIES responses
+- ``sql``: the ``idempotency_keys`` table, shared by every worker; a key
+  whose worker died is taken over after IDEMPOTENCY_LOCK_SECONDS
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from flask import Response, current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from flask_back_office.extensions import db
+from flask_back_office.instrumentation import untracked
+from flask_back_office.metrics import IDEMPOTENCY_REQUESTS
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+MAX_KEY_LENGTH = 255
+# Responses a retry should not get back: the client can fix these and retry
+RETRYABLE_STATUSES = (401, 403, 408, 429)
+UNSTORED_HEADERS = ('Set-Cookie', 'Content-Length')
+
+STARTED, DONE, IN_FLIGHT, MISMATCH = 'started', 'done', 'in_flight', 'mismatch'
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: list
+    body: bytes
+
+
+class IdempotencyKey(db.Model):
+    """Response stored for an idempotency key (SQL store)"""
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(64), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # NULL while the first request is in flight
+    status = db.Column(db.Integer)
+    headers = db.Column(db.Text)
+    body = db.Column(db.LargeBinary)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class MemoryStore:
+    """Per-process store: in-flight keys plus the latest completed responses"""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (expires, fingerprint, response); insertion order is expiry order
+        self._done: 'OrderedDict[str, Tuple[float, str, StoredResponse]]' = OrderedDict()
+        self._pending: Dict[str, Tuple[str, threading.Event]] = {}
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._done.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._done[key]
+                entry = None
+            if entry is not None:
+                return (DONE if entry[1] == fingerprint else MISMATCH), entry[2]
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                return (IN_FLIGHT if pending[0] == fingerprint else MISMATCH), None
+            self._pending[key] = (fingerprint, threading.Event())
+            return STARTED, None
+
+    def wait(self, key: str, timeout: float):
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            pending[1].wait(timeout)
+
+    def complete(self, key: str, response: StoredResponse):
+        now = time.monotonic()
+        with self._lock:
+            fingerprint, finished = self._pending.pop(key)
+            self._done[key] = (now + self.ttl, fingerprint, response)
+            while self._done and (len(self._done) > self.max_entries or next(iter(self._done.values()))[0] <= now):
+                self._done.popitem(last=False)
+        finished.set()
+
+    def release(self, key: str):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending[1].set()
+
+
+class SQLStore:
+    """Store shared by every worker through the idempotency_keys table"""
+    poll_interval = 0.05
+    # Expired rows are deleted on every Nth completed request
+    purge_every = 100
+
+    def __init__(self, ttl: int, lock_seconds: int):
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self._completed = 0
+        self.table = IdempotencyKey.__table__
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        table = self.table
+        with untracked():
+            # Twice at most: a second try follows deleting an expired row
+            for _ in range(2):
+                now = datetime.utcnow()
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(table.insert().values(
+                            key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=self.lock_seconds)
+                        ))
+                    return STARTED, None
+                except IntegrityError:
+                    pass
+
+                with db.engine.begin() as conn:
+                    row = conn.execute(table.select().where(table.c.key == key)).first()
+                    if row is not None and row.expires_at <= now:
+                        # Expired response, or the worker running it died
+                        conn.execute(table.delete().where(table.c.key == key, table.c.expires_at <= now))
+                        row = None
+                if row is None:
+                    continue
+                if row.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if row.status is None:
+                    return IN_FLIGHT, None
+                return DONE, StoredResponse(row.status, json.loads(row.headers), row.body)
+        return IN_FLIGHT, None
+
+    def wait(self, key: str, timeout: float):
+        time.sleep(min(self.poll_interval, timeout))
+
+    def complete(self, key: str, response: StoredResponse):
+        table = self.table
+        now = datetime.utcnow()
+        with untracked(), db.engine.begin() as conn:
+            conn.execute(table.update().where(table.c.key == key).values(
+                status=response.status, headers=json.dumps(response.headers), body=response.body,
+                expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            self._completed += 1
+            if self._completed % self.purge_every == 0:
+                conn.execute(table.delete().where(table.c.expires_at <= now))
+
+    def release(self, key: str):
+        table = self.table
+        with untracked(), db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.key == key, table.c.status.is_(None)))
+
+
+def _scoped_key(key: str) -> str:
+    caller = request.headers.get('Authorization', '')
+    return hashlib.sha256(f'{caller}\n{request.method}\n{request.path}\n{key}'.encode()).hexdigest()
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256(request.query_string)
+    digest.update(b'\n')
+    # Cached, so the view still reads the body
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(stored: StoredResponse) -> Response:
+    response = Response(stored.body, status=stored.status, headers=stored.headers)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _start_request():
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key or request.method not in MUTATING_METHODS:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+    store = current_app.extensions['idempotency']
+    scoped, fingerprint = _scoped_key(key), _fingerprint()
+    wait_seconds = current_app.config['IDEMPOTENCY_WAIT_SECONDS']
+    deadline = time.monotonic() + wait_seconds
+    waited = False
+    while True:
+        state, stored = store.begin(scoped, fingerprint)
+        if state == STARTED:
+            IDEMPOTENCY_REQUESTS.inc('executed')
+            g.idempotency_key = scoped
+            return None
+        if state == DONE:
+            IDEMPOTENCY_REQUESTS.inc('coalesced' if waited else 'replayed')
+            return _replay(stored)
+        if state == MISMATCH:
+            IDEMPOTENCY_REQUESTS.inc('mismatch')
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            IDEMPOTENCY_REQUESTS.inc('conflict')
+            response = jsonify({'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'})
+            response.headers['Retry-After'] = str(max(1, int(wait_seconds)))
+            return response, 409
+        waited = True
+        store.wait(scoped, remaining)
+
+
+def _finish_request(response):
+    scoped = g.pop('idempotency_key', None)
+    if scoped is None:
+        return response
+
+    store = current_app.extensions['idempotency']
+    status = response.status_code
+    if status >= 500 or status in RETRYABLE_STATUSES or response.is_streamed:
+        store.release(scoped)
+        return response
+
+    headers = [(name, value) for name, value in response.headers.items() if name not in UNSTORED_HEADERS]
+    store.complete(scoped, StoredResponse(status, headers, response.get_data()))
+    return response
+
+
+def _end_request(exc=None):
+    # after_request is skipped for unhandled errors; let waiting retries run
+    scoped = g.pop('idempotency_key', None)
+    if scoped is not None:
+        current_app.extensions['idempotency'].release(scoped)
+
+
+def init_app(app):
+    """Honour Idempotency-Key headers on every mutating endpoint"""
+    if not app.config['IDEMPOTENCY_ENABLED']:
+        return
+
+    kind = app.config['IDEMPOTENCY_STORE']
+    if kind == 'memory':
+        store = MemoryStore(app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_MAX_ENTRIES'])
+    elif kind == 'sql':
+        store = SQLStore(app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_LOCK_SECONDS'])
+    else:
+        raise ValueError(f'Unknown IDEMPOTENCY_STORE {kind!r}')
+    app.extensions['idempotency'] = store
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
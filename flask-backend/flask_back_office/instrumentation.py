@@ -0,0 +1,185 @@
+"""
+SQL Query Instrumentation
+
+Counts and times every statement executed while handling a request (through
+the SQLAlchemy ``before_cursor_execute``/``after_cursor_execute`` events),
+flags statement shapes that repeat within one request (N+1 patterns) and
+enforces the query budget an endpoint declares with ``@query_budget``.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from flask import current_app, g, request
+from sqlalchemy import event
+from flask_back_office.extensions import db
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|:\w+|%\(\w+\)s)"
+_IN_LIST = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")*\s*\)")
+_WHITESPACE = re.compile(r'\s+')
+
+# Every QueryStats currently collecting in this context (requests, tests, ...)
+_active: ContextVar[Tuple['QueryStats', ...]] = ContextVar('query_stats', default=())
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in values compare equal"""
+    shape = _LITERALS.sub('?', statement)
+    shape = _IN_LIST.sub('(...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint or block runs more queries than it declared"""
+
+
+class QueryStats:
+    """Queries executed within one request or tracked block"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed at least ``threshold`` times (likely N+1)"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f} ms']
+        for shape, n in self.shapes.most_common(limit):
+            lines.append(f'  {n:>4}x {shape}')
+        return '\n'.join(lines)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Innermost QueryStats collecting in this context, if any"""
+    active = _active.get()
+    return active[-1] if active else None
+
+
+@contextmanager
+def track_queries():
+    """Collect every query executed inside the block"""
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def untracked():
+    """Leave the block's queries out of every collecting QueryStats (bookkeeping queries)"""
+    token = _active.set(())
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Test helper: fail when the block executes more than ``max_queries``
+
+        with assert_max_queries(3):
+            client.get('/api/v1/cart/', headers=auth)
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(f'Query budget of {max_queries} exceeded: {stats.report()}')
+
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of queries an endpoint may execute"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # By cursor, so a statement that failed cannot pair a later one with its start time
+    conn.info.setdefault('query_start_time', {})[cursor] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start_time'].pop(cursor)
+    duration = time.perf_counter() - start
+    for stats in _active.get():
+        stats.record(statement, duration)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute never runs for a failed statement
+    connection, execution = exception_context.connection, exception_context.execution_context
+    if connection is not None and execution is not None:
+        connection.info.get('query_start_time', {}).pop(execution.cursor, None)
+
+
+def _start_request():
+    stats = QueryStats()
+    g._query_stats = stats
+    g._query_stats_token = _active.set(_active.get() + (stats,))
+
+
+def _finish_request(response):
+    stats = g.get('_query_stats')
+    if stats is None:
+        return response
+
+    route = f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+
+    for shape, n in stats.repeated(current_app.config['SQL_N_PLUS_ONE_THRESHOLD']):
+        logger.warning('Possible N+1 on %s: %d executions of %s', route, n, shape)
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats.count > budget:
+        message = f'{route} exceeded its query budget of {budget}: {stats.report()}'
+        if current_app.config['SQL_QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    if current_app.config['SQL_TIMING_HEADER']:
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+        )
+    return response
+
+
+def _end_request(exc=None):
+    token = g.pop('_query_stats_token', None)
+    if token is not None:
+        _active.reset(token)
+
+
+def init_app(app):
+    """Hook query events on the app's engine and per-request accounting"""
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    # The primary and any read replicas
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
@@ -0,0 +1,427 @@
+"""
+Cache Invalidation Bus
+
+In-process caches live in every gunicorn worker of every instance, so a
+write in one of them has to reach all the others. DAOs announce writes:
+
+    invalidation.publish('catalog')               # everything cached for the topic
+    invalidation.publish('catalog', key=plan.id)  # only what depends on that key
+
+The topic is sent once the session commits (never for a rollback): to the
+subscribers of this process right away, and to the other processes through
+INVALIDATION_TRANSPORT:
+
+- ``memory``: this process only, or the buses attached to one MemoryHub (tests)
+- ``table``: a version per topic in the ``cache_versions`` table, polled
+  every INVALIDATION_POLL_INTERVAL seconds; works on any database
+- ``notify``: PostgreSQL LISTEN/NOTIFY, delivered as the write commits
+
+Caches subscribe with ``invalidation_bus.subscribe(topic, callback)``;
+``callback(keys)`` gets the changed keys, or None when anything may have
+changed (no key given, more than MAX_KEYS of them, or messages missed), so
+a cache can apply small changes instead of dropping everything.
+
+The delay from commit to invalidation in another process is exported as
+cache_invalidation_lag_seconds and bounded by INVALIDATION_MAX_LAG: once a
+worker has not heard from the transport for that long (database down,
+listener reconnecting) ``healthy()`` turns False and caches stop serving
+entries older than the bound. NOTIFY drops messages sent while the listener
+is disconnected, so every topic is invalidated when it reconnects.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Hashable, List, Mapping, NamedTuple, Optional, Set
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from flask_back_office.extensions import db
+from flask_back_office.instrumentation import untracked
+from flask_back_office.metrics import INVALIDATION_LAG, registry
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'invalidation_topics'
+# Larger changes are sent as "everything changed"
+MAX_KEYS = 100
+_HOSTNAME = socket.gethostname()
+
+
+class Message(NamedTuple):
+    topic: str
+    # Publishing process; None when unknown (always applied)
+    origin: Optional[str]
+    published_at: float
+    # Changed keys of the topic; None for everything
+    keys: Optional[List[Hashable]] = None
+
+
+Callback = Callable[[Optional[FrozenSet[Hashable]]], None]
+
+
+class CacheVersion(db.Model):
+    """Invalidation counter per topic (table transport)"""
+    __tablename__ = 'cache_versions'
+
+    topic = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    origin = db.Column(db.String(128))
+    published_at = db.Column(db.Float, nullable=False)
+    # JSON list of the keys of the latest version; NULL for everything
+    changed_keys = db.Column(db.Text)
+
+
+class MemoryHub:
+    """Connects MemoryTransports as if they were separate processes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inboxes: List[queue.Queue] = []
+
+    def attach(self) -> queue.Queue:
+        inbox = queue.Queue()
+        with self._lock:
+            self._inboxes.append(inbox)
+        return inbox
+
+    def send(self, message: Message):
+        with self._lock:
+            inboxes = list(self._inboxes)
+        for inbox in inboxes:
+            inbox.put(message)
+
+
+class MemoryTransport:
+    """In-memory transport: this process only, unless a hub is shared"""
+    durable = True
+    cross_process = False
+
+    def __init__(self, hub: Optional[MemoryHub] = None):
+        self.hub = hub or MemoryHub()
+        self._inbox = self.hub.attach()
+
+    def send(self, messages: List[Message]):
+        for message in messages:
+            self.hub.send(message)
+
+    def receive(self, timeout: float) -> List[Message]:
+        try:
+            messages = [self._inbox.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                messages.append(self._inbox.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class VersionTableTransport:
+    """Polls a version counter per topic in the cache_versions table"""
+    durable = True
+    cross_process = True
+
+    def __init__(self, poll_interval: float, since: float):
+        self.poll_interval = poll_interval
+        # Wall time: topics published later are news to the first poll
+        self.since = since
+        self.table = CacheVersion.__table__
+        self._seen: Optional[Dict[str, int]] = None
+        self._closed = threading.Event()
+
+    def send(self, messages: List[Message]):
+        table = self.table
+        with untracked():
+            for message in messages:
+                values = dict(origin=message.origin, published_at=message.published_at,
+                              changed_keys=None if message.keys is None else json.dumps(message.keys))
+                # Twice at most: a second try follows losing the race to insert the topic
+                for _ in range(2):
+                    try:
+                        with db.engine.begin() as conn:
+                            bumped = conn.execute(table.update().where(table.c.topic == message.topic).values(
+                                version=table.c.version + 1, **values
+                            )).rowcount
+                            if not bumped:
+                                conn.execute(table.insert().values(topic=message.topic, version=1, **values))
+                        break
+                    except IntegrityError:
+                        continue
+
+    def receive(self, timeout: float) -> List[Message]:
+        if self._seen is not None:
+            self._closed.wait(timeout)
+        with untracked(), db.engine.connect() as conn:
+            rows = conn.execute(self.table.select()).all()
+
+        messages = []
+        for row in rows:
+            if self._seen is None:
+                if row.published_at >= self.since:
+                    messages.append(Message(row.topic, None, row.published_at))
+                continue
+            last = self._seen.get(row.topic, 0)
+            if row.version == last + 1:
+                keys = None if row.changed_keys is None else json.loads(row.changed_keys)
+                messages.append(Message(row.topic, row.origin, row.published_at, keys))
+            elif row.version > last:
+                # Several versions since the last poll: only the latest one's publisher and keys are known
+                messages.append(Message(row.topic, None, row.published_at))
+        self._seen = {row.topic: row.version for row in rows}
+        return messages
+
+    def reset(self):
+        pass
+
+    def close(self):
+        self._closed.set()
+
+
+class NotifyTransport:
+    """PostgreSQL LISTEN/NOTIFY on a dedicated connection"""
+    durable = False
+    cross_process = True
+    channel = 'cache_invalidation'
+
+    def __init__(self):
+        self._conn = None
+
+    def send(self, messages: List[Message]):
+        with untracked(), db.engine.begin() as conn:
+            for message in messages:
+                conn.execute(db.text('SELECT pg_notify(:channel, :payload)'),
+                             {'channel': self.channel, 'payload': json.dumps(message._asdict())})
+
+    def receive(self, timeout: float) -> List[Message]:
+        if self._conn is None:
+            self._connect()
+        conn = self._conn
+        if select.select([conn], [], [], timeout) == ([], [], []):
+            # Nothing arrived: make sure the connection is still alive
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        conn.poll()
+
+        messages = []
+        while conn.notifies:
+            payload = json.loads(conn.notifies.pop(0).payload)
+            messages.append(Message(payload['topic'], payload['origin'], payload['published_at'], payload['keys']))
+        return messages
+
+    def _connect(self):
+        # Taken out of the pool for good: it stays in LISTEN mode
+        raw = db.engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+        self._conn = conn
+
+    def reset(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close(self):
+        self.reset()
+
+
+class InvalidationBus:
+    """Delivers invalidated topics to the subscribed caches of every process"""
+
+    def __init__(self, origin: Optional[str] = None):
+        # Tells this process's own messages apart; defaults to host:pid
+        self._origin = origin
+        self.transport = None
+        self.poll_interval = 1.0
+        self.max_lag = 5.0
+        self._subscribers: Dict[str, List[Callback]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Process running the subscriber thread (threads do not survive fork)
+        self._pid: Optional[int] = None
+        self._synced_at = time.monotonic()
+
+    @property
+    def origin(self) -> str:
+        return self._origin or f'{_HOSTNAME}:{os.getpid()}'
+
+    def configure(self, transport, poll_interval: float, max_lag: float):
+        self.stop()
+        self.transport = transport
+        self.poll_interval = poll_interval
+        self.max_lag = max_lag
+
+    def subscribe(self, topic: str, callback: Callback):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, changes: Mapping[str, Optional[Set[Hashable]]]):
+        """Invalidate topics ({topic: keys or None}) in this process now, and in the others through the transport"""
+        now, origin = time.time(), self.origin
+        messages = [
+            Message(topic, origin, now, None if keys is None or len(keys) > MAX_KEYS else sorted(keys))
+            for topic, keys in sorted(changes.items())
+        ]
+        for message in messages:
+            self._dispatch(message.topic, message.keys)
+        if self.transport is None or not messages:
+            return
+        try:
+            self.transport.send(messages)
+        except Exception:
+            logger.exception('Could not publish cache invalidation of %s', ', '.join(m.topic for m in messages))
+
+    @property
+    def cross_process(self) -> bool:
+        """Whether writes in other processes reach this one (not with the memory transport)"""
+        return getattr(self.transport, 'cross_process', False)
+
+    def healthy(self) -> bool:
+        """False once this process has not heard from the transport for max_lag seconds"""
+        if self._pid != os.getpid():
+            return True
+        return time.monotonic() - self._synced_at <= self.max_lag
+
+    def sync_age(self) -> float:
+        return time.monotonic() - self._synced_at if self._pid == os.getpid() else 0.0
+
+    def start(self, app):
+        """Run the subscriber thread of this process, once"""
+        if self.transport is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._synced_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='cache-invalidation', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        self._pid = None
+        self._stop.set()
+        if self.transport is not None:
+            self.transport.close()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.poll_interval + 1)
+
+    def _run(self, app):
+        transport, failing, resync = self.transport, False, False
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    messages = transport.receive(self.poll_interval)
+                except Exception:
+                    if not failing:
+                        logger.exception('Cache invalidation transport failed, retrying')
+                    failing, resync = True, resync or not transport.durable
+                    transport.reset()
+                    self._stop.wait(self.poll_interval)
+                    continue
+
+                if failing:
+                    logger.info('Cache invalidation transport recovered')
+                    failing = False
+                if resync:
+                    # Messages may have been lost while disconnected
+                    resync = False
+                    for topic in list(self._subscribers):
+                        self._dispatch(topic, None)
+
+                now, origin = time.time(), self.origin
+                for message in messages:
+                    if message.origin == origin:
+                        continue
+                    INVALIDATION_LAG.observe(max(0.0, now - message.published_at), message.topic)
+                    self._dispatch(message.topic, message.keys)
+                self._synced_at = time.monotonic()
+
+    def _dispatch(self, topic: str, keys: Optional[List[Hashable]]):
+        keys = None if keys is None else frozenset(keys)
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(keys)
+            except Exception:
+                logger.exception('Cache invalidation callback for %s failed', topic)
+
+
+invalidation_bus = InvalidationBus()
+
+
+def publish(topic: str, key: Hashable = None):
+    """Invalidate ``topic``, or only its ``key``, in every process once the current session commits"""
+    pending = db.session.info.setdefault(PENDING_KEY, {})
+    keys = pending.get(topic, set())
+    if key is None or keys is None:
+        pending[topic] = None
+    else:
+        keys.add(key)
+        pending[topic] = keys
+
+
+@event.listens_for(Session, 'after_commit')
+def _committed(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        invalidation_bus.publish(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+registry.gauge_callback('cache_invalidation_sync_age_seconds',
+                        'Seconds since this worker last heard from the invalidation transport',
+                        [], lambda: {(): invalidation_bus.sync_age()})
+
+
+def _start_subscriber():
+    invalidation_bus.start(current_app._get_current_object())
+
+
+def init_app(app):
+    """Deliver DAO invalidations to the other workers through INVALIDATION_TRANSPORT"""
+    kind = app.config['INVALIDATION_TRANSPORT']
+    poll_interval = app.config['INVALIDATION_POLL_INTERVAL']
+    max_lag = app.config['INVALIDATION_MAX_LAG']
+    if max_lag <= poll_interval:
+        raise ValueError('INVALIDATION_MAX_LAG must be longer than INVALIDATION_POLL_INTERVAL')
+
+    if kind == 'memory':
+        transport = MemoryTransport()
+    elif kind == 'table':
+        transport = VersionTableTransport(poll_interval, since=time.time())
+    elif kind == 'notify':
+        with app.app_context():
+            if db.engine.dialect.name != 'postgresql':
+                raise ValueError('INVALIDATION_TRANSPORT=notify needs PostgreSQL')
+        transport = NotifyTransport()
+    else:
+        raise ValueError(f'Unknown INVALIDATION_TRANSPORT {kind!r}')
+    invalidation_bus.configure(transport, poll_interval, max_lag)
+
+    # Started by the first request, so gunicorn forks no running threads
+    app.before_request(_start_subscriber)
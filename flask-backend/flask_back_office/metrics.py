@@ -0,0 +1,376 @@
+"""
+Prometheus Metrics
+
+Counters, gauges and histograms are written to per-thread shards, so
+recording never takes a lock; shards are summed only when ``/metrics`` is
+scraped. With METRICS_MULTIPROC_DIR set (gunicorn.conf.py does this), every
+worker process also flushes its totals to a JSON file in that directory. A
+scrape served by any worker flushes its own file first and then sums the
+files, so every worker answers from the same data. Gauges read at scrape
+time (``gauge_callback``) are per process and carry a ``pid`` label.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from flask import Response, current_app, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float('inf'))
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """One metric family; values live in the registry's per-thread shards"""
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str,
+                 labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        values = self.registry.shard()
+        key = (self.name, labelvalues)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues: str):
+        values = self.registry.shard()
+        key = (self.name, labelvalues)
+        row = values.get(key)
+        if row is None:
+            # per-bucket counts (made cumulative on render), then sum and count
+            row = values[key] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+
+class MetricsRegistry:
+    """Metric families plus the per-thread shards holding their values"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.callbacks: List[Tuple[Gauge, Callable[[], Dict[LabelValues, float]]]] = []
+        self.derived: List[Tuple[Gauge, Callable[[dict], Dict[LabelValues, float]]]] = []
+        self.multiproc_dir: Optional[str] = None
+        self.flush_interval = 5.0
+        self._shards: List[dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    # Declaration
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._add(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._add(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name, help_text, labelnames, fn):
+        """Gauge whose values ``fn() -> {labelvalues: value}`` are read at scrape time, per process
+
+        A ``pid`` label is added: a limit, queue depth or age of one worker
+        means nothing summed with the others'.
+        """
+        self.callbacks.append((self._add(Gauge(self, name, help_text, [*labelnames, 'pid'])), fn))
+
+    def derived_gauge(self, name, help_text, labelnames, fn):
+        """Gauge computed from the merged values ``fn(values) -> {labelvalues: value}``"""
+        self.derived.append((self._add(Gauge(self, name, help_text, labelnames)), fn))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    # Recording
+
+    def shard(self) -> dict:
+        """This thread's private value dict (registered once, then lock-free)"""
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            self._ensure_flusher()
+        return values
+
+    def _after_fork_in_child(self):
+        # A worker starts from zero; the master's values are not its own
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    # Collection
+
+    def collect(self) -> dict:
+        """Sum of every shard of this process, plus scrape-time callbacks"""
+        merged = {}
+        for values in list(self._shards):
+            # dict() and list() copies are atomic under the GIL
+            for key, value in dict(values).items():
+                _merge(merged, key, list(value) if isinstance(value, list) else value)
+        pid = str(os.getpid())
+        for gauge, fn in self.callbacks:
+            for labelvalues, value in fn().items():
+                merged[(gauge.name, (*labelvalues, pid))] = value
+        return merged
+
+    def collect_all(self) -> dict:
+        """Totals of every worker process (of this one alone without a multiprocess directory)"""
+        if not self.multiproc_dir:
+            return self.collect()
+
+        # Flush first and read back only the files, so any worker serving the
+        # scrape sums the same data and counters never appear to go backwards
+        self.flush()
+        merged = {}
+        for pid, values in self._read_multiproc_files():
+            alive = _pid_alive(pid)
+            for key, value in values.items():
+                metric = self.metrics.get(key[0])
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                _merge(merged, key, value)
+        return merged
+
+    # Multiprocess mode
+
+    def configure(self, multiproc_dir: Optional[str] = None, flush_interval: float = 5.0):
+        self.multiproc_dir = multiproc_dir or None
+        self.flush_interval = flush_interval
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+
+    def flush(self):
+        """Write this process's totals to its file in the multiprocess directory"""
+        if not self.multiproc_dir:
+            return
+        values = [[name, list(labels), value] for (name, labels), value in self.collect().items()]
+        path = os.path.join(self.multiproc_dir, f'metrics_{os.getpid()}.json')
+        # Per thread: a scrape and the flusher may write at the same time
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(values, fh)
+        os.replace(tmp_path, path)
+
+    def _ensure_flusher(self):
+        if not self.multiproc_dir or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _read_multiproc_files(self):
+        for filename in os.listdir(self.multiproc_dir):
+            if not filename.startswith('metrics_') or not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, filename)) as fh:
+                    rows = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            pid = int(filename[len('metrics_'):-len('.json')])
+            yield pid, {(name, tuple(labels)): value for name, labels, value in rows}
+
+    # Exposition
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        values = self.collect_all()
+        for gauge, fn in self.derived:
+            for labelvalues, value in fn(values).items():
+                values[(gauge.name, tuple(labelvalues))] = value
+
+        by_metric: Dict[str, List] = {}
+        for (name, labelvalues), value in values.items():
+            by_metric.setdefault(name, []).append((labelvalues, value))
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labelvalues, value in sorted(by_metric.get(name, ()), key=lambda item: item[0]):
+                labels = list(zip(metric.labelnames, labelvalues))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for upper, count in zip(metric.buckets, value):
+                        cumulative += count
+                        le = '+Inf' if upper == float('inf') else repr(upper)
+                        lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+                    lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def clear_multiproc_dir(path: str):
+    """Remove files left by a previous run (called once by the gunicorn master)"""
+    if not os.path.isdir(path):
+        return
+    for filename in os.listdir(path):
+        if filename.startswith('metrics_'):
+            os.remove(os.path.join(path, filename))
+
+
+def _merge(merged: dict, key, value):
+    current = merged.get(key)
+    if current is None:
+        merged[key] = value
+    elif isinstance(value, list):
+        merged[key] = [a + b for a, b in zip(current, value)]
+    else:
+        merged[key] = current + value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _cache_hit_ratio(values: dict) -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (name, labelvalues), value in values.items():
+        if name == CACHE_REQUESTS.name:
+            cache, result = labelvalues
+            hits_total = totals.setdefault(cache, [0, 0])
+            hits_total[1] += value
+            if result == 'hit':
+                hits_total[0] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status', ['method', 'route', 'status'])
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route'])
+IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served')
+REQUEST_DB_TIME = registry.histogram(
+    'http_request_db_seconds', 'Database time spent per HTTP request', ['method', 'route'], DB_BUCKETS)
+REQUEST_DB_QUERIES = registry.counter(
+    'http_request_db_queries_total', 'Database queries executed by HTTP requests', ['method', 'route'])
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'In-process cache lookups by result', ['cache', 'result'])
+SINGLE_FLIGHT_CALLS = registry.counter(
+    'single_flight_calls_total', 'Single-flight reads that ran (leader) or joined a running one (follower)',
+    ['group', 'role'])
+INVALIDATION_LAG = registry.histogram(
+    'cache_invalidation_lag_seconds', 'Delay from a committed write to the cache invalidation in another process',
+    ['topic'])
+ADMISSION_REJECTED = registry.counter(
+    'admission_rejected_total', 'Requests shed by admission control', ['priority', 'reason'])
+IDEMPOTENCY_REQUESTS = registry.counter(
+    'idempotency_requests_total', 'Requests carrying an Idempotency-Key by outcome', ['outcome'])
+AUDIT_EVENTS = registry.counter(
+    'audit_events_total', 'Audit and access events queued, waited for room, dropped, written or failed',
+    ['kind', 'outcome'])
+AUDIT_WRITE_SECONDS = registry.histogram(
+    'audit_write_seconds', 'Time to write one batch of audit events', ['sink'], DB_BUCKETS)
+registry.derived_gauge(
+    'cache_hit_ratio', 'Share of cache lookups served from the cache', ['cache'], _cache_hit_ratio)
+
+
+def _start_request():
+    g._metrics_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _finish_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return response
+
+    IN_FLIGHT.dec()
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    REQUESTS.inc(request.method, route, str(response.status_code))
+    REQUEST_LATENCY.observe(time.perf_counter() - start, request.method, route)
+
+    stats = g.get('_query_stats')
+    if stats is not None:
+        REQUEST_DB_TIME.observe(stats.duration, request.method, route)
+        REQUEST_DB_QUERIES.inc(request.method, route, amount=stats.count)
+    return response
+
+
+def _end_request(exc=None):
+    # after_request is skipped for unhandled errors; still leave the gauge balanced
+    if g.pop('_metrics_start', None) is not None:
+        IN_FLIGHT.dec()
+
+
+def metrics_view():
+    """GET /metrics"""
+    token = current_app.config['METRICS_AUTH_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Record request metrics and expose them on /metrics"""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry.configure(
+        multiproc_dir=app.config['METRICS_MULTIPROC_DIR'],
+        flush_interval=app.config['METRICS_FLUSH_INTERVAL']
+    )
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,33 @@
+"""
+Preload (copy-on-write friendly worker startup)
+
+Used by gunicorn.conf.py when ``preload_app`` is enabled: shared, read-mostly
+data is loaded once in the master so forked workers share its memory pages.
+"""
+import gc
+from sqlalchemy.orm import configure_mappers
+from flask_back_office.extensions import db
+
+
+def warm(app):
+    """Load shared data in the master before workers are forked"""
+    from flask_back_office.catalog.cache import catalog_cache
+
+    with app.app_context():
+        # Resolve relationships/backrefs once instead of lazily per worker
+        configure_mappers()
+        catalog_cache.load()
+
+        # Never hand pooled connections (open sockets) over to the children
+        db.engine.dispose()
+
+    gc.collect()
+
+
+def freeze():
+    """Move every object tracked so far into the permanent GC generation
+
+    Called right before fork so the collector in the workers never touches
+    (and therefore never copies) the pages holding preloaded objects.
+    """
+    gc.freeze()
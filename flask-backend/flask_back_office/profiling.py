@@ -0,0 +1,224 @@
+"""
+On-demand Request Profiling
+
+A request is profiled when it carries a valid signed ``X-Profile`` header
+or is picked by PROFILING_SAMPLE_RATE. PROFILING_MODE selects the profiler:
+
+- ``cprofile`` writes ``<name>.pstats`` (``python -m pstats``, snakeviz)
+- ``sampling`` samples the request thread's stack every
+  PROFILING_SAMPLE_INTERVAL_MS and writes ``<name>.folded`` collapsed stacks
+  (flamegraph.pl, speedscope)
+
+Either way ``<name>.json`` holds route, status and timing. With neither a
+secret nor a sample rate configured the middleware is not installed at all,
+so unprofiled requests pay nothing.
+
+The header value is ``<expires>.<hmac-sha256(PROFILING_SECRET, expires)>``:
+
+    python -m flask_back_office.profiling --ttl 300
+"""
+import argparse
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+_UNSAFE = re.compile(r'[^A-Za-z0-9]+')
+
+
+def sign_token(secret: str, ttl: int = 300) -> str:
+    """Return an X-Profile value valid for ttl seconds"""
+    expires = str(int(time.time()) + ttl)
+    signature = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+
+def verify_token(secret: str, token: str) -> bool:
+    """Check the signature and expiry of an X-Profile value"""
+    expires, _, signature = token.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class CProfileSession:
+    """Deterministic profile of the calling thread"""
+    extension = 'pstats'
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def dump(self, path: str):
+        self._profiler.dump_stats(path)
+
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread (collapsed-stack output)"""
+    extension = 'folded'
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w') as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """WSGI middleware profiling selected requests of a Flask app"""
+
+    def __init__(self, app, secret: Optional[str], sample_rate: float, output_dir: str,
+                 mode: str = 'cprofile', sample_interval: float = 0.005):
+        if mode not in ('cprofile', 'sampling'):
+            raise ValueError(f'Unknown PROFILING_MODE {mode!r}')
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.mode = mode
+        self.sample_interval = sample_interval
+
+    def __call__(self, environ, start_response):
+        trigger = self._trigger(environ)
+        if trigger is None:
+            return self.wsgi_app(environ, start_response)
+
+        status_holder = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            status_holder.append(status)
+            return start_response(status, headers, exc_info)
+
+        profiler = CProfileSession() if self.mode == 'cprofile' else StackSampler(self.sample_interval)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            body = self.wsgi_app(environ, capture_start_response)
+            # Materialize the body so serialization is part of the profile, then
+            # close it as the server would have (response close hooks, teardown)
+            try:
+                content = b''.join(body)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            body = [content]
+        finally:
+            profiler.stop()
+            duration = time.perf_counter() - start
+            self._write(profiler, environ, trigger, duration, status_holder[0] if status_holder else None)
+        return body
+
+    def _trigger(self, environ) -> Optional[str]:
+        token = environ.get(PROFILE_HEADER)
+        if token and self.secret and verify_token(self.secret, token):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _route(self, environ) -> str:
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except Exception:
+            return '<unmatched>'
+
+    def _write(self, profiler, environ, trigger, duration, status):
+        route = self._route(environ)
+        method = environ.get('REQUEST_METHOD', '')
+        now = datetime.now(timezone.utc)
+        name = '{}_{}_{}_{}ms_{}'.format(
+            now.strftime('%Y%m%dT%H%M%S%f'), method, _UNSAFE.sub('-', route).strip('-') or 'root',
+            int(duration * 1000), os.getpid()
+        )
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, name)
+        profiler.dump(f'{base}.{profiler.extension}')
+        with open(f'{base}.json', 'w') as fh:
+            json.dump({
+                'ts': now.isoformat(),
+                'method': method,
+                'route': route,
+                'path': environ.get('PATH_INFO'),
+                'status': status,
+                'duration_ms': round(duration * 1000, 3),
+                'trigger': trigger,
+                'mode': self.mode,
+                'pid': os.getpid(),
+            }, fh, indent=2)
+
+
+def init_app(app):
+    """Install the profiling middleware when profiling can be triggered at all"""
+    secret = app.config['PROFILING_SECRET']
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    if not secret and not sample_rate:
+        return
+
+    app.wsgi_app = ProfilingMiddleware(
+        app, secret, sample_rate, app.config['PROFILING_OUTPUT_DIR'],
+        mode=app.config['PROFILING_MODE'],
+        sample_interval=app.config['PROFILING_SAMPLE_INTERVAL_MS'] / 1000
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print a signed X-Profile header value')
+    parser.add_argument('--ttl', type=int, default=300, help='seconds the token stays valid')
+    args = parser.parse_args(argv)
+
+    secret = os.environ.get('PROFILING_SECRET')
+    if not secret:
+        print('PROFILING_SECRET is not set', file=sys.stderr)
+        return 1
+    print(sign_token(secret, args.ttl))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+DAO Query Plan Check
+
+    flask --app wsgi explain-dao
+
+Runs every keyed DAO lookup, EXPLAINs each statement it issued and fails when
+one of them reads a table with a full scan instead of an index. Listing
+queries (``get_all``) scan by design and are not checked. Lookups are
+read-only, so the check is safe against a live database.
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from flask_back_office.extensions import db
+
+
+def dao_lookups() -> List[Tuple[str, Callable[[], object]]]:
+    from flask_back_office.accounts.dao import UserDAO, UserProfileDAO
+    from flask_back_office.catalog.dao import PlanCategoryDAO, HealthPlanDAO
+    from flask_back_office.cart.dao import CartDAO, CartItemDAO
+
+    return [
+        ('UserDAO.get_by_id', lambda: UserDAO.get_by_id(1)),
+        ('UserDAO.get_by_email', lambda: UserDAO.get_by_email('someone@example.com')),
+        ('UserDAO.email_exists', lambda: UserDAO.email_exists('someone@example.com')),
+        ('UserProfileDAO.get_by_user_id', lambda: UserProfileDAO.get_by_user_id(1)),
+        ('PlanCategoryDAO.get_by_id', lambda: PlanCategoryDAO.get_by_id(1)),
+        ('HealthPlanDAO.get_by_id', lambda: HealthPlanDAO.get_by_id(1)),
+        ('HealthPlanDAO.get_by_category', lambda: HealthPlanDAO.get_by_category(1)),
+        ('HealthPlanDAO.get_by_category(all)', lambda: HealthPlanDAO.get_by_category(1, active_only=False)),
+        ('CartDAO.get_by_id', lambda: CartDAO.get_by_id(1)),
+        ('CartDAO.get_active_cart', lambda: CartDAO.get_active_cart(1)),
+        ('CartItemDAO.get_by_id', lambda: CartItemDAO.get_by_id(1)),
+        ('CartItemDAO.get_by_cart_and_plan', lambda: CartItemDAO.get_by_cart_and_plan(1, 1)),
+    ]
+
+
+@contextmanager
+def captured_statements() -> Iterator[list]:
+    """Collect (statement, parameters) of everything executed on the engine"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def explain(conn, statement: str, parameters) -> Tuple[List[str], List[str]]:
+    """Return (plan lines, full-scan lines) of one statement"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        return plan, [line for line in plan if line.startswith('SCAN ')]
+    if dialect == 'postgresql':
+        # Tiny tables would otherwise be seq-scanned even with a usable index
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = [row[0] for row in conn.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()]
+        return plan, [line for line in plan if 'Seq Scan' in line]
+    raise click.ClickException(f'No query plan check for {dialect}')
+
+
+def check_dao_query_plans(verbose: bool = False) -> List[str]:
+    """Return the DAO lookups whose plan contains a full table scan"""
+    failures = []
+    for name, lookup in dao_lookups():
+        with captured_statements() as statements:
+            lookup()
+        db.session.rollback()
+
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                with conn.begin():
+                    plan, scans = explain(conn, statement, parameters)
+                if scans:
+                    failures.append(f"{name}: {'; '.join(scans)}")
+                click.echo(f"{'FAIL' if scans else 'ok  '} {name}")
+                if verbose or scans:
+                    for line in plan:
+                        click.echo(f'       {line}')
+    return failures
+
+
+@click.command('explain-dao')
+@click.option('--verbose', '-v', is_flag=True, help='Print every query plan')
+@with_appcontext
+def explain_dao_command(verbose):
+    """Fail when a DAO lookup does a full table scan"""
+    failures = check_dao_query_plans(verbose)
+    if failures:
+        raise click.ClickException(f'{len(failures)} DAO lookup(s) scan a table:\n' + '\n'.join(failures))
+    click.echo('All DAO lookups use an index')
+
+
+def init_app(app):
+    app.cli.add_command(explain_dao_command)
@@ -0,0 +1,254 @@
+"""
+Synthetic Data Generator
+
+    flask --app wsgi seed --users 1000000 --seed 42
+
+Generates a deterministic dataset (same --seed, same rows) of users with
+profiles, a plan catalog with realistic features JSON and carts whose
+plan popularity and size are skewed the way real traffic is. Rows are
+written in large batches: COPY on PostgreSQL, executemany elsewhere. Every
+user shares one precomputed password hash, so no per-row hashing happens.
+"""
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from flask_back_office.extensions import db
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi',
+               'Arjun', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Lakshmi', 'Karthik', 'Fatima', 'Imran', 'Neha']
+LAST_NAMES = ['Sharma', 'Iyer', 'Reddy', 'Patel', 'Nair', 'Gupta', 'Singh', 'Khan', 'Das', 'Menon',
+              'Joshi', 'Rao', 'Mehta', 'Chopra', 'Bose', 'Pillai', 'Verma', 'Kulkarni', 'Shah', 'Ghosh']
+CATEGORY_KINDS = ['Individual', 'Family Floater', 'Senior Citizen', 'Critical Illness', 'Maternity',
+                  'Top-Up', 'Personal Accident', 'Group', 'Disease Specific', 'Hospital Cash']
+PLAN_TIERS = ['Basic', 'Silver', 'Gold', 'Platinum', 'Diamond']
+# State and its pincode prefix, for plans sold regionally
+REGIONS = [('Karnataka', '56'), ('Maharashtra', '40'), ('Tamil Nadu', '60'), ('Kerala', '68'),
+           ('Delhi', '11'), ('Telangana', '50'), ('West Bengal', '70'), ('Gujarat', '38')]
+ADD_ONS = ['opd_cover', 'dental', 'vision', 'wellness', 'global_cover', 'air_ambulance', 'restore_benefit']
+
+# Zipf exponent of plan popularity and chance of each extra item in a cart
+PLAN_POPULARITY_SKEW = 1.1
+EXTRA_ITEM_PROBABILITY = 0.45
+ACTIVE_CART_PROBABILITY = 0.6
+PAST_CART_PROBABILITY = 0.3
+REGIONAL_PLAN_PROBABILITY = 0.15
+MAX_PAST_CARTS = 3
+HISTORY_DAYS = 730
+# Timestamps are relative to a fixed date so a seed always yields identical rows
+AS_OF = datetime(2025, 1, 1)
+
+
+class BulkWriter:
+    """Buffers rows per table and writes them in batches, parents first"""
+
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.order = {table: index for index, table in enumerate(db.metadata.sorted_tables)}
+        self.buffers: Dict[Any, List[Dict[str, Any]]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, table, row: Dict[str, Any]):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            # Flush everything so foreign keys always point at written rows
+            self.flush()
+
+    def flush(self):
+        for table in sorted(self.buffers, key=self.order.get):
+            rows = self.buffers[table]
+            if rows:
+                self._write(table, rows)
+                self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+                self.buffers[table] = []
+
+    def _write(self, table, rows: List[Dict[str, Any]]):
+        if self.engine.dialect.name == 'postgresql':
+            self._copy(table, rows)
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+
+    def _copy(self, table, rows: List[Dict[str, Any]]):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sync_sequences(self, tables):
+        """Move PostgreSQL id sequences past the explicitly inserted ids"""
+        if self.engine.dialect.name != 'postgresql':
+            return
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                ))
+
+
+def _next_id(conn, table) -> int:
+    return (conn.execute(db.select(db.func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _features(rng: random.Random, tier: int) -> str:
+    return json.dumps({
+        'room_rent': rng.choice(['1% of sum insured', 'single private room', 'no limit'][:1 + tier // 2]),
+        'copay_percent': rng.choice([0, 10, 20] if tier < 3 else [0]),
+        'waiting_period_days': rng.choice([30, 60, 90]),
+        'pre_existing_waiting_years': rng.choice([4, 3, 2] if tier < 3 else [2, 1]),
+        'network_hospitals': rng.randrange(3000, 12000, 50),
+        'cashless': True,
+        'maternity_cover': tier >= 2 and rng.random() < 0.5,
+        'no_claim_bonus_percent': rng.choice([10, 20, 50, 100]),
+        'day_care_procedures': rng.randrange(140, 600, 10),
+        'add_ons': rng.sample(ADD_ONS, rng.randint(0, 1 + tier)),
+    }, separators=(',', ':'))
+
+
+def _eligibility(rng: random.Random, kind: str, tier: int) -> Optional[str]:
+    rules: Dict[str, Any] = {
+        'Senior Citizen': {'min_age': 60, 'max_age': 80},
+        'Maternity': {'min_age': 18, 'max_age': 45, 'genders': ['Female']},
+        'Family Floater': {'max_age': 65},
+        'Group': {},
+    }.get(kind, {'min_age': 18, 'max_age': 65})
+    if rng.random() < REGIONAL_PLAN_PROBABILITY:
+        regions = rng.sample(REGIONS, rng.randint(1, 3))
+        if rng.random() < 0.5:
+            rules['states'] = [state for state, _ in regions]
+        else:
+            rules['pincodes'] = [prefix for _, prefix in regions]
+    if tier == 0 and rng.random() < 0.3:
+        rules['pre_existing'] = False
+    return json.dumps(rules, separators=(',', ':')) if rules else None
+
+
+def seed_database(users: int, categories: Optional[int] = None, plans: Optional[int] = None,
+                  seed: int = 42, batch_size: int = 10000, password: str = 'Password#123') -> Dict[str, int]:
+    """Append a generated dataset to the bound database and return rows written per table"""
+    from flask_back_office.accounts.models import User, UserProfile
+    from flask_back_office.catalog.models import PlanCategory, HealthPlan
+    from flask_back_office.cart.models import Cart, CartItem
+
+    rng = random.Random(seed)
+    categories = categories or max(10, users // 200)
+    plans = plans or max(50, users // 40)
+    password_hash = generate_password_hash(password)
+    writer = BulkWriter(db.engine, batch_size)
+
+    def created_at():
+        return AS_OF - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))
+
+    tables = [t.__table__ for t in (PlanCategory, HealthPlan, User, UserProfile, Cart, CartItem)]
+    with db.engine.connect() as conn:
+        category_id, plan_id, user_id, profile_id, cart_id, item_id = (_next_id(conn, t) for t in tables)
+
+    category_ids = range(category_id, category_id + categories)
+    for cid in category_ids:
+        kind = CATEGORY_KINDS[(cid - category_id) % len(CATEGORY_KINDS)]
+        writer.add(tables[0], {'id': cid, 'name': f'{kind} {cid}', 'description': f'{kind} health plans',
+                               'is_active': rng.random() > 0.02, 'created_at': created_at()})
+
+    plan_ids = range(plan_id, plan_id + plans)
+    for pid in plan_ids:
+        tier = rng.randrange(len(PLAN_TIERS))
+        monthly = round(300 * (tier + 1) * rng.uniform(0.8, 1.6), 2)
+        cid = rng.choice(category_ids)
+        kind = CATEGORY_KINDS[(cid - category_id) % len(CATEGORY_KINDS)]
+        writer.add(tables[1], {
+            'id': pid, 'category_id': cid, 'name': f'{PLAN_TIERS[tier]} Care {pid}',
+            'description': f'{PLAN_TIERS[tier]} tier cover',
+            'coverage_amount': 100000 * rng.choice([3, 5, 10, 25, 50, 100]) * (tier + 1),
+            'premium_monthly': monthly, 'premium_yearly': round(monthly * 11, 2),
+            'features': _features(rng, tier), 'eligibility': _eligibility(rng, kind, tier),
+            'is_active': rng.random() > 0.05,
+            'created_at': created_at(), 'updated_at': AS_OF,
+        })
+
+    # A few plans get most of the cart traffic
+    popularity = list(accumulate(1 / rank ** PLAN_POPULARITY_SKEW for rank in range(1, plans + 1)))
+
+    for uid in range(user_id, user_id + users):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        joined = created_at()
+        writer.add(tables[2], {'id': uid, 'email': f'{first}.{last}.{uid}@example.com'.lower(),
+                               'password_hash': password_hash, 'is_active': rng.random() > 0.01,
+                               'created_at': joined, 'updated_at': joined})
+        writer.add(tables[3], {'id': profile_id, 'user_id': uid, 'full_name': f'{first} {last}',
+                               'mobile_number': f'{rng.choice("6789")}{rng.randrange(10 ** 9):09d}',
+                               'date_of_birth': (AS_OF - timedelta(days=int(365.25 * rng.triangular(18, 80, 32)))).date(),
+                               'created_at': joined, 'updated_at': joined})
+        profile_id += 1
+
+        carts = [True] if rng.random() < ACTIVE_CART_PROBABILITY else []
+        if rng.random() < PAST_CART_PROBABILITY:
+            carts += [False] * rng.randint(1, MAX_PAST_CARTS)
+        for is_active in carts:
+            writer.add(tables[4], {'id': cart_id, 'user_id': uid, 'is_active': is_active,
+                                   'created_at': joined, 'updated_at': joined})
+            size = 1
+            while size < 8 and rng.random() < EXTRA_ITEM_PROBABILITY:
+                size += 1
+            picked = set(rng.choices(plan_ids, cum_weights=popularity, k=size))
+            for pid in picked:
+                writer.add(tables[5], {'id': item_id, 'cart_id': cart_id, 'plan_id': pid,
+                                       'quantity': 1 if rng.random() < 0.9 else rng.randint(2, 4),
+                                       'billing_cycle': 'monthly' if rng.random() < 0.7 else 'yearly',
+                                       'created_at': joined})
+                item_id += 1
+            cart_id += 1
+
+    writer.flush()
+    writer.sync_sequences(tables)
+    return writer.counts
+
+
+@click.command('seed')
+@click.option('--users', default=1000, show_default=True, help='Users (with profiles) to generate')
+@click.option('--categories', type=int, help='Plan categories (default: users / 200, at least 10)')
+@click.option('--plans', type=int, help='Health plans (default: users / 40, at least 50)')
+@click.option('--seed', 'seed_value', default=42, show_default=True, help='Random seed')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per INSERT batch / COPY')
+@click.option('--password', default='Password#123', show_default=True, help='Password of every generated user')
+@click.option('--reset', is_flag=True, help='Drop and recreate all tables first')
+@with_appcontext
+def seed_command(users, categories, plans, seed_value, batch_size, password, reset):
+    """Generate a deterministic synthetic dataset"""
+    if reset:
+        db.drop_all()
+        db.create_all()
+
+    started = time.perf_counter()
+    counts = seed_database(users, categories, plans, seed_value, batch_size, password)
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    for table, count in counts.items():
+        click.echo(f'{table:<16} {count:>10}')
+    click.echo(f'{total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
+
+
+def init_app(app):
+    app.cli.add_command(seed_command)
@@ -0,0 +1,65 @@
+"""
+Single-Flight Reads
+
+    plan_reads = SingleFlight('plan')
+    plan = plan_reads.do(plan_id, lambda: load_plan_dict(plan_id))
+
+Concurrent ``do`` calls with the same key run ``fn`` once: the first caller
+(the leader) runs it, the others wait and get its result or exception. The
+result is shared between threads, so ``fn`` must return plain data (dicts,
+snapshots), never ORM objects bound to the leader's session, and callers
+must not mutate it. A call joins a flight already in progress, so it may
+get data read just before its own request wrote: keep reads that need
+read-your-writes (a user's own profile) out of it.
+
+Flights are per process: every gunicorn worker still runs its own copy of
+``fn``. Data that should be built once per node or cluster needs somewhere
+shared to keep it, as the catalog table (catalog/table.py) has.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from flask_back_office.metrics import SINGLE_FLIGHT_CALLS
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Named group of keyed calls, each key running at most once at a time"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run ``fn``, or wait for the call with the same key already running"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(self.name, 'follower')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        SINGLE_FLIGHT_CALLS.inc(self.name, 'leader')
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
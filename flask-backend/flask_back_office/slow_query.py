@@ -0,0 +1,192 @@
+"""
+Slow Query Log
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are recorded with their
+parameter shape (types only, never values), the DAO method that issued them
+and the request route. The request thread only enqueues the record; a
+background thread runs ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on SQLite) and
+writes one JSON line per query to a rotating log file.
+"""
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+from flask import has_request_context, request
+from sqlalchemy import event
+from flask_back_office.extensions import db
+
+slow_query_logger = logging.getLogger('flask_back_office.slow_queries')
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN (FORMAT JSON) ',
+    'mysql': 'EXPLAIN FORMAT=JSON ',
+}
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Describe bound parameters by type so no customer data reaches the log"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {'rows': len(parameters), 'row': parameter_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def calling_dao_method() -> Optional[str]:
+    """Qualified name of the innermost ``*.dao`` function on the stack"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get('__name__', '').endswith('.dao'):
+            code = frame.f_code
+            return f"{frame.f_globals['__name__']}.{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """Collects slow statements and explains/writes them off the request path"""
+
+    def __init__(self):
+        self.engine = None
+        self.threshold = 0.2
+        self.explain = True
+        self.explain_interval = 60.0
+        self.dropped = 0
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=1000)
+        self._explained_at: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if not app.config['SLOW_QUERY_LOG']:
+            return
+
+        self.threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+        self.explain = app.config['SLOW_QUERY_EXPLAIN']
+        self.explain_interval = app.config['SLOW_QUERY_EXPLAIN_INTERVAL']
+        self._queue = queue.Queue(maxsize=app.config['SLOW_QUERY_QUEUE_SIZE'])
+        self._configure_logger(app)
+
+        with app.app_context():
+            self.engine = db.engine
+            engines = list(db.engines.values())
+        # Replicas share the primary's schema, so EXPLAIN always runs on the primary
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(engine, 'handle_error', self._handle_error)
+
+    def _configure_logger(self, app):
+        if slow_query_logger.handlers:
+            return
+
+        path = app.config['SLOW_QUERY_LOG_FILE']
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backupCount=app.config['SLOW_QUERY_LOG_BACKUP_COUNT']
+            )
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # By cursor: a failed statement never reaches after_cursor_execute, see _handle_error
+        conn.info.setdefault('slow_query_start', {})[cursor] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['slow_query_start'].pop(cursor)
+        # The writer's own EXPLAIN statements are never logged
+        if duration >= self.threshold and threading.current_thread() is not self._thread:
+            self.record(statement, parameters, duration, executemany)
+
+    @staticmethod
+    def _handle_error(exception_context):
+        connection, execution = exception_context.connection, exception_context.execution_context
+        if connection is not None and execution is not None:
+            connection.info.get('slow_query_start', {}).pop(execution.cursor, None)
+
+    def record(self, statement: str, parameters: Any, duration: float, executemany: bool = False):
+        """Capture context on the calling thread and hand the rest to the writer"""
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'statement': statement,
+            'params_shape': parameter_shape(parameters),
+            'dao': calling_dao_method(),
+            'route': f'{request.method} {request.url_rule.rule}' if has_request_context() and request.url_rule else None,
+            'pid': os.getpid(),
+        }
+        explainable = not executemany and statement.lstrip()[:6].upper() in ('SELECT', 'WITH')
+        job = {'entry': entry, 'parameters': parameters if explainable else None, 'explain': explainable}
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so (re)start lazily in each worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            entry = job['entry']
+            try:
+                if self.explain and job['explain'] and self._should_explain(entry['statement']):
+                    entry['plan'] = self._explain(entry['statement'], job['parameters'])
+            except Exception as e:
+                entry['explain_error'] = str(e)
+            slow_query_logger.info(json.dumps(entry, default=str))
+            self._queue.task_done()
+
+    def _should_explain(self, statement: str) -> bool:
+        """Explain a given statement at most once per SLOW_QUERY_EXPLAIN_INTERVAL"""
+        now = time.monotonic()
+        last = self._explained_at.get(statement)
+        if last is not None and now - last < self.explain_interval:
+            return False
+        if len(self._explained_at) > 10000:
+            self._explained_at.clear()
+        self._explained_at[statement] = now
+        return True
+
+    def _explain(self, statement: str, parameters: Any):
+        prefix = EXPLAIN_PREFIXES.get(self.engine.dialect.name)
+        if prefix is None:
+            return None
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+        return [list(row) for row in rows]
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued entries have been written (tests, shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+slow_query_log = SlowQueryLog()
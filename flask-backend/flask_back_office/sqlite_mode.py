@@ -0,0 +1,166 @@
+"""
+SQLite High-Concurrency Mode
+
+For single-node installs running on SQLite. With SQLITE_HIGH_CONCURRENCY
+every SQLite engine (the primary and any cart shards):
+
+- runs in WAL mode, so readers and the writer never block each other
+- uses synchronous=NORMAL (an application crash loses nothing; a power cut
+  may lose the last commits, never the database), busy_timeout and mmap
+- starts the transactions of a unit of work with BEGIN IMMEDIATE, so one
+  that read first can no longer fail to upgrade to a write lock (the
+  "database is locked" error busy_timeout cannot retry)
+- admits one unit of work at a time: a worker's threads queue up in FIFO
+  order instead of busy-polling the file lock, which only arbitrates
+  between worker processes; a unit of work that staged nothing still ends
+  its transaction before the next one is admitted, so no write lock is
+  held outside the queue
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from flask_back_office.extensions import db
+
+_writing: ContextVar[bool] = ContextVar('sqlite_writing', default=False)
+_enabled = False
+
+
+# Same queue as the Django back office's SQLite backend
+# (healthcare_plans_bo/sqlite_backend/base.py); the backends are deployed
+# separately and share no package, so change both
+class WriterQueue:
+    """Lock that admits writers in arrival order"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+        self._busy = False
+
+    def acquire(self):
+        with self._lock:
+            if not self._busy:
+                self._busy = True
+                return
+            turn = threading.Lock()
+            turn.acquire()
+            self._waiters.append(turn)
+        # Released by the writer handing over to us
+        turn.acquire()
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().release()
+            else:
+                self._busy = False
+
+
+writer_queue = WriterQueue()
+
+
+@contextmanager
+def writer(sessions: Callable[[], Iterable[Session]]) -> Iterator[None]:
+    """Hold the writer queue; transactions begun inside start with BEGIN IMMEDIATE
+
+    ``sessions`` lists the sessions in use, asked again on the way out: one
+    that began a transaction but staged nothing was never committed, and
+    would keep its write lock past our turn if not ended here.
+    """
+    if not _enabled:
+        yield
+        return
+
+    writer_queue.acquire()
+    token = _writing.set(True)
+    try:
+        for session in sessions():
+            _end_transaction(session)
+        yield
+    finally:
+        try:
+            for session in sessions():
+                _end_transaction(session)
+        finally:
+            _writing.reset(token)
+            writer_queue.release()
+
+
+def _end_transaction(session: Session):
+    # Before: a snapshot taken before we queued cannot be upgraded to a write.
+    # After: a transaction begun IMMEDIATE holds the write lock. End either
+    # without expiring what was loaded
+    if not session.in_transaction() or session.new or session.dirty or session.deleted:
+        return
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+
+def read_only(engine):
+    """``engine`` for a session that only reads through it: never begun IMMEDIATE
+
+    A second connection to the database a unit of work writes would
+    otherwise wait on that unit's own write lock until busy_timeout.
+    """
+    return engine.execution_options(sqlite_read_only=True)
+
+
+def lock_for_write(session: Session, mapper):
+    """Take the write lock of ``mapper``'s SQLite database now, held until ``session`` commits
+
+    SQLite ignores SELECT ... FOR UPDATE; this is its stand-in, for the whole
+    database. Use it inside ``writer()``, where high-concurrency mode already
+    begins IMMEDIATE; elsewhere the sqlite3 module has not begun yet. A no-op
+    on other databases.
+    """
+    connection = session.connection(bind_arguments={'mapper': mapper})
+    if connection.dialect.name != 'sqlite':
+        return
+    driver_connection = connection.connection.driver_connection
+    if not driver_connection.in_transaction:
+        driver_connection.execute('BEGIN IMMEDIATE')
+
+
+def configure_engine(engine, synchronous: str, busy_timeout_ms: int, mmap_size: int):
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        # Transactions are begun below, not by the sqlite3 module
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin(conn):
+        # On the driver connection, so query counts and budgets stay those of the default mode
+        immediate = _writing.get() and not conn.get_execution_options().get('sqlite_read_only')
+        conn.connection.driver_connection.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+
+def init_app(app):
+    global _enabled
+    _enabled = app.config['SQLITE_HIGH_CONCURRENCY']
+    if not _enabled:
+        return
+
+    with app.app_context():
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+    for engine in engines:
+        configure_engine(
+            engine,
+            synchronous=app.config['SQLITE_SYNCHRONOUS'],
+            busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+            mmap_size=app.config['SQLITE_MMAP_SIZE'],
+        )
@@ -0,0 +1,89 @@
+"""
+Unit of Work
+
+    with unit_of_work():
+        user = UserDAO.create(email, password)
+        UserProfileDAO.create(user_id=user.id, full_name=full_name)
+
+DAOs only stage changes (``add``, attribute changes, a ``flush`` where an id
+is needed). The outermost block commits everything staged inside it once on
+exit, or rolls it all back when it raises; nested blocks join the enclosing
+one. Cart shard sessions used inside the block are committed along with
+``db.session``, one transaction per database; a session that staged nothing
+is not committed, so read-only requests cost no COMMIT (except in SQLite
+high-concurrency mode, where its write lock must not outlive the block).
+
+``on_commit(fn)`` defers ``fn`` until the enclosing block has committed
+(dropped if it rolls back), e.g. to record what it did.
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from flask_back_office.extensions import db
+from flask_back_office.cart.sharding import cart_shards
+from flask_back_office.sqlite_mode import writer
+
+
+def _sessions() -> List[Session]:
+    return [db.session(), *cart_shards.open_sessions()]
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['unit_of_work_staged'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_write(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['unit_of_work_staged'] = True
+
+
+def _staged(session: Session) -> bool:
+    return bool(session.info.pop('unit_of_work_staged', False) or session.new or session.dirty or session.deleted)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[None]:
+    """Commit the block's changes once at the end, or roll them back on error"""
+    depth = g.get('unit_of_work_depth', 0)
+    if depth:
+        g.unit_of_work_depth = depth + 1
+        try:
+            yield
+        finally:
+            g.unit_of_work_depth = depth
+        return
+
+    g.unit_of_work_depth = 1
+    g.unit_of_work_callbacks = []
+    try:
+        # Queued behind other writers in SQLite high-concurrency mode
+        with writer(_sessions):
+            try:
+                yield
+                for session in _sessions():
+                    if _staged(session):
+                        session.commit()
+            except BaseException:
+                for session in _sessions():
+                    session.info.pop('unit_of_work_staged', None)
+                    session.rollback()
+                raise
+        for callback in g.unit_of_work_callbacks:
+            callback()
+    finally:
+        g.unit_of_work_depth = 0
+        g.unit_of_work_callbacks = []
+
+
+def on_commit(callback: Callable[[], None]):
+    """Run ``callback`` once the current unit of work commits (now, outside one)"""
+    if g.get('unit_of_work_depth', 0):
+        g.unit_of_work_callbacks.append(callback)
+    else:
+        callback()
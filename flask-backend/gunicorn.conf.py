@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for the Flask backend
+
+    gunicorn wsgi:app
+
+With GUNICORN_PRELOAD enabled (default) the app and its shared data are
+loaded once in the master and the GC is frozen right before forking, so the
+workers keep sharing those pages copy-on-write instead of each dirtying its
+own copy. Check the effect with ``python -m flask_back_office.memory_report``.
+"""
+import gc
+import os
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Workers share request metrics through files in this directory
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/flask_back_office_metrics')
+
+if preload_app:
+    # No collections in the master while it loads: a collection would touch
+    # (and later un-share) every page holding preloaded objects. Enabled again
+    # once they are frozen (when_ready), where it only walks newer objects.
+    gc.disable()
+
+
+def on_starting(server):
+    from flask_back_office.metrics import clear_multiproc_dir
+    clear_multiproc_dir(os.environ['METRICS_MULTIPROC_DIR'])
+
+
+def when_ready(server):
+    if preload_app:
+        from flask_back_office.preload import freeze, warm
+        warm(server.app.wsgi())
+        # Before the first fork; pre_fork freezes what is new before later ones (restarts)
+        freeze()
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from flask_back_office.preload import freeze
+        freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def worker_exit(server, worker):
+    # Queued audit events are written before the worker goes away
+    from flask_back_office.audit import audit_log
+    audit_log.close()
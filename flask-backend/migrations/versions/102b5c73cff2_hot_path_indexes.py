@@ -0,0 +1,39 @@
+"""hot path indexes
+
+Revision ID: 102b5c73cff2
+Revises: 428dfc131f64
+Create Date: 2026-10-19 16:15:45.020731
+
+Indexes behind the DAO lookups: the active cart of a user (partial, since
+inactive carts only accumulate), the items of a cart / one plan in a cart,
+and the plans of a category. users.email and user_profiles.user_id are
+already covered by their unique constraints. Verified by `flask explain-dao`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '102b5c73cff2'
+down_revision = '428dfc131f64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_carts_user_id_active', 'carts', ['user_id'],
+        sqlite_where=sa.text('is_active = 1'), postgresql_where=sa.text('is_active'),
+        if_not_exists=True
+    )
+    op.create_index('ix_cart_items_cart_id_plan_id', 'cart_items', ['cart_id', 'plan_id'], if_not_exists=True)
+    op.create_index(
+        'ix_health_plans_category_id_is_active', 'health_plans', ['category_id', 'is_active'],
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index('ix_health_plans_category_id_is_active', table_name='health_plans')
+    op.drop_index('ix_cart_items_cart_id_plan_id', table_name='cart_items')
+    op.drop_index('ix_carts_user_id_active', table_name='carts')
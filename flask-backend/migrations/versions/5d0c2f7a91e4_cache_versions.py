@@ -0,0 +1,34 @@
+"""cache versions
+
+Revision ID: 5d0c2f7a91e4
+Revises: b3649158ee46
+Create Date: 2026-10-19 21:14:37.905126
+
+Invalidation counter per cache topic for INVALIDATION_TRANSPORT=table, see
+flask_back_office/invalidation.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c2f7a91e4'
+down_revision = 'b3649158ee46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cache_versions',
+        sa.Column('topic', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('origin', sa.String(length=128), nullable=True),
+        sa.Column('published_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('topic'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,28 @@
+"""cache versions changed keys
+
+Revision ID: 8e21b6c4d7f0
+Revises: 5d0c2f7a91e4
+Create Date: 2026-10-19 23:02:45.118734
+
+Keys of the latest invalidation per topic, so workers can apply small
+catalog changes instead of reloading everything.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e21b6c4d7f0'
+down_revision = '5d0c2f7a91e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cache_versions') as batch_op:
+        batch_op.add_column(sa.Column('changed_keys', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cache_versions') as batch_op:
+        batch_op.drop_column('changed_keys')
@@ -0,0 +1,75 @@
+"""audit events
+
+Revision ID: a92d3c5e7f18
+Revises: f41b8d2e6a93
+Create Date: 2026-10-20 03:12:44.508127
+
+Append-only audit and access log for AUDIT_LOG_SINK=table, see
+flask_back_office/audit.py. On SQLite and PostgreSQL triggers reject
+UPDATE and DELETE of its rows.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a92d3c5e7f18'
+down_revision = 'f41b8d2e6a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'audit_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('action', sa.String(length=64), nullable=False),
+        sa.Column('outcome', sa.String(length=16), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('method', sa.String(length=8), nullable=True),
+        sa.Column('route', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.Integer(), nullable=True),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('remote_addr', sa.String(length=45), nullable=True),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_audit_events_created_at', 'audit_events', ['created_at'], if_not_exists=True)
+    op.create_index('ix_audit_events_action', 'audit_events', ['action'], if_not_exists=True)
+    op.create_index('ix_audit_events_user_id', 'audit_events', ['user_id'], if_not_exists=True)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in ('UPDATE', 'DELETE'):
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS audit_events_no_{statement.lower()} BEFORE {statement} ON audit_events "
+                f"BEGIN SELECT RAISE(ABORT, 'audit_events is append-only'); END"
+            )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE OR REPLACE FUNCTION audit_events_append_only() RETURNS trigger AS $$ "
+            "BEGIN RAISE EXCEPTION 'audit_events is append-only'; END $$ LANGUAGE plpgsql"
+        )
+        # Also made by db.create_all() (see AuditEvent), which may have run first
+        op.execute('DROP TRIGGER IF EXISTS audit_events_append_only ON audit_events')
+        op.execute(
+            "CREATE TRIGGER audit_events_append_only BEFORE UPDATE OR DELETE ON audit_events "
+            "FOR EACH ROW EXECUTE FUNCTION audit_events_append_only()"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS audit_events_no_update')
+        op.execute('DROP TRIGGER IF EXISTS audit_events_no_delete')
+    elif dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS audit_events_append_only ON audit_events')
+        op.execute('DROP FUNCTION IF EXISTS audit_events_append_only()')
+    op.drop_index('ix_audit_events_user_id', table_name='audit_events')
+    op.drop_index('ix_audit_events_action', table_name='audit_events')
+    op.drop_index('ix_audit_events_created_at', table_name='audit_events')
+    op.drop_table('audit_events')
@@ -0,0 +1,27 @@
+"""user profile date of birth
+
+Revision ID: c7a3e9f15b82
+Revises: 8e21b6c4d7f0
+Create Date: 2026-10-19 23:41:07.503218
+
+Members' ages drive the age bands of household premium quotes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a3e9f15b82'
+down_revision = '8e21b6c4d7f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_profiles') as batch_op:
+        batch_op.add_column(sa.Column('date_of_birth', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_profiles') as batch_op:
+        batch_op.drop_column('date_of_birth')
@@ -0,0 +1,28 @@
+"""health plan eligibility
+
+Revision ID: f41b8d2e6a93
+Revises: c7a3e9f15b82
+Create Date: 2026-10-20 00:18:52.640915
+
+Per-plan eligibility rules (JSON), compiled per catalog snapshot to filter
+the catalog for a customer.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f41b8d2e6a93'
+down_revision = 'c7a3e9f15b82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('health_plans') as batch_op:
+        batch_op.add_column(sa.Column('eligibility', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('health_plans') as batch_op:
+        batch_op.drop_column('eligibility')
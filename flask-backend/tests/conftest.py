@@ -0,0 +1,55 @@
+"""
+Test Fixtures
+
+Each test gets its own app (TestingConfig: a fresh in-memory database,
+strict query budgets) with log files under its temporary directory;
+``make_app(**settings)`` builds one with other settings.
+"""
+import pytest
+
+from flask_back_office import create_app
+from flask_back_office.config import TestingConfig, config
+from flask_back_office.extensions import db
+
+PASSWORD = 'Password#123'
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    apps = []
+
+    def make(**settings):
+        config['test'] = type('TestConfig', (TestingConfig,), settings)
+        apps.append(create_app('test'))
+        return apps[-1]
+
+    yield make
+    config.pop('test', None)
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client) -> dict:
+    """Authorization header of a newly registered, logged-in member"""
+    email = 'member@example.com'
+    response = client.post('/api/v1/accounts/register/', json={
+        'email': email, 'password': PASSWORD, 'full_name': 'Test Member', 'mobile_number': '9876543210'
+    })
+    assert response.status_code == 201, response.get_json()
+    response = client.post('/api/v1/accounts/login/', json={'email': email, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access']}"}
@@ -0,0 +1,54 @@
+"""
+Admission control: shedding with 503 + Retry-After, /metrics exempt, slots released on errors
+"""
+import threading
+
+import pytest
+from flask import jsonify
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(ADMISSION_CONTROL=True, ADMISSION_CLASSES='default=1:0:0', ADMISSION_RETRY_AFTER=2)
+    app.entered, app.leave = threading.Event(), threading.Event()
+
+    @app.route('/test/hold')
+    def hold():
+        app.entered.set()
+        app.leave.wait(5)
+        return jsonify({'held': True})
+
+    @app.route('/test/fail')
+    def fail():
+        raise RuntimeError('view failed')
+
+    return app
+
+
+def test_sheds_beyond_the_limit_but_not_metrics(app):
+    held = []
+    thread = threading.Thread(target=lambda: held.append(app.test_client().get('/test/hold')))
+    thread.start()
+    try:
+        assert app.entered.wait(5)
+        response = app.test_client().get('/api/v1/catalog/categories/')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert app.test_client().get('/metrics').status_code == 200
+    finally:
+        app.leave.set()
+        thread.join()
+    assert held[0].status_code == 200
+    assert app.test_client().get('/api/v1/catalog/categories/').status_code == 200
+
+
+def test_releases_the_slot_when_the_view_raises(app):
+    client = app.test_client()
+    with pytest.raises(RuntimeError):
+        client.get('/test/fail')
+    assert app.extensions['admission']['default'].active == 0
+    assert client.get('/api/v1/catalog/categories/').status_code == 200
+
+
+def test_off_by_default_outside_production(make_app):
+    assert 'admission' not in make_app().extensions
@@ -0,0 +1,38 @@
+"""
+Audit log: the append-only table sink
+"""
+import pytest
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import DatabaseError
+
+from flask_back_office.audit import AuditEvent, audit_log
+from flask_back_office.extensions import db
+
+PASSWORD = 'Password#123'
+
+
+def test_table_sink_writes_events_and_rejects_changes(make_app, tmp_path):
+    # A file, not :memory:, as the writer thread uses its own connection
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'audit.db'}",
+                   AUDIT_LOG_SINK='table', AUDIT_ACCESS_LOG=False)
+    client = app.test_client()
+    client.post('/api/v1/accounts/register/', json={
+        'email': 'audited@example.com', 'password': PASSWORD, 'full_name': 'Audited Member'
+    })
+    client.post('/api/v1/accounts/login/', json={'email': 'audited@example.com', 'password': 'wrong'})
+    client.post('/api/v1/accounts/login/', json={'email': 'audited@example.com', 'password': PASSWORD})
+    audit_log.flush()
+
+    with app.app_context():
+        events = db.session.scalars(select(AuditEvent).order_by(AuditEvent.id)).all()
+        assert [(event.action, event.outcome) for event in events] == [
+            ('auth.register', 'success'), ('auth.login', 'failure'), ('auth.login', 'success')
+        ]
+        assert events[1].details == '{"reason": "bad_password"}'
+        assert all(event.route and event.user_id for event in events)
+
+        for statement in (update(AuditEvent).values(outcome='success'), delete(AuditEvent)):
+            with pytest.raises(DatabaseError, match='append-only'):
+                db.session.execute(statement)
+            db.session.rollback()
+        assert db.session.scalar(select(db.func.count()).select_from(AuditEvent)) == 3
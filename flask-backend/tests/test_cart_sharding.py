@@ -0,0 +1,104 @@
+"""
+Cart sharding: ring placement, shard ids, id ranges and rebalancing across SQLite files
+"""
+from flask_back_office.cart.dao import CartDAO, CartItemDAO
+from flask_back_office.cart.models import Cart, CartItem
+from flask_back_office.cart.sharding import SHARD_ID_BITS, HashRing, cart_shards, shard_of_id
+from flask_back_office.extensions import db
+
+USERS = range(1, 301)
+
+
+def _sharded_app(make_app, tmp_path, shards, **settings):
+    binds = {f'cart_shard_{shard}': f'sqlite:///{tmp_path}/carts_{shard}.db' for shard in range(1, shards + 1)}
+    return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/primary.db', SQLALCHEMY_BINDS=binds, **settings)
+
+
+def test_adding_a_shard_only_moves_users_to_it():
+    before, after = HashRing([0, 1, 2]), HashRing([0, 1, 2, 3])
+    moved = 0
+    for user_id in range(10000):
+        old, new = before.shard_for(user_id), after.shard_for(user_id)
+        if old != new:
+            assert new == 3
+            moved += 1
+        # The ring without the new shard is the old one
+        assert after.shard_for(user_id, exclude=[3]) == old
+    assert 0.15 < moved / 10000 < 0.35
+
+
+def test_shard_round_trips_through_id_bits():
+    for shard in range(8):
+        for sequence in (1, 2, 12345, (1 << SHARD_ID_BITS) - 1):
+            assert shard_of_id((shard << SHARD_ID_BITS) + sequence) == shard
+    # Ids stay exact in JavaScript
+    assert (8 << SHARD_ID_BITS) < 2 ** 53
+
+
+def test_each_shard_numbers_ids_from_its_floor(make_app, tmp_path):
+    app = _sharded_app(make_app, tmp_path, shards=2)
+    with app.app_context():
+        # Creating again (every restart) keeps the sequences where they are
+        cart_shards.create_all()
+        carts = {}
+        for user_id in USERS:
+            shard = cart_shards.owner(user_id)
+            if shard not in carts:
+                cart = carts[shard] = CartDAO.create(user_id)
+                item = CartItemDAO.create(cart.id, plan_id=1)
+                assert shard_of_id(item.id) == shard
+        for session in [db.session(), *cart_shards.open_sessions()]:
+            session.commit()
+
+        assert sorted(carts) == [0, 1, 2]
+        assert carts[0].id == 1
+        for shard in (1, 2):
+            assert carts[shard].id == (shard << SHARD_ID_BITS) + 1
+            assert CartDAO.get_by_id(carts[shard].id).user_id == carts[shard].user_id
+        assert CartDAO.get_by_id((7 << SHARD_ID_BITS) + 1) is None
+        assert CartItemDAO.get_by_cart_and_plan((7 << SHARD_ID_BITS) + 1, 1) is None
+
+
+def _carts_by_shard(user_ids):
+    return {user_id: [(shard, cart.id) for shard in cart_shards.shards
+                      for cart in cart_shards.session(shard).scalars(db.select(Cart).where(Cart.user_id == user_id))]
+            for user_id in user_ids}
+
+
+def test_rebalance_moves_carts_and_items_to_the_new_shard(make_app, tmp_path):
+    app = _sharded_app(make_app, tmp_path, shards=1)
+    with app.app_context():
+        for user_id in USERS:
+            cart = CartDAO.create(user_id)
+            CartItemDAO.create(cart.id, plan_id=user_id % 7 + 1, quantity=2, billing_cycle='yearly')
+        for session in [db.session(), *cart_shards.open_sessions()]:
+            session.commit()
+
+    app = _sharded_app(make_app, tmp_path, shards=2, CART_SHARD_REBALANCE_PENDING=True)
+    with app.app_context():
+        moving = [user_id for user_id in USERS if cart_shards.owner(user_id) == 2]
+        assert moving and all(cart_shards.previous_owner(user_id) in (0, 1) for user_id in moving)
+        assert all(cart_shards.previous_owner(user_id) is None for user_id in USERS if user_id not in moving)
+        assert sorted(user_id for user_id, _, target in cart_shards.misplaced_users()) == moving
+        # Not moved yet, still found where it was
+        assert all(shard_of_id(CartDAO.get_active_cart(user_id).id) != 2 for user_id in moving)
+
+    result = app.test_cli_runner().invoke(args=['cart-shards', 'rebalance'])
+    assert result.exit_code == 0 and f'Moved {len(moving)} carts of {len(moving)} users' in result.output
+
+    with app.app_context():
+        assert list(cart_shards.misplaced_users()) == []
+        placed = _carts_by_shard(USERS)
+        for user_id in USERS:
+            [(shard, cart_id)] = placed[user_id]
+            assert shard == cart_shards.owner(user_id) == shard_of_id(cart_id)
+            cart = CartDAO.get_active_cart(user_id)
+            [item] = cart.items.all()
+            assert (item.plan_id, item.quantity, item.billing_cycle) == (user_id % 7 + 1, 2, 'yearly')
+            assert shard_of_id(item.id) == shard
+        assert cart_shards.session(2).scalar(db.select(db.func.count()).select_from(CartItem)) == len(moving)
+
+    # Once rebalanced, a user without a cart is looked for on its owner only
+    app = _sharded_app(make_app, tmp_path, shards=2)
+    with app.app_context():
+        assert cart_shards.previous_owner(moving[0]) is None
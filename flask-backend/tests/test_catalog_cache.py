@@ -0,0 +1,20 @@
+"""
+Catalog cache: the snapshot is kept until invalidated, expiring by TTL only without a cross-process bus
+"""
+import pytest
+
+from flask_back_office.catalog.cache import catalog_cache
+
+
+@pytest.mark.parametrize('transport, kept', [('table', True), ('memory', False)])
+def test_ttl_applies_only_without_a_cross_process_bus(make_app, transport, kept):
+    app = make_app(INVALIDATION_TRANSPORT=transport, CATALOG_CACHE_TTL=60)
+    with app.app_context():
+        # As preloaded by the gunicorn master a while ago
+        snapshot = catalog_cache.load()
+        snapshot.loaded_at -= 3600
+        assert (catalog_cache.get() is snapshot) is kept
+
+        current = catalog_cache.get()
+        catalog_cache.invalidate()
+        assert catalog_cache.get() is not current
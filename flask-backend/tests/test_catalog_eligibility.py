@@ -0,0 +1,106 @@
+"""
+Eligibility rules: validation, and compiled masks against evaluating each plan's rules
+"""
+import json
+import random
+
+import pytest
+
+from flask_back_office.catalog.cache import CatalogSnapshot
+from flask_back_office.catalog.eligibility import GENDERS, CompiledRules, parse_rules
+from flask_back_office.catalog.services import _customer
+
+
+@pytest.mark.parametrize('text', [
+    '[]', 'nope', '{"max_age": "45"}', '{"min_age": true}', '{"min_age": 50, "max_age": 40}',
+    '{"genders": ["female"]}', '{"genders": []}', '{"states": [" "]}', '{"pincodes": ["5600011"]}',
+    '{"pincodes": ["56a"]}', '{"pincodes": ["١٢"]}', '{"pre_existing": 0}', '{"min_income": 1}',
+])
+def test_parse_rules_rejects(text):
+    with pytest.raises(ValueError):
+        parse_rules(text)
+
+
+def test_parse_rules_accepts():
+    assert parse_rules(None) == {} and parse_rules('') == {}
+    rules = '{"min_age": 18, "max_age": 45, "genders": ["Female"], "states": ["Kerala"], "pincodes": ["6", "682001"]}'
+    assert parse_rules(rules) == json.loads(rules)
+
+
+def _random_rules(rng):
+    rules = {}
+    if rng.random() < 0.4:
+        rules['min_age'] = rng.randrange(0, 60)
+    if rng.random() < 0.4:
+        rules['max_age'] = rng.randrange(rules.get('min_age', 0), 100)
+    if rng.random() < 0.3:
+        rules['genders'] = rng.sample(GENDERS, rng.randrange(1, 3))
+    if rng.random() < 0.3:
+        rules['states'] = rng.sample(['Kerala', 'Karnataka', 'Goa', 'Delhi'], rng.randrange(1, 3))
+    if rng.random() < 0.3:
+        rules['pincodes'] = [str(rng.randrange(10 ** length, 10 ** (length + 1)))[:length + 1]
+                             for length in rng.sample(range(6), rng.randrange(1, 3))]
+    if rng.random() < 0.3:
+        rules['pre_existing'] = rng.random() < 0.5
+    return rules
+
+
+def _eligible(rules, features, age, gender, state, pincode, pre_existing, max_waiting_years):
+    if rules is None:
+        return False
+    waiting = json.loads(features or '{}').get('pre_existing_waiting_years', 0)
+    return ((age is None or rules.get('min_age', 0) <= age <= rules.get('max_age', 200))
+            and (gender is None or gender in rules.get('genders', GENDERS))
+            and (state is None or 'states' not in rules
+                 or state.strip().casefold() in {s.casefold() for s in rules['states']})
+            and (pincode is None or 'pincodes' not in rules
+                 or any(pincode.startswith(p) or p.startswith(pincode) for p in rules['pincodes']))
+            and (not pre_existing or rules.get('pre_existing', True))
+            and (max_waiting_years is None or waiting <= max_waiting_years))
+
+
+def test_masks_match_each_plans_rules():
+    rng = random.Random(5)
+    plans, all_rules = [], []
+    for plan in range(400):
+        rules = _random_rules(rng)
+        text = json.dumps(rules) if rules else None
+        if plan % 50 == 0:
+            # Malformed: offered to nobody
+            rules, text = None, '{"min_age": "ten"}'
+        features = json.dumps({'pre_existing_waiting_years': rng.choice([0, 1, 2, 4])}) if rng.random() < 0.7 else None
+        plans.append({'id': 7 * plan + 3, 'eligibility': text, 'features': features})
+        all_rules.append(rules)
+    rng.shuffle(plans)
+    compiled = CompiledRules(CatalogSnapshot([], plans))
+    by_id = {}
+    for plan in plans:
+        index = (plan['id'] - 3) // 7
+        by_id[plan['id']] = (all_rules[index], plan['features'])
+
+    for _ in range(300):
+        customer = {
+            'age': rng.choice([None, rng.randrange(0, 100)]),
+            'gender': rng.choice([None, *GENDERS]),
+            'state': rng.choice([None, 'kerala ', 'Goa', 'Punjab']),
+            'pincode': rng.choice([None, str(rng.randrange(100000, 1000000)), str(rng.randrange(1, 1000))]),
+            'pre_existing': rng.random() < 0.5,
+            'max_waiting_years': rng.choice([None, 0, 2]),
+        }
+        mask = compiled.mask(**customer)
+        expected = sorted(plan_id for plan_id, (rules, features) in by_id.items()
+                          if _eligible(rules, features, **customer))
+        assert compiled.plan_ids(mask) == expected, customer
+
+        refs = [plan['id'] for plan in rng.sample(plans, 50)]
+        assert compiled.select(refs, mask) == [ref for ref in refs if ref in set(expected)]
+
+
+@pytest.mark.parametrize('age', ['²', '٣', '4.5', '-1', 'ten'])
+def test_customer_rejects_ages_that_are_not_ascii_digits(age):
+    with pytest.raises(ValueError, match='age must be a whole number of years'):
+        _customer({'age': age})
+
+
+def test_customer_accepts_an_ascii_age():
+    assert _customer({'age': '42'}) == {'age': 42}
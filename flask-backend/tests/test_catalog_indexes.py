@@ -0,0 +1,102 @@
+"""
+Range indexes and search, against straightforward filtering and sorting
+"""
+import random
+
+import pytest
+
+from flask_back_office.catalog.cache import CatalogSnapshot, SharedCatalogSnapshot
+from flask_back_office.catalog.indexes import INDEXED_COLUMNS, SortedIndex, search
+from flask_back_office.catalog.models import HealthPlan
+from flask_back_office.catalog.table import CatalogTable
+
+
+def _entries(index):
+    return list(zip(index.values, index.refs))
+
+
+def test_changed_with_duplicate_values():
+    index = SortedIndex.build([5.0, 1.0, 5.0, 3.0, 5.0], [10, 11, 12, 13, 14])
+    assert list(index.values) == [1.0, 3.0, 5.0, 5.0, 5.0]
+
+    # The middle one of three equal values, a value moving, and a ref not in the index
+    changed = index.changed(removed=[(5.0, 12), (3.0, 13), (5.0, 99)], added=[(5.0, 15), (0.5, 13)])
+    assert list(changed.values) == [0.5, 1.0, 5.0, 5.0, 5.0]
+    assert sorted(_entries(changed)) == sorted([(0.5, 13), (1.0, 11), (5.0, 10), (5.0, 14), (5.0, 15)])
+    # Copies: the original is untouched
+    assert _entries(index) == _entries(SortedIndex.build([5.0, 1.0, 5.0, 3.0, 5.0], [10, 11, 12, 13, 14]))
+
+
+def test_changed_matches_a_rebuild():
+    rng = random.Random(7)
+    entries = {ref: float(rng.randrange(20)) for ref in range(200)}
+    index = SortedIndex.build(list(entries.values()), list(entries))
+    for _ in range(50):
+        refs = rng.sample(sorted(entries), 5)
+        removed = [(entries[ref], ref) for ref in refs]
+        for ref in refs:
+            entries[ref] = float(rng.randrange(20))
+        index = index.changed(removed=removed, added=[(entries[ref], ref) for ref in refs])
+        assert list(index.values) == sorted(entries.values())
+        assert sorted(_entries(index)) == sorted((value, ref) for ref, value in entries.items())
+
+
+def test_bounds_are_inclusive():
+    index = SortedIndex.build([1.0, 2.0, 2.0, 3.0], [1, 2, 3, 4])
+    assert index.bounds(2.0, 2.0) == (1, 3)
+    assert index.bounds(None, 1.5) == (0, 1)
+    assert index.bounds(3.5, None) == (4, 4)
+    assert index.bounds(3.0, 1.0) == (3, 3)
+
+
+def _plans(count, rng):
+    # Distinct values, so every sort order is fully determined
+    return [
+        {'id': 1000 + plan, 'category_id': 1, 'name': f'Plan {plan}', 'description': None,
+         'coverage_amount': round(rng.uniform(1e5, 5e6), 2), 'premium_monthly': round(rng.uniform(200, 5000), 3) + plan / 1e6,
+         'premium_yearly': round(rng.uniform(2000, 60000), 3) + plan / 1e6, 'features': None, 'eligibility': None,
+         'is_active': True}
+        for plan in rng.sample(range(count), count)
+    ]
+
+
+def _snapshots(plans, tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    CatalogTable.write(path, [], [HealthPlan(**plan) for plan in plans], 1.0)
+    return [CatalogSnapshot([], plans), SharedCatalogSnapshot(CatalogTable.open(path))]
+
+
+@pytest.mark.parametrize('sort', [None, *INDEXED_COLUMNS])
+def test_search_pages_match_a_scan(tmp_path, sort):
+    rng = random.Random(11)
+    plans = _plans(300, rng)
+    for snapshot in _snapshots(plans, tmp_path):
+        for _ in range(30):
+            ranges = {}
+            for column in rng.sample(INDEXED_COLUMNS, rng.randrange(len(INDEXED_COLUMNS) + 1)):
+                values = sorted(plan[column] for plan in plans)
+                low, high = sorted(rng.sample(values, 2))
+                ranges[column] = (rng.choice([low, None]), rng.choice([high, None]))
+            descending = sort is not None and rng.random() < 0.5
+            keep_even = rng.random() < 0.3
+
+            expected = [plan for plan in plans if all(
+                (low is None or plan[column] >= low) and (high is None or plan[column] <= high)
+                for column, (low, high) in ranges.items())]
+            if keep_even:
+                expected = [plan for plan in expected if plan['id'] % 2 == 0]
+            if sort is not None:
+                expected.sort(key=lambda plan: plan[sort], reverse=descending)
+
+            keep = None
+            if keep_even:
+                def keep(refs, snapshot=snapshot):
+                    return [ref for ref in refs if snapshot.plan_at(ref)['id'] % 2 == 0]
+            limit = rng.randrange(1, 40)
+            pages = []
+            for offset in range(0, len(expected) + limit, limit):
+                total, page = search(snapshot, ranges, sort=sort, descending=descending,
+                                     offset=offset, limit=limit, keep=keep)
+                assert total == len(expected)
+                pages.extend(plan['id'] for plan in page)
+            assert pages == [plan['id'] for plan in expected]
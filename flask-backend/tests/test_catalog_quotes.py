@@ -0,0 +1,148 @@
+"""
+Household quotes: the vectorised premiums against pricing each member and plan by hand
+"""
+import random
+from datetime import date
+
+import pytest
+
+from flask_back_office.catalog.cache import CatalogSnapshot
+from flask_back_office.catalog.quotes import (
+    AGE_BANDS, LOADINGS, PlanPrices, age_band, age_on, quote, quote_rows,
+)
+
+DATE_OF_BIRTH = '1979-03-04'
+
+
+def _factor(age, loadings):
+    band = max(index for index, (floor, _) in enumerate(AGE_BANDS) if floor <= age)
+    return AGE_BANDS[band][1] * (1 + sum(LOADINGS[loading] for loading in set(loadings)))
+
+
+def _reference(plans, plan_ids, members):
+    """Quote rows priced one member and plan at a time"""
+    by_id = {plan['id']: plan for plan in plans}
+    rows = []
+    for plan_id in plan_ids:
+        plan = by_id.get(plan_id)
+        if plan is None:
+            continue
+        premiums, monthly_total, yearly_total, yearly_factors = [], 0, 0, 0
+        for member in members:
+            factor = _factor(member['age'], member.get('loadings', []))
+            if member.get('billing_cycle') == 'yearly':
+                premium = round(plan['premium_yearly'] * factor, 2)
+                yearly_total += premium
+                yearly_factors += factor
+            else:
+                premium = round(plan['premium_monthly'] * factor, 2)
+                monthly_total += premium
+            premiums.append(premium)
+        rows.append({
+            'plan_id': plan_id,
+            'member_premiums': premiums,
+            'monthly_total': round(monthly_total, 2),
+            'yearly_total': round(yearly_total, 2),
+            'annual_cost': round(12 * monthly_total + yearly_total, 2),
+            'yearly_discount': round((12 * plan['premium_monthly'] - plan['premium_yearly']) * yearly_factors, 2),
+        })
+    return rows
+
+
+def _assert_rows(rows, expected):
+    assert [row['plan_id'] for row in rows] == [row['plan_id'] for row in expected]
+    for row, want in zip(rows, expected):
+        # np.round and round() may put a half cent on either side: a cent per rounded premium
+        cents = 0.01 * len(want['member_premiums']) + 1e-6
+        assert row['member_premiums'] == pytest.approx(want['member_premiums'], abs=0.01 + 1e-6)
+        for key in ('monthly_total', 'yearly_total', 'annual_cost'):
+            assert row[key] == pytest.approx(want[key], abs=12 * cents if key == 'annual_cost' else cents), key
+        assert row['yearly_discount'] == pytest.approx(want['yearly_discount'], abs=0.01 + 1e-6)
+
+
+def test_quote_matches_scalar_pricing():
+    rng = random.Random(3)
+    plans = [{'id': plan_id, 'premium_monthly': rng.randrange(200, 5000) + rng.random(),
+              'premium_yearly': 0} for plan_id in rng.sample(range(1, 10000), 300)]
+    for plan in plans:
+        plan['premium_yearly'] = round(plan['premium_monthly'] * rng.uniform(10, 12), 2)
+    prices = PlanPrices(CatalogSnapshot([], plans))
+
+    for _ in range(50):
+        members = [{'age': rng.randrange(0, 121), 'billing_cycle': rng.choice(['monthly', 'yearly']),
+                    'loadings': rng.sample(list(LOADINGS) * 2, rng.randrange(0, 4))}
+                   for _ in range(rng.randrange(1, 11))]
+        plan_ids = [plan['id'] for plan in rng.sample(plans, 20)] + [10001, 0]
+        rng.shuffle(plan_ids)
+
+        result = quote(prices, plan_ids, [member['age'] for member in members],
+                       [member['billing_cycle'] == 'yearly' for member in members],
+                       [sum(LOADINGS[loading] for loading in set(member['loadings'])) for member in members])
+
+        _assert_rows(quote_rows(result), _reference(plans, plan_ids, members))
+        assert sorted(result['missing'].tolist()) == [0, 10001]
+
+
+@pytest.mark.parametrize('age, band', [(0, '0-17'), (17, '0-17'), (18, '18-25'), (35, '26-35'), (36, '36-45'),
+                                       (70, '66-70'), (71, '71+'), (120, '71+')])
+def test_age_bands(age, band):
+    assert age_band(age) == band
+
+
+def _plans(client, headers):
+    category_id = client.post('/api/v1/catalog/categories/', headers=headers,
+                              json={'name': 'Family'}).get_json()['category']['id']
+    plans = []
+    for tier in range(3):
+        response = client.post('/api/v1/catalog/plans/', headers=headers, json={
+            'category_id': category_id, 'name': f'Family Tier {tier}', 'coverage_amount': 300000 * (tier + 1),
+            'premium_monthly': 512.5 + 100 * tier, 'premium_yearly': (512.5 + 100 * tier) * 11,
+        })
+        assert response.status_code == 201, response.get_json()
+        plans.append(response.get_json()['plan'])
+    return plans
+
+
+def test_quote_endpoint(client, auth_headers):
+    plans = _plans(client, auth_headers)
+    assert client.put('/api/v1/accounts/profile/', headers=auth_headers,
+                      json={'date_of_birth': DATE_OF_BIRTH}).status_code == 200
+    plan_ids = [plans[2]['id'], 987654, plans[0]['id']]
+    members = [{'relation': 'self', 'loadings': ['tobacco', 'tobacco']},
+               {'age': 8, 'billing_cycle': 'yearly'},
+               {'date_of_birth': '1950-01-01', 'billing_cycle': 'yearly', 'loadings': ['pre_existing']}]
+
+    response = client.post('/api/v1/catalog/quotes/', headers=auth_headers,
+                           json={'plan_ids': plan_ids, 'members': members})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+
+    today = date.today()
+    ages = [age_on(date.fromisoformat(DATE_OF_BIRTH), today), 8, age_on(date(1950, 1, 1), today)]
+    assert [member['age'] for member in body['members']] == ages
+    assert [member['billing_cycle'] for member in body['members']] == ['monthly', 'yearly', 'yearly']
+    assert body['missing_plan_ids'] == [987654]
+    priced = [{**member, 'age': age} for member, age in zip(members, ages)]
+    _assert_rows(body['quotes'], _reference(plans, plan_ids, priced))
+    assert all(row['yearly_discount'] > 0 for row in body['quotes'])
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'members': [{'age': 30}]}, 'plan_ids'),
+    ({'plan_ids': [1], 'members': []}, 'members'),
+    ({'plan_ids': [1], 'members': [{'relation': 'self'}]}, 'sign in'),
+    ({'plan_ids': [1], 'members': [{'age': 121}]}, 'between 0 and'),
+    ({'plan_ids': [1], 'members': [{'age': 30, 'billing_cycle': 'weekly'}]}, 'billing_cycle'),
+    ({'plan_ids': [1], 'members': [{'age': 30, 'loadings': ['skydiving']}]}, 'loadings'),
+])
+def test_quote_rejects(client, payload, error):
+    response = client.post('/api/v1/catalog/quotes/', json=payload)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def test_relation_self_needs_a_date_of_birth(client, auth_headers):
+    response = client.post('/api/v1/catalog/quotes/', headers=auth_headers,
+                           json={'plan_ids': [1], 'members': [{'relation': 'self'}]})
+    assert response.status_code == 400
+    assert 'add date_of_birth' in response.get_json()['error']
@@ -0,0 +1,53 @@
+"""
+Pincode serviceability: index lookups against scanning every plan's prefixes
+"""
+import random
+
+import pytest
+
+from flask_back_office.catalog.serviceability import PINCODE_LENGTH, ServiceabilityIndex, is_pincode_prefix
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('5', True), ('560001', True), ('000000', True), ('', False), ('5600011', False),
+    ('56a', False), (' 56', False), ('²', False), ('١٢', False),
+])
+def test_is_pincode_prefix(value, expected):
+    assert is_pincode_prefix(value) is expected
+
+
+def _prefix(rng, length):
+    return ''.join(rng.choice('0123456') for _ in range(length))
+
+
+def _served(plan_prefixes, prefix):
+    # Unrestricted, naming an ancestor (or the prefix itself), or a pincode somewhere under it
+    return plan_prefixes is None or any(p.startswith(prefix) or prefix.startswith(p) for p in plan_prefixes)
+
+
+def test_mask_matches_prefix_scan():
+    rng = random.Random(7)
+    plans = []
+    for _ in range(500):
+        if rng.random() < 0.2:
+            plans.append(None)
+        else:
+            prefixes = [_prefix(rng, rng.randint(1, PINCODE_LENGTH)) for _ in range(rng.randint(1, 4))]
+            plans.append(prefixes + prefixes[:1])  # a duplicate counts once
+    index = ServiceabilityIndex(plans)
+
+    for _ in range(500):
+        prefix = _prefix(rng, rng.randint(1, PINCODE_LENGTH))
+        assert index.mask(prefix).tolist() == [_served(plan, prefix) for plan in plans], prefix
+
+
+def test_mask_rollup_and_edges():
+    index = ServiceabilityIndex([['560001'], ['5601'], ['56'], ['0'], ['999999'], None])
+    assert index.mask('5').tolist() == [True, True, True, False, False, True]
+    assert index.mask('5600').tolist() == [True, False, True, False, False, True]
+    assert index.mask('560002').tolist() == [False, False, True, False, False, True]
+    assert index.mask('000123').tolist() == [False, False, False, True, False, True]
+    assert index.mask('9').tolist() == [False, False, False, False, True, True]
+
+    assert ServiceabilityIndex([]).mask('5').tolist() == []
+    assert ServiceabilityIndex([None, None]).mask('123456').tolist() == [True, True]
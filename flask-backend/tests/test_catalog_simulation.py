@@ -0,0 +1,79 @@
+"""
+Out-of-pocket simulation: the closed form against the scenarios x plans matrix, and plan ordering
+"""
+import json
+import math
+
+import numpy as np
+import pytest
+
+from flask_back_office.catalog.cache import CatalogSnapshot
+from flask_back_office.catalog.quotes import AGE_FACTORS, LOADINGS
+from flask_back_office.catalog.simulation import (
+    PERCENTILES, PRE_EXISTING_SHARE, ClaimModel, PlanTerms, Scenarios, age_band_index, simulate,
+)
+
+
+def _matrix(years, coverage, copay, uncovered):
+    """Each scenario's out-of-pocket on each plan, computed cell by cell"""
+    claims = years[:, None]
+    return uncovered * claims + np.maximum(copay * (1 - uncovered) * claims, (1 - uncovered) * claims - coverage)
+
+
+@pytest.mark.parametrize('severity', ['lognormal', 'gamma'])
+def test_out_of_pocket_matches_matrix(severity):
+    rng = np.random.default_rng(11)
+    years = ClaimModel(severity).years(rng, band=7, pre_existing=True, scenarios=5000)
+    plans = 200
+    coverage = rng.choice([1e5, 3e5, 5e5, 1e6, 1e7], plans)
+    copay = rng.choice([0, 0.1, 0.2, 0.5, 1], plans)
+    uncovered = rng.choice([0, PRE_EXISTING_SHARE], plans)
+
+    result = Scenarios(years).out_of_pocket(coverage, copay, uncovered)
+    matrix = _matrix(years, coverage, copay, uncovered)
+
+    assert np.allclose(result['mean'], matrix.mean(axis=0), rtol=1e-9, atol=1e-6)
+    ranks = [max(math.ceil(p / 100 * len(years)) - 1, 0) for p in PERCENTILES]
+    assert np.allclose(result['percentiles'], np.sort(matrix, axis=0)[ranks], rtol=1e-9, atol=1e-6)
+    exceeds = ((1 - uncovered) * (1 - copay) * years[:, None] >= coverage).mean(axis=0)
+    assert np.array_equal(result['exceeds_cover'], exceeds)
+
+
+def test_scenarios_are_reproducible():
+    model = ClaimModel()
+    first = model.years(np.random.default_rng(3), 2, False, 1000)
+    assert np.array_equal(first, model.years(np.random.default_rng(3), 2, False, 1000))
+    assert (first >= 0).all() and (first == 0).any()
+
+
+def _plan(plan_id, coverage, premium, copay=0, waiting=0):
+    features = json.dumps({'copay_percent': copay, 'pre_existing_waiting_years': waiting})
+    return {'id': plan_id, 'coverage_amount': coverage, 'premium_yearly': premium, 'features': features}
+
+
+@pytest.mark.parametrize('pre_existing', [False, True])
+def test_simulate_orders_by_expected_annual_cost(pre_existing):
+    plans = [_plan(30, 1e5, 9000), _plan(10, 1e6, 15000, copay=20), _plan(20, 5e5, 12000, waiting=2),
+             _plan(40, 5e6, 30000), _plan(50, 3e5, 8000, copay=50, waiting=4)]
+    terms = PlanTerms(CatalogSnapshot([], plans))
+    years = ClaimModel().years(np.random.default_rng(1), 8, pre_existing, 20000)
+    band = age_band_index(62)
+
+    result = simulate(terms, Scenarios(years), [50, 99, 10, 30, 20, 40], band, pre_existing)
+
+    assert result['missing'].tolist() == [99]
+    by_id = {plan['id']: plan for plan in plans}
+    expected = []
+    for plan_id in (50, 10, 30, 20, 40):
+        plan, features = by_id[plan_id], json.loads(by_id[plan_id]['features'])
+        uncovered = PRE_EXISTING_SHARE if pre_existing and features['pre_existing_waiting_years'] else 0
+        cost = _matrix(years, plan['coverage_amount'], features['copay_percent'] / 100, uncovered).mean()
+        loading = LOADINGS['pre_existing'] if pre_existing else 0
+        premium = round(plan['premium_yearly'] * AGE_FACTORS[band] * (1 + loading), 2)
+        expected.append((premium + cost, plan_id, premium))
+    expected.sort()
+
+    assert result['plan_ids'].tolist() == [plan_id for _, plan_id, _ in expected]
+    assert result['premiums'].tolist() == [premium for _, _, premium in expected]
+    assert np.allclose(result['expected_annual_cost'], [cost for cost, _, _ in expected], atol=0.01)
+    assert (np.diff(result['expected_annual_cost']) >= 0).all()
@@ -0,0 +1,70 @@
+"""
+Typeahead suggestions: matching, ranking and the precomputed short prefixes
+"""
+import random
+
+from flask_back_office.catalog.cache import CatalogSnapshot
+from flask_back_office.catalog.suggest import MAX_LIMIT, MAX_WORDS, SuggestIndex, normalize
+
+
+def _snapshot(names, categories=()):
+    plans = [{'id': plan_id, 'category_id': category_id, 'name': name}
+             for plan_id, (category_id, name) in enumerate(names, start=1)]
+    return CatalogSnapshot([{'id': category_id, 'name': name} for category_id, name in categories], plans)
+
+
+def _names(results):
+    return [result['name'] for result in results]
+
+
+def test_normalize():
+    assert normalize('  Sénior-Citizen_PLUS (Ⅱ)! ') == 'senior citizen plus ii'
+
+
+def test_matches_any_word_to_the_end_of_the_name():
+    index = SuggestIndex.build(_snapshot([(1, 'Family Floater Gold'), (1, 'Gold Shield')],
+                                         categories=[(1, 'Family Floater')]), {})
+    assert set(_names(index.suggest('gol', 10))) == {'Family Floater Gold', 'Gold Shield'}
+    assert set(_names(index.suggest('FAMILY f', 10))) == {'Family Floater Gold', 'Family Floater'}
+    assert _names(index.suggest('floater g', 10)) == ['Family Floater Gold']
+    assert index.suggest('silver', 10) == [] and index.suggest(' - ', 10) == []
+
+
+def test_ranking():
+    snapshot = _snapshot([(1, 'Gold Plus Family'), (1, 'Family Gold'), (1, 'Gold'), (2, 'Goldilocks Long Name')],
+                         categories=[(1, 'Gold Plans'), (2, 'Others')])
+    # Without popularity: names starting with the prefix, shorter first
+    index = SuggestIndex.build(snapshot, {})
+    assert _names(index.suggest('gold', 10)) == [
+        'Gold', 'Gold Plans', 'Gold Plus Family', 'Goldilocks Long Name', 'Family Gold']
+    # Popular plans first; a category weighs as much as its plans together
+    index = SuggestIndex.build(snapshot, {2: 5, 4: 3})
+    assert _names(index.suggest('gold', 3)) == ['Gold Plans', 'Family Gold', 'Goldilocks Long Name']
+    assert [result['type'] for result in index.suggest('gold plans', 1)] == ['category']
+
+
+def _naive(entries, weights, prefix, limit):
+    prefix = normalize(prefix)
+    matches = []
+    for entry, (_, _, name) in enumerate(entries):
+        words = normalize(name).split(' ')
+        suffixes = [' '.join(words[word:]) for word in range(min(len(words), MAX_WORDS))]
+        if any(suffix.startswith(prefix) for suffix in suffixes):
+            matches.append(((weights[entry], suffixes[0].startswith(prefix), -len(name), name), entry))
+    return [entries[entry][2] for _, entry in sorted(matches, reverse=True)[:limit]]
+
+
+def test_precomputed_and_long_prefixes_match_a_scan():
+    rng = random.Random(3)
+    words = ['gold', 'silver', 'family', 'floater', 'senior', 'care', 'go', 'plus', 'shield', 'sure', 'a']
+    names = {' '.join(rng.choice(words).title() for _ in range(rng.randrange(1, 9))) for _ in range(400)}
+    snapshot = _snapshot([(rng.randrange(1, 6), name) for name in sorted(names)],
+                         categories=[(category, f'Category {category}') for category in range(1, 6)])
+    index = SuggestIndex.build(snapshot, {plan_id: rng.randrange(4) for plan_id in range(1, len(names) + 1)})
+
+    prefixes = set(index.ranked) | {'gold s', 'fl', 'family floater', 'sure a', 'category 3', 'zz'}
+    for prefix in sorted(prefixes):
+        for limit in (1, 7, MAX_LIMIT):
+            assert _names(index.suggest(prefix, limit)) == _naive(index.entries, index.weights, prefix, limit), prefix
+    assert {'g', 'go', 's', 'si'} <= set(index.ranked)
+    assert all(len(ranked) <= MAX_LIMIT for ranked in index.ranked.values())
@@ -0,0 +1,103 @@
+"""
+Catalog table: the memory-mapped layout reads back what was written
+"""
+import struct
+import threading
+
+import pytest
+
+from flask_back_office.catalog.cache import SharedCatalogSnapshot
+from flask_back_office.catalog.models import HealthPlan, PlanCategory
+from flask_back_office.catalog.table import CatalogTable, file_lock, load
+
+
+def _catalog():
+    categories = [
+        PlanCategory(id=1, name='Family Floater', description='Whole family, one sum insured', is_active=True),
+        PlanCategory(id=2, name='Retired', description=None, is_active=False),
+        PlanCategory(id=5, name='Sénior Citizen', description='Family Floater', is_active=True),
+    ]
+    plans = [
+        HealthPlan(id=10, category=categories[0], category_id=1, name='Family Gold', description=None,
+                   coverage_amount=1000000.0, premium_monthly=1250.5, premium_yearly=13500.0,
+                   features='{"room_rent": "single"}', eligibility='{"pincodes": ["560"]}', is_active=True),
+        # Owned by an inactive category, and sharing strings with other rows
+        HealthPlan(id=11, category=categories[1], category_id=2, name='Family Floater', description='Family Floater',
+                   coverage_amount=300000.0, premium_monthly=400.0, premium_yearly=4400.0,
+                   features=None, eligibility=None, is_active=True),
+        HealthPlan(id=42, category=categories[2], category_id=5, name='Sénior Care 🙂', description='',
+                   coverage_amount=500000.0, premium_monthly=400.0, premium_yearly=4200.0,
+                   features='{}', eligibility='{"min_age": 60}', is_active=True),
+    ]
+    return categories, plans
+
+
+def test_round_trip(tmp_path):
+    categories, plans = _catalog()
+    path = str(tmp_path / 'catalog.bin')
+    CatalogTable.write(path, categories, plans, built_at=1234.5)
+    table = CatalogTable.open(path)
+
+    assert (table.built_at, table.category_count, table.plan_count) == (1234.5, 3, 3)
+    assert [table.category_dict(row) for row in range(3)] == [category.to_dict() for category in categories]
+    assert [table.plan_dict(row) for row in range(3)] == [plan.to_dict() for plan in plans]
+    # Each distinct string once
+    strings = {value for plan in plans for value in (plan.name, plan.description, plan.features, plan.eligibility)}
+    strings |= {value for category in categories for value in (category.name, category.description)}
+    assert len(table._string_offsets) - 1 == len(strings - {None})
+
+    snapshot = SharedCatalogSnapshot(table)
+    assert snapshot.categories == [categories[0].to_dict(), categories[2].to_dict()]
+    assert snapshot.plan_names() == [(10, 1, 'Family Gold'), (11, 2, 'Family Floater'), (42, 5, 'Sénior Care 🙂')]
+    index = table.indexes['premium_monthly']
+    assert list(index.values) == [400.0, 400.0, 1250.5]
+    assert sorted(index.refs[:2]) == [1, 2] and index.refs[2] == 0
+
+
+def test_empty_catalog(tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    CatalogTable.write(path, [], [], built_at=1.0)
+    table = CatalogTable.open(path)
+    assert (table.category_count, table.plan_count) == (0, 0)
+    assert SharedCatalogSnapshot(table).plans == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'catalog.bin'
+    path.write_bytes(b'HCCATLG2' + bytes(64))
+    with pytest.raises(ValueError):
+        CatalogTable.open(str(path))
+    path.write_bytes(b'short')
+    with pytest.raises(struct.error):
+        CatalogTable.open(str(path))
+
+
+def test_load_rebuilds_only_when_stale(app, tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    categories, plans = _catalog()
+    CatalogTable.write(path, categories, plans, built_at=100.0)
+    with app.app_context():
+        # Built after the last change: mapped as it is
+        assert load(path, newer_than=50.0).plan_count == 3
+        # Older: rebuilt from the (empty) database
+        rebuilt = load(path, newer_than=150.0)
+        assert rebuilt.plan_count == 0 and rebuilt.built_at > 150.0
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    path = str(tmp_path / 'catalog.lock')
+    events = []
+
+    def other():
+        with file_lock(path):
+            events.append('other')
+
+    with file_lock(path):
+        thread = threading.Thread(target=other)
+        thread.start()
+        # Each holder opens the file itself, as another worker process would
+        thread.join(0.2)
+        assert thread.is_alive()
+        events.append('first')
+    thread.join(5)
+    assert events == ['first', 'other']
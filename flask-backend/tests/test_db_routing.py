@@ -0,0 +1,71 @@
+"""
+Read-replica routing: safe-method reads on a replica, writes and pinned clients on the primary
+"""
+import shutil
+
+import pytest
+from sqlalchemy import event, select
+
+from flask_back_office.catalog.models import PlanCategory
+from flask_back_office.extensions import db
+
+PASSWORD = 'Password#123'
+PIN_COOKIE = 'db_pin_primary'
+
+
+@pytest.fixture
+def routed(make_app, tmp_path):
+    """An app on a primary and one replica file, and the databases each statement went to"""
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+                   SQLALCHEMY_BINDS={'replica_0': f"sqlite:///{tmp_path / 'replica.db'}"})
+    used = []
+    with app.app_context():
+        for name, engine in (('primary', db.engines[None]), ('replica', db.engines['replica_0'])):
+            event.listen(engine, 'before_cursor_execute',
+                         lambda *args, name=name: used.append(name))
+    return app, used
+
+
+def test_get_reads_from_the_replica_until_the_request_writes(routed):
+    app, _ = routed
+    with app.test_request_context('/api/v1/catalog/categories/', method='GET'):
+        app.preprocess_request()
+        assert db.session.get_bind(clause=select(PlanCategory)) is db.engines['replica_0']
+
+        db.session.add(PlanCategory(name='Family'))
+        db.session.flush()
+        assert db.session.get_bind(clause=select(PlanCategory)) is db.engines[None]
+        db.session.rollback()
+
+
+@pytest.mark.parametrize('method', ['POST', 'PUT', 'PATCH', 'DELETE'])
+def test_unsafe_methods_read_from_the_primary(routed, method):
+    app, _ = routed
+    with app.test_request_context('/api/v1/catalog/categories/', method=method):
+        app.preprocess_request()
+        assert db.session.get_bind(clause=select(PlanCategory)) is db.engines[None]
+
+
+def test_a_write_pins_the_client_to_the_primary(routed, tmp_path):
+    app, used = routed
+    client = app.test_client()
+    response = client.post('/api/v1/accounts/register/', json={
+        'email': 'pinned@example.com', 'password': PASSWORD, 'full_name': 'Pinned Member'
+    })
+    assert response.status_code == 201
+    assert f'{PIN_COOKIE}=1' in response.headers['Set-Cookie']
+    response = client.post('/api/v1/accounts/login/', json={'email': 'pinned@example.com', 'password': PASSWORD})
+    headers = {'Authorization': f"Bearer {response.get_json()['access']}"}
+    # The replica catches up
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+
+    # Read-your-writes: the next request still reads from the primary
+    used.clear()
+    assert client.get('/api/v1/accounts/profile/', headers=headers).status_code == 200
+    assert used and set(used) == {'primary'}
+
+    # Once the pin has expired reads go to the replica
+    client.delete_cookie(PIN_COOKIE)
+    used.clear()
+    assert client.get('/api/v1/accounts/profile/', headers=headers).status_code == 200
+    assert used and set(used) == {'replica'}
@@ -0,0 +1,80 @@
+"""
+Idempotency keys: replays, body mismatches, key scope and unstored failures, for both stores
+"""
+import pytest
+from flask import jsonify
+
+STORES = ['memory', 'sql']
+
+
+@pytest.fixture(params=STORES)
+def counted(request, make_app):
+    """A client, and how often each test view ran"""
+    app = make_app(IDEMPOTENCY_STORE=request.param)
+    calls = []
+
+    @app.route('/test/echo/<name>', methods=['POST', 'PUT'])
+    def echo(name):
+        calls.append(name)
+        return jsonify({'name': name, 'call': len(calls)}), 201
+
+    @app.route('/test/fail', methods=['POST'])
+    def fail():
+        calls.append('fail')
+        return jsonify({'error': 'unavailable'}), 503
+
+    return app.test_client(), calls
+
+
+def _post(client, path='/test/echo/a', key='key-1', body=None, method='post', **headers):
+    return getattr(client, method)(path, json=body or {'x': 1}, headers={'Idempotency-Key': key, **headers})
+
+
+def test_same_key_and_body_replays_the_stored_response(counted):
+    client, calls = counted
+    first = _post(client)
+    second = _post(client)
+    assert calls == ['a']
+    assert (second.status_code, second.get_json()) == (first.status_code, first.get_json()) == (201, {'name': 'a', 'call': 1})
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+
+
+def test_same_key_with_a_different_body_is_rejected(counted):
+    client, calls = counted
+    _post(client, body={'x': 1})
+    response = _post(client, body={'x': 2})
+    assert response.status_code == 422
+    assert 'different request' in response.get_json()['error']
+    assert calls == ['a']
+
+
+@pytest.mark.parametrize('other', [
+    {'Authorization': 'Bearer someone-else'},
+    {'method': 'put'},
+    {'path': '/test/echo/b'},
+])
+def test_keys_are_scoped_to_caller_method_and_path(counted, other):
+    client, calls = counted
+    _post(client, Authorization='Bearer someone')
+    headers = {'Authorization': 'Bearer someone', **other}
+    response = _post(client, **headers)
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert len(calls) == 2
+
+
+def test_server_errors_are_not_stored(counted):
+    client, calls = counted
+    assert _post(client, path='/test/fail').status_code == 503
+    response = _post(client, path='/test/fail')
+    assert response.status_code == 503
+    assert 'Idempotent-Replayed' not in response.headers
+    assert calls == ['fail', 'fail']
+
+
+def test_requests_without_a_key_always_run(counted):
+    client, calls = counted
+    client.post('/test/echo/a', json={'x': 1})
+    client.post('/test/echo/a', json={'x': 1})
+    assert calls == ['a', 'a']
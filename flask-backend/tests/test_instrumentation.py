@@ -0,0 +1,33 @@
+"""
+SQL instrumentation and the slow query log: query timing survives failed statements
+"""
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from flask_back_office.extensions import db
+from flask_back_office.instrumentation import track_queries
+
+
+def test_failed_statements_leave_no_start_time(app):
+    with app.app_context(), db.engine.connect() as conn:
+        started = time.perf_counter()
+        with track_queries() as stats:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.exec_driver_sql('SELECT * FROM no_such_table')
+            conn.exec_driver_sql('SELECT 1')
+
+        assert not conn.info.get('query_start_time')
+        assert stats.count == 1
+        assert 0 <= stats.duration <= time.perf_counter() - started
+
+
+def test_slow_query_log_drops_failed_statements(make_app):
+    app = make_app(SLOW_QUERY_LOG=True, SLOW_QUERY_THRESHOLD_MS=10000)
+    with app.app_context(), db.engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql('SELECT * FROM no_such_table')
+        conn.exec_driver_sql('SELECT 1')
+        assert not conn.info.get('slow_query_start')
@@ -0,0 +1,86 @@
+"""
+Cache invalidation bus: delivery between processes, simulated by several
+buses on one MemoryHub, and the version-table transport
+"""
+import time
+
+from flask_back_office.invalidation import (
+    InvalidationBus, MemoryHub, MemoryTransport, Message, VersionTableTransport
+)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def _bus(app, origin, transport, poll_interval=0.05, max_lag=1.0):
+    bus = InvalidationBus(origin=origin)
+    bus.configure(transport, poll_interval, max_lag)
+    bus.start(app)
+    return bus
+
+
+def test_memory_hub_delivers_to_other_buses_once(app):
+    hub = MemoryHub()
+    sender = _bus(app, 'worker-1', MemoryTransport(hub))
+    receiver = _bus(app, 'worker-2', MemoryTransport(hub))
+    sent, received = [], []
+    sender.subscribe('catalog', sent.append)
+    receiver.subscribe('catalog', received.append)
+    try:
+        sender.publish({'catalog': {3, 1}, 'users': None})
+        assert _wait_for(lambda: received)
+        assert received == [frozenset({1, 3})]
+        # Delivered locally as it is published; its copy back from the hub is skipped
+        time.sleep(0.2)
+        assert sent == [frozenset({1, 3})]
+
+        sender.publish({'catalog': set(range(500))})
+        assert _wait_for(lambda: len(received) == 2)
+        assert received[1] is None
+    finally:
+        sender.stop()
+        receiver.stop()
+
+
+def test_healthy_turns_false_when_the_transport_fails(app):
+    class FailingTransport(MemoryTransport):
+        durable = False
+
+        def receive(self, timeout):
+            raise ConnectionError('transport down')
+
+    healthy_bus = _bus(app, 'worker-1', MemoryTransport(), max_lag=0.3)
+    failing_bus = _bus(app, 'worker-2', FailingTransport(), max_lag=0.3)
+    try:
+        assert failing_bus.healthy()
+        assert _wait_for(lambda: not failing_bus.healthy())
+        assert healthy_bus.healthy()
+    finally:
+        healthy_bus.stop()
+        failing_bus.stop()
+
+
+def test_version_table_reports_each_version_or_a_gap(app):
+    def receive(transport):
+        return sorted((message.topic, message.origin, message.keys) for message in transport.receive(0))
+
+    with app.app_context():
+        transport = VersionTableTransport(poll_interval=0, since=time.time())
+        # Published before the first poll: news, from an unknown publisher
+        transport.send([Message('catalog', 'worker-1', time.time(), [7])])
+        assert receive(transport) == [('catalog', None, None)]
+        assert receive(transport) == []
+
+        # One version since the last poll: its publisher and keys
+        transport.send([Message('catalog', 'worker-1', time.time(), [8, 9])])
+        assert receive(transport) == [('catalog', 'worker-1', [8, 9])]
+
+        # Several: only that something changed; a topic new to the table starts at version 1
+        transport.send([Message('catalog', 'worker-1', time.time(), [10])])
+        transport.send([Message('catalog', 'worker-2', time.time(), [11])])
+        transport.send([Message('users', 'worker-2', time.time(), None)])
+        assert receive(transport) == [('catalog', None, None), ('users', 'worker-2', None)]
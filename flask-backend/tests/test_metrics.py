@@ -0,0 +1,56 @@
+"""
+Metrics registry: multiprocess scrapes and per-process callback gauges
+"""
+import json
+import os
+
+from flask_back_office.metrics import MetricsRegistry
+
+
+def _other_worker(directory, pid, rows):
+    with open(os.path.join(directory, f'metrics_{pid}.json'), 'w') as fh:
+        json.dump(rows, fh)
+
+
+def test_scrape_sums_flushed_files_only(tmp_path):
+    registry = MetricsRegistry()
+    registry.configure(multiproc_dir=str(tmp_path), flush_interval=3600)
+    requests = registry.counter('requests_total', 'Requests', ['route'])
+    limit = {'value': 3}
+    registry.gauge_callback('limit', 'Limit per class', ['class'], lambda: {('default',): limit['value']})
+
+    # Another live worker (our parent) flushed earlier
+    other = os.getppid()
+    _other_worker(tmp_path, other, [['requests_total', ['/'], 5], ['limit', ['default', str(other)], 3]])
+    requests.inc('/', amount=2)
+
+    values = registry.collect_all()
+    assert values[('requests_total', ('/',))] == 7
+    # The scraping worker's own file is current, so the next scrape from any worker agrees
+    with open(tmp_path / f'metrics_{os.getpid()}.json') as fh:
+        assert ['requests_total', ['/'], 2] in json.load(fh)
+    # Callback gauges are not summed across workers
+    assert values[('limit', ('default', str(os.getpid())))] == 3
+    assert values[('limit', ('default', str(other)))] == 3
+    assert 'limit{class="default",pid="%d"} 3' % os.getpid() in registry.render()
+
+
+def test_dead_workers_keep_counters_not_gauges(tmp_path):
+    registry = MetricsRegistry()
+    registry.configure(multiproc_dir=str(tmp_path), flush_interval=3600)
+    registry.counter('requests_total', 'Requests', ['route'])
+    registry.gauge_callback('depth', 'Queue depth', [], lambda: {(): 1})
+
+    dead = 2 ** 22 + 12345
+    _other_worker(tmp_path, dead, [['requests_total', ['/'], 4], ['depth', [str(dead)], 9]])
+
+    values = registry.collect_all()
+    assert values[('requests_total', ('/',))] == 4
+    assert ('depth', (str(dead),)) not in values
+    assert values[('depth', (str(os.getpid()),))] == 1
+
+
+def test_without_multiproc_dir_reads_this_process():
+    registry = MetricsRegistry()
+    registry.gauge('in_flight', 'In flight').inc()
+    assert registry.collect_all() == {('in_flight', ()): 1}
@@ -0,0 +1,61 @@
+"""
+Every endpoint stays within its @query_budget (strict under TestingConfig)
+"""
+import pytest
+
+from flask_back_office.instrumentation import QueryBudgetExceeded, query_budget
+from flask_back_office.accounts.models import User
+
+
+def test_customer_journey_within_budgets(client, auth_headers):
+    headers = auth_headers
+    assert client.get('/api/v1/accounts/profile/', headers=headers).status_code == 200
+    assert client.put('/api/v1/accounts/profile/', headers=headers,
+                      json={'full_name': 'Renamed Member', 'date_of_birth': '1990-05-17'}).status_code == 200
+
+    response = client.post('/api/v1/catalog/categories/', headers=headers, json={'name': 'Family'})
+    assert response.status_code == 201
+    category_id = response.get_json()['category']['id']
+    plan_ids = []
+    for tier in range(3):
+        response = client.post('/api/v1/catalog/plans/', headers=headers, json={
+            'category_id': category_id, 'name': f'Family Tier {tier}', 'coverage_amount': 300000 * (tier + 1),
+            'premium_monthly': 500 + 100 * tier, 'premium_yearly': (500 + 100 * tier) * 11,
+            'eligibility': {'pincodes': ['560']}
+        })
+        assert response.status_code == 201, response.get_json()
+        plan_ids.append(response.get_json()['plan']['id'])
+
+    for url in ['/api/v1/catalog/categories/', f'/api/v1/catalog/categories/{category_id}/',
+                f'/api/v1/catalog/categories/{category_id}/plans/', '/api/v1/catalog/plans/',
+                '/api/v1/catalog/plans/?sort=-premium_monthly&age=30&pincode=560001',
+                f'/api/v1/catalog/plans/{plan_ids[0]}/', '/api/v1/catalog/serviceability/560/',
+                '/api/v1/catalog/suggest?prefix=fam']:
+        assert client.get(url).status_code == 200, url
+    assert client.post('/api/v1/catalog/quotes/', headers=headers, json={
+        'plan_ids': plan_ids, 'members': [{'relation': 'self'}, {'age': 8, 'billing_cycle': 'yearly'}]
+    }).status_code == 200
+    assert client.post('/api/v1/catalog/simulations/', headers=headers, json={
+        'plan_ids': plan_ids, 'member': {'relation': 'self'}
+    }).status_code == 200
+
+    response = client.post('/api/v1/cart/items/', headers=headers, json={'plan_id': plan_ids[0]})
+    assert response.status_code == 201
+    assert client.post('/api/v1/cart/items/', headers=headers, json={'plan_id': plan_ids[1]}).status_code == 201
+    items = client.get('/api/v1/cart/', headers=headers).get_json()['cart']['items']
+    assert client.put(f"/api/v1/cart/items/{items[0]['id']}/", headers=headers,
+                      json={'quantity': 2}).status_code == 200
+    assert client.delete(f"/api/v1/cart/items/{items[1]['id']}/", headers=headers).status_code == 200
+    assert client.delete('/api/v1/cart/', headers=headers).status_code == 200
+
+
+def test_overrun_fails_in_strict_mode(app, client):
+    @app.route('/over-budget/')
+    @query_budget(1)
+    def over_budget():
+        User.query.all()
+        User.query.all()
+        return 'ok'
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/over-budget/')
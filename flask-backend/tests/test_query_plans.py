@@ -0,0 +1,36 @@
+"""
+Every keyed DAO lookup is answered from an index, on tables made by create_all() or the migrations
+"""
+import os
+
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import inspect
+
+from flask_back_office.extensions import db
+from flask_back_office.query_plans import captured_statements, check_dao_query_plans, dao_lookups
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def test_lookups_use_indexes(app):
+    with app.app_context():
+        assert check_dao_query_plans() == []
+
+
+def test_every_lookup_is_checked(app):
+    with app.app_context():
+        for name, lookup in dao_lookups():
+            with captured_statements() as statements:
+                lookup()
+            db.session.rollback()
+            assert statements, name
+
+
+def test_migrated_schema_uses_indexes(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/migrated.db')
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        upgrade(directory=MIGRATIONS)
+        assert 'alembic_version' in inspect(db.engine).get_table_names()
+        assert check_dao_query_plans() == []
@@ -0,0 +1,93 @@
+"""
+Single-flight reads: one call per key at a time, its result or exception shared with the callers that joined
+"""
+import threading
+
+import pytest
+
+from flask_back_office import single_flight
+from flask_back_office.single_flight import SingleFlight
+
+FOLLOWERS = 5
+
+
+def _join(flight, key, fn, results):
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as exc:
+            results.append(exc)
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread
+
+
+class _Joined:
+    """Stands in for the single_flight_calls_total counter, to see followers join"""
+
+    def __init__(self):
+        self.followers = threading.Semaphore(0)
+
+    def inc(self, name, role):
+        if role == 'follower':
+            self.followers.release()
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_followers_share_the_leaders_result_or_exception(monkeypatch, fails):
+    joined = _Joined()
+    monkeypatch.setattr(single_flight, 'SINGLE_FLIGHT_CALLS', joined)
+    flight = SingleFlight('test')
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if fails:
+            raise LookupError('not found')
+        return {'id': 1}
+
+    results = []
+    leader = _join(flight, 'plan:1', fn, results)
+    assert started.wait(5)
+    followers = [_join(flight, 'plan:1', fn, results) for _ in range(FOLLOWERS)]
+    for _ in followers:
+        assert joined.followers.acquire(timeout=5)
+    release.set()
+    for thread in (leader, *followers):
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == FOLLOWERS + 1
+    if fails:
+        assert all(isinstance(result, LookupError) for result in results)
+    else:
+        assert all(result == {'id': 1} for result in results)
+        assert all(result is results[0] for result in results)
+
+
+def test_keys_run_independently_and_again_once_done():
+    flight = SingleFlight('test')
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append('slow')
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    results = []
+    leader = _join(flight, 'a', slow, results)
+    assert started.wait(5)
+    # Another key does not wait for the running one
+    assert flight.do('b', lambda: calls.append('b') or 'b') == 'b'
+    release.set()
+    leader.join()
+
+    # Nothing left running: the next call for the key runs again
+    assert flight.do('a', lambda: calls.append('again') or 'again') == 'again'
+    assert calls == ['slow', 'b', 'again']
+    assert results == ['slow']
@@ -0,0 +1,89 @@
+"""
+SQLite high-concurrency mode: WAL, and units of work that never hit "database is locked"
+"""
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import func, select, text
+
+from flask_back_office.catalog.models import PlanCategory
+from flask_back_office.extensions import db
+from flask_back_office.unit_of_work import unit_of_work
+
+WRITERS = 8
+UNITS_PER_WRITER = 10
+
+
+@pytest.fixture
+def database(tmp_path):
+    return tmp_path / 'concurrent.db'
+
+
+@pytest.fixture
+def app(make_app, database):
+    # A short busy_timeout: a lock upgrade failing, or a writer polling for
+    # the file lock too long, shows up as "database is locked"
+    return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}',
+                    SQLITE_HIGH_CONCURRENCY=True, SQLITE_BUSY_TIMEOUT_MS=200)
+
+
+def test_uses_wal(app):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+
+def test_concurrent_read_then_write_units_of_work(app):
+    errors = []
+    start = threading.Barrier(WRITERS + 1)
+
+    def write(number):
+        start.wait()
+        try:
+            with app.app_context():
+                for unit in range(UNITS_PER_WRITER):
+                    with unit_of_work():
+                        # Read first, so a deferred BEGIN would need a lock upgrade
+                        db.session.scalar(select(func.count()).select_from(PlanCategory))
+                        db.session.add(PlanCategory(name=f'Writer {number} unit {unit}'))
+                        db.session.flush()
+        except Exception as exc:
+            errors.append(exc)
+
+    def read():
+        start.wait()
+        try:
+            with app.app_context():
+                for _ in range(UNITS_PER_WRITER * 5):
+                    db.session.scalar(select(func.count()).select_from(PlanCategory))
+                    db.session.rollback()
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(WRITERS - 1)]
+    threads.append(threading.Thread(target=read))
+    for thread in threads:
+        thread.start()
+    start.wait()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        count = db.session.scalar(select(func.count()).select_from(PlanCategory))
+    assert count == (WRITERS - 1) * UNITS_PER_WRITER
+
+
+def test_unit_of_work_holds_the_write_lock_from_its_first_read(app, database):
+    other = sqlite3.connect(database, timeout=0, isolation_level=None)
+    try:
+        with app.app_context():
+            with unit_of_work():
+                db.session.scalar(select(func.count()).select_from(PlanCategory))
+                with pytest.raises(sqlite3.OperationalError, match='database is locked'):
+                    other.execute('BEGIN IMMEDIATE')
+            # Released once the unit of work is over, though it staged nothing
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+    finally:
+        other.close()
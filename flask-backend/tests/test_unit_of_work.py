@@ -0,0 +1,88 @@
+"""
+Unit of work: one commit per outermost block, rollback on error, on_commit after a commit only
+"""
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from flask_back_office.catalog.models import PlanCategory
+from flask_back_office.extensions import db
+from flask_back_office.unit_of_work import on_commit, unit_of_work
+
+
+@pytest.fixture
+def commits(app):
+    """Number of COMMITs of the app's default session while the test runs"""
+    counted = []
+
+    def count(session):
+        if session is db.session():
+            counted.append(session)
+
+    event.listen(Session, 'after_commit', count)
+    with app.app_context():
+        yield counted
+    event.remove(Session, 'after_commit', count)
+
+
+def _names():
+    return db.session.scalars(select(PlanCategory.name).order_by(PlanCategory.name)).all()
+
+
+def test_nested_blocks_commit_once(commits):
+    done = []
+    with unit_of_work():
+        db.session.add(PlanCategory(name='Family'))
+        db.session.flush()
+        with unit_of_work():
+            db.session.add(PlanCategory(name='Senior'))
+            on_commit(lambda: done.append(len(commits)))
+        assert commits == [] and done == []
+    assert len(commits) == 1
+    # Ran after, not before, the commit
+    assert done == [1]
+    assert _names() == ['Family', 'Senior']
+
+
+def test_rolls_back_and_drops_callbacks_on_error(commits):
+    done = []
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            db.session.add(PlanCategory(name='Family'))
+            db.session.flush()
+            on_commit(lambda: done.append('committed'))
+            raise RuntimeError('boom')
+    assert commits == [] and done == []
+    assert _names() == []
+
+    # The next block starts clean
+    with unit_of_work():
+        db.session.add(PlanCategory(name='Senior'))
+    assert len(commits) == 1 and done == []
+    assert _names() == ['Senior']
+
+
+def test_failed_commit_runs_no_callbacks(commits):
+    done = []
+    with unit_of_work():
+        db.session.add(PlanCategory(name='Family'))
+    with pytest.raises(IntegrityError):
+        with unit_of_work():
+            db.session.add(PlanCategory(name='Family'))
+            on_commit(lambda: done.append('committed'))
+    assert done == []
+    assert _names() == ['Family']
+
+
+def test_read_only_block_does_not_commit(commits):
+    with unit_of_work():
+        _names()
+    assert commits == []
+
+
+def test_on_commit_outside_a_block_runs_now(app):
+    done = []
+    with app.app_context():
+        on_commit(lambda: done.append('now'))
+    assert done == ['now']
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for gunicorn
+
+    gunicorn wsgi:app
+"""
+from flask_back_office import create_app
+
+app = create_app()
@@ -0,0 +1,13 @@
+"""
+Load-test harness for the Flask and Django backends
+
+Drives realistic customer journeys against either backend, served in-process
+on loopback with a throwaway SQLite database (or against a running server via
+--url), and reports throughput and p50/p95/p99 per endpoint. Results are
+compared with a JSON baseline (loadtest/baselines/<backend>.json); regressions
+beyond the tolerance fail the run, and so does a missing baseline under CI
+or with --require-baseline.
+
+    python -m loadtest flask
+    python -m loadtest django --save-baseline
+"""
@@ -0,0 +1,78 @@
+"""
+python -m loadtest {flask,django} [options]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from loadtest import runner
+from loadtest.targets import TARGETS, LoopbackServer
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='Run the customer-journey load test')
+    parser.add_argument('backend', choices=sorted(TARGETS))
+    parser.add_argument('--users', type=int, default=4, help='concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=5, help='measured journeys per user')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured journeys per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help='test a running server instead of an in-process one')
+    parser.add_argument('--baseline', help='baseline JSON (default: loadtest/baselines/<backend>.json)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--require-baseline', action='store_true', default=bool(os.environ.get('CI')),
+                        help='fail when there is no baseline to compare with (default under CI)')
+    parser.add_argument('--output', help='also write this run as JSON here')
+    args = parser.parse_args(argv)
+
+    target = TARGETS[args.backend]
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.backend}.json')
+
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as workdir:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server = LoopbackServer(target['app'](workdir)).start()
+            base_url = server.url
+        try:
+            result = runner.run(base_url, target['journey'], args.users, args.iterations, args.warmup, args.seed)
+        finally:
+            if server is not None:
+                server.stop()
+
+    result['backend'] = args.backend
+    result['params'] = {
+        'users': args.users, 'iterations': args.iterations, 'warmup': args.warmup,
+        'seed': args.seed, 'server': 'external' if args.url else 'in-process',
+    }
+    result['environment'] = runner.environment()
+    print(runner.report(result))
+
+    if args.output:
+        runner.save_baseline(args.output, result)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        runner.save_baseline(baseline_path, result)
+        print(f'Baseline saved to {baseline_path}')
+        return 0
+
+    baseline = runner.load_baseline(baseline_path)
+    if baseline is None:
+        print(f'No baseline at {baseline_path}; run with --save-baseline to create one')
+        return 1 if args.require_baseline or result['total']['errors'] else 0
+
+    regressions = runner.compare(result, baseline, args.tolerance)
+    if regressions:
+        print('\nREGRESSIONS:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print(f'\nWithin {args.tolerance:.0%} of {baseline_path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
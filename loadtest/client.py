@@ -0,0 +1,53 @@
+"""
+Minimal HTTP/JSON client used by the journeys
+"""
+import http.client
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Client:
+    """One virtual user's connection to the server under test"""
+
+    def __init__(self, base_url: str, recorder, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token: Optional[str] = None
+
+    def request(self, name: str, method: str, path: str, json_body: Dict[str, Any] = None,
+                expect: int = 200) -> Tuple[int, Any]:
+        """Send one request, record its latency under ``name`` and return (status, body)"""
+        headers = {'Accept': 'application/json'}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        conn_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        conn = conn_class(self.host, self.port, timeout=self.timeout)
+        start = time.perf_counter()
+        try:
+            conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = conn.getresponse()
+            raw = response.read()
+            status = response.status
+        except OSError:
+            self.recorder.record(name, time.perf_counter() - start, ok=False)
+            raise
+        finally:
+            conn.close()
+        self.recorder.record(name, time.perf_counter() - start, ok=status == expect)
+
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
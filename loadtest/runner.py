@@ -0,0 +1,151 @@
+"""
+Load-test runner, latency statistics and baseline comparison
+"""
+import json
+import math
+import platform
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from loadtest.client import Client
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency samples"""
+
+    def __init__(self):
+        self.enabled = True
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, samples in recorder.samples.items():
+        ordered = sorted(samples)
+        endpoints[name] = {
+            'count': len(ordered),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(ordered) / elapsed, 3),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+            'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        }
+    total = sum(e['count'] for e in endpoints.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'total': {
+            'count': total,
+            'errors': sum(e['errors'] for e in endpoints.values()),
+            'rps': round(total / elapsed, 3) if elapsed else 0.0,
+        },
+        'endpoints': endpoints,
+    }
+
+
+def run(base_url: str, journey: Callable, users: int, iterations: int, warmup: int, seed: int) -> Dict[str, Any]:
+    """Run ``users`` concurrent virtual users through ``warmup + iterations`` journeys each"""
+    recorder = Recorder()
+    run_id = f'{seed}-{int(time.time() * 1000):x}'
+    start_measuring = threading.Barrier(users + 1)
+    failures: List[BaseException] = []
+
+    def virtual_user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url, recorder)
+        try:
+            for iteration in range(warmup):
+                journey(client, rng, f'{run_id}-u{index}-w{iteration}')
+        except Exception as e:
+            failures.append(e)
+        start_measuring.wait()
+        try:
+            for iteration in range(iterations):
+                journey(client, rng, f'{run_id}-u{index}-i{iteration}')
+        except Exception as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), name=f'vu-{i}') for i in range(users)]
+    recorder.enabled = False
+    for thread in threads:
+        thread.start()
+    start_measuring.wait()
+    recorder.enabled = True
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if failures:
+        raise RuntimeError(f'{len(failures)} virtual user(s) aborted: {failures[0]!r}')
+    return summarize(recorder, elapsed)
+
+
+def report(result: Dict[str, Any]) -> str:
+    lines = [f"{'endpoint':<18} {'count':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, e in result['endpoints'].items():
+        lines.append(f"{name:<18} {e['count']:>6} {e['errors']:>4} {e['rps']:>9.2f} "
+                     f"{e['p50_ms']:>9.2f} {e['p95_ms']:>9.2f} {e['p99_ms']:>9.2f}")
+    total = result['total']
+    lines.append(f"{'TOTAL':<18} {total['count']:>6} {total['errors']:>4} {total['rps']:>9.2f}"
+                 f"   in {result['elapsed_s']:.2f}s")
+    return '\n'.join(lines)
+
+
+def environment() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'system': platform.system()}
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return the regressions of ``result`` against ``baseline`` (empty when within tolerance)"""
+    if result['params'] != baseline.get('params'):
+        return [f"run parameters {result['params']} differ from the baseline's {baseline.get('params')}"]
+
+    regressions = []
+    if result['total']['errors']:
+        regressions.append(f"{result['total']['errors']} request(s) returned an unexpected status")
+    for name, base in baseline['endpoints'].items():
+        current = result['endpoints'].get(name)
+        if current is None:
+            regressions.append(f'{name}: missing from this run')
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {current[key]:.2f} > baseline {base[key]:.2f} (+{tolerance:.0%})')
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {current['rps']:.2f} < baseline {base['rps']:.2f} (-{tolerance:.0%})")
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, result: Dict[str, Any]):
+    with open(path, 'w') as fh:
+        json.dump(result, fh, indent=2, sort_keys=True)
+        fh.write('\n')
@@ -0,0 +1,164 @@
+"""
+Backends under test: in-process loopback servers and their customer journeys
+
+Each backend is imported from its own directory with a throwaway SQLite
+database, so only one backend can be loaded per process. The database runs
+in the backend's SQLite high-concurrency mode (WAL, one queued writer).
+"""
+import os
+import random
+import sys
+import threading
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLASK_DIR = os.path.join(REPO_ROOT, 'flask-backend')
+DJANGO_DIR = os.path.join(REPO_ROOT, 'back_office')
+
+CATALOG_CATEGORIES = ['Individual', 'Family Floater', 'Senior Citizen', 'Critical Illness']
+CATALOG_PLANS_PER_CATEGORY = 5
+PASSWORD = 'LoadTest#2024'
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LoopbackServer:
+    """Serve a WSGI app on 127.0.0.1 from a background thread"""
+
+    def __init__(self, wsgi_app):
+        self.httpd = make_server('127.0.0.1', 0, wsgi_app,
+                                 server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='loadtest-server', daemon=True)
+
+    def start(self) -> 'LoopbackServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# Flask backend
+
+def flask_app(workdir: str):
+    """Create the Flask app on a fresh SQLite file and seed a small catalog"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    os.environ['SLOW_QUERY_LOG_FILE'] = os.path.join(workdir, 'slow_queries.log')
+    os.environ['AUDIT_LOG_FILE'] = os.path.join(workdir, 'audit.log')
+    os.environ.setdefault('METRICS_ENABLED', 'False')
+    # Its limits are sized for gunicorn's 4 threads, not the loopback server's thread per connection
+    os.environ.setdefault('ADMISSION_CONTROL', 'False')
+    # Concurrent journeys write to one SQLite file: queue the writers rather than fail with "database is locked"
+    os.environ.setdefault('SQLITE_HIGH_CONCURRENCY', 'True')
+    sys.path.insert(0, FLASK_DIR)
+
+    from flask_back_office import create_app
+    from flask_back_office.catalog.services import CategoryService, PlanService
+
+    app = create_app('production')
+    with app.app_context():
+        for index, name in enumerate(CATALOG_CATEGORIES):
+            _, result = CategoryService.create_category(name=name, description=f'{name} plans')
+            category_id = result['category']['id']
+            for tier in range(CATALOG_PLANS_PER_CATEGORY):
+                PlanService.create_plan(
+                    category_id=category_id,
+                    name=f'{name} Tier {tier + 1}',
+                    coverage_amount=300000 * (tier + 1),
+                    premium_monthly=400 + 150 * tier + 50 * index,
+                    premium_yearly=(400 + 150 * tier + 50 * index) * 11
+                )
+    return app
+
+
+def flask_journey(client, rng: random.Random, tag: str):
+    """register -> login -> browse plans -> add to cart -> view cart -> update profile"""
+    email = f'{tag}@loadtest.example'
+    client.token = None
+    client.request('register', 'POST', '/api/v1/accounts/register/', {
+        'email': email, 'password': PASSWORD, 'full_name': f'Load Tester {tag}',
+        'mobile_number': f'9{rng.randrange(10 ** 9):09d}'
+    }, expect=201)
+    _, body = client.request('login', 'POST', '/api/v1/accounts/login/', {'email': email, 'password': PASSWORD})
+    client.token = (body or {}).get('access')
+
+    client.request('list_categories', 'GET', '/api/v1/catalog/categories/')
+    _, body = client.request('list_plans', 'GET', '/api/v1/catalog/plans/')
+    plans = (body or {}).get('plans') or []
+    if not plans:
+        return
+    picks = rng.sample(plans, k=min(2, len(plans)))
+    client.request('category_plans', 'GET', f"/api/v1/catalog/categories/{picks[0]['category_id']}/plans/")
+    for plan in picks:
+        client.request('plan_detail', 'GET', f"/api/v1/catalog/plans/{plan['id']}/")
+        client.request('add_to_cart', 'POST', '/api/v1/cart/items/', {
+            'plan_id': plan['id'], 'billing_cycle': rng.choice(['monthly', 'yearly'])
+        }, expect=201)
+
+    client.request('view_cart', 'GET', '/api/v1/cart/')
+    client.request('update_profile', 'PUT', '/api/v1/accounts/profile/', {
+        'full_name': f'Load Tester {tag} Updated'
+    })
+
+
+# Django backend
+
+def django_app(workdir: str):
+    """Create the Django WSGI app on a fresh, migrated SQLite file"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthcare_plans_bo.settings')
+    os.environ['DEBUG'] = 'False'
+    os.environ['SLOW_QUERY_LOG_FILE'] = os.path.join(workdir, 'slow_queries.log')
+    os.environ['AUDIT_LOG_FILE'] = os.path.join(workdir, 'audit.log')
+    os.environ.setdefault('METRICS_ENABLED', 'False')
+    # Its limits are sized for gunicorn's 4 threads, not the loopback server's thread per connection
+    os.environ.setdefault('ADMISSION_CONTROL', 'False')
+    # Concurrent journeys write to one SQLite file: queue the writers rather than fail with "database is locked"
+    os.environ.setdefault('SQLITE_HIGH_CONCURRENCY', 'True')
+    sys.path.insert(0, DJANGO_DIR)
+
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'loadtest.sqlite3')
+
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    call_command('migrate', verbosity=0)
+    return get_wsgi_application()
+
+
+def django_journey(client, rng: random.Random, tag: str):
+    """register -> login -> view profile -> update profile (the Django app has no catalog or cart)"""
+    email = f'{tag}@loadtest.example'
+    client.token = None
+    client.request('register', 'POST', '/api/v1/accounts/register/', {
+        'email': email, 'password': PASSWORD, 'full_name': f'Load Tester {tag}',
+        'mobile': f'9{rng.randrange(10 ** 9):09d}'
+    }, expect=201)
+    _, body = client.request('login', 'POST', '/api/v1/accounts/login/', {'email': email, 'password': PASSWORD})
+    client.token = (body or {}).get('access_token')
+
+    client.request('view_profile', 'GET', '/api/v1/accounts/profile/')
+    client.request('update_profile', 'PATCH', '/api/v1/accounts/profile/', {
+        'full_name': f'Load Tester {tag} Updated', 'city': rng.choice(['Pune', 'Chennai', 'Jaipur']),
+        'state': rng.choice(['MH', 'TN', 'RJ']), 'pincode': f'{rng.randrange(110000, 860000)}'
+    })
+
+
+TARGETS: Dict[str, Dict[str, Callable]] = {
+    'flask': {'app': flask_app, 'journey': flask_journey},
+    'django': {'app': django_app, 'journey': django_journey},
+}
+